@@ -0,0 +1,125 @@
+"""Замер накладных расходов SecurityMiddleware.
+
+Сравнивается ASGI-реализация (security.SecurityMiddleware) с прежней реализацией
+на BaseHTTPMiddleware и с приложением без middleware. Запросы подаются прямо
+в ASGI-приложение, без сервера и сети:
+- GET /ping - короткий запрос;
+- POST /upload - тело 64 КБ частями по 1 КБ, как при медленной загрузке по GPRS.
+
+Запуск: python bench_security.py [кол-во запросов]
+"""
+import sys
+import time
+import asyncio
+import tracemalloc
+
+from starlette.applications import Starlette
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+from limiter import get_client_ip
+from security import SecurityMiddleware, blocklist, config
+from common.security_patterns import security_matcher
+
+
+class LegacySecurityMiddleware(BaseHTTPMiddleware):
+    """Прежняя схема: те же проверки внутри BaseHTTPMiddleware.dispatch"""
+    async def dispatch(self, request: Request, call_next):
+        client_ip = get_client_ip(request)
+        if client_ip in config.trusted_ips:
+            return await call_next(request)
+        if blocklist.is_blocked(client_ip):
+            return JSONResponse({"error": "Доступ запрещен"}, status_code=403)
+        if security_matcher.check(request.url.path, request.url.query,
+                                  request.headers.get("User-Agent", "")) is not None:
+            return JSONResponse({"error": "Обнаружена угроза безопасности"}, status_code=403)
+        return await call_next(request)
+
+
+async def ping(request: Request):
+    return PlainTextResponse("ok")
+
+async def upload(request: Request):
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+    return PlainTextResponse(str(size))
+
+
+def build_app(middleware):
+    app = Starlette(routes=[Route("/ping", ping), Route("/upload", upload, methods=["POST"])])
+    if middleware is SecurityMiddleware:
+        return SecurityMiddleware(app, config)
+    if middleware is not None:
+        return middleware(app)
+    return app
+
+
+def make_scope(method: str, path: str) -> dict:
+    return {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "http", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "server": ("testserver", 80),
+        "client": ("10.0.0.1", 40000),
+        "headers": [(b"host", b"testserver"), (b"user-agent", b"SIMCOM_MODULE")],
+    }
+
+
+async def request(app, method: str, path: str, body_chunks: int = 0, chunk: bytes = b"x" * 1024) -> None:
+    chunks = [chunk] * body_chunks
+    sent = 0
+
+    async def receive():
+        nonlocal sent
+        if sent < len(chunks):
+            sent += 1
+            return {"type": "http.request", "body": chunks[sent - 1], "more_body": sent < len(chunks)}
+        if sent == len(chunks) and body_chunks == 0:
+            sent += 1
+            return {"type": "http.request", "body": b"", "more_body": False}
+        await asyncio.sleep(3600)  # http.disconnect не нужен: ответ уже отправлен
+
+    async def send(message):
+        pass
+
+    await app(make_scope(method, path), receive, send)
+
+
+async def measure(app, method: str, path: str, count: int, body_chunks: int = 0):
+    for _ in range(min(count, 100)):
+        await request(app, method, path, body_chunks)
+
+    started = time.perf_counter()
+    for _ in range(count):
+        await request(app, method, path, body_chunks)
+    rate = count / (time.perf_counter() - started)
+
+    # Память на запрос: пик tracemalloc во время одного запроса (среднее)
+    samples = min(count, 200)
+    tracemalloc.start()
+    peak_total = 0
+    for _ in range(samples):
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        await request(app, method, path, body_chunks)
+        peak_total += tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return rate, peak_total / samples / 1024
+
+
+async def main(count: int) -> None:
+    variants = (("без middleware", None), ("BaseHTTPMiddleware", LegacySecurityMiddleware),
+                ("ASGI", SecurityMiddleware))
+    for method, path, body_chunks in (("GET", "/ping", 0), ("POST", "/upload", 64)):
+        print(f"{method} {path}" + (f" ({body_chunks} x 1 КБ)" if body_chunks else ""))
+        for name, middleware in variants:
+            rate, peak_kb = await measure(build_app(middleware), method, path, count, body_chunks)
+            print(f"  {name:20} {rate:9.0f} запросов/с   пик памяти на запрос {peak_kb:6.1f} КБ")
+
+
+if __name__ == "__main__":
+    if not hasattr(tracemalloc, "reset_peak"):
+        sys.exit("Нужен Python 3.9+ (tracemalloc.reset_peak)")
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5000))
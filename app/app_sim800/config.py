@@ -6,22 +6,49 @@ from logging.handlers import RotatingFileHandler
 # Базовые значения этих параметров переопределяться через файл .env
 class Settings(BaseSettings):
     app_port_api: int = 15000
+    api_workers: int = 1  # кол-во процессов uvicorn
     behind_proxy:bool = True
 
     # Пути и директории
+    # Данные устройств из списка devices ('A,B7,cam-2') хранятся в своих разделах
+    # (<родитель>/devices/<id>/...); устройство по умолчанию и все остальные
+    # кадры - по исходным путям
+    default_device: str = ''
+    devices: str = ''
     image_folder: str = 'static/images'
+    thumbnail_folder: str = 'static/thumbs'
     csv_file_path: str = 'data/csv/signals.csv'
     csv_sms_file_path: str = 'data/csv/sms.csv'
+    sms_db_path: str = 'data/sms.db'
+    image_index_path: str = 'data/images.db'
+    jobs_db_path: str = 'data/jobs.db'
+    rollups_db_path: str = 'data/rollups.db'
+    telemetry_columnar: bool = False
+    telemetry_columnar_dir: str = 'data/telemetry'
     camera_config_path: str = 'camera_settings.json'
     blocked_ips_file: str = 'blocked_ips.txt'
+    blocked_ip_ttl: int = 0  # срок автоматической блокировки IP в секундах (0 - бессрочно)
+    nginx_blocklist_path: str = ''  # карта geo для nginx (например, nginx_blocklist/blocked_ips.conf)
+    nginx_reload_command: str = ''  # команда перезагрузки nginx после обновления карты
     logs_path_api: str = 'api.log'
     
     # Настройки безопасности
     trusted_ips: Set[str] = {}
     image_extensions: Set[str] = {'jpg'}
     allowed_origins: List[str] = ["*"]
+    # Хранилище счетчиков лимитов: sqlite:///путь, redis://:пароль@host:6379/1 (нужен пакет redis)
+    # или memory:// (только при api_workers = 1)
+    rate_limit_storage_uri: str = 'sqlite:///data/limits.db'
     max_upload_size: int = 5_000_000  # 5MB
-    display_last_images: int = 1000
+    upload_dedup_ttl: int = 15 * 60   # окно распознавания повторных загрузок (сек)
+    display_last_images: int = 1000  # лимит кадров на устройство
+    # Очистка с учетом перцептивных хешей (почти одинаковые кадры удаляются первыми)
+    retention_dedup: bool = False
+    retention_dedup_distance: int = 5        # макс. расстояние Хэмминга dHash (из 64 бит)
+    retention_motion_share: float = 0.3      # доля лимита, закрепленная за кадрами по движению
+    motion_wakeup_reasons: Set[str] = {'2'}
+    thumbnail_workers: int = 2
+    enhance_uploads: bool = False  # автокоррекция цвета/яркости кадра после загрузки
     
     # Причины пробуждения
     wakeup_reasons: Dict[str, str] = {
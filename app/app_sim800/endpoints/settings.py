@@ -1,11 +1,13 @@
 import json
 import logging
 
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
 from config import Settings
-from utilits import load_cached_settings, flatten_settings
+from utilits import flat_settings_cache
 from limiter import limiter
 
 
@@ -15,16 +17,30 @@ settings_router = APIRouter()
 @settings_router.get("/settings-flat")
 @limiter.limit("50/day")
 @limiter.limit("5/hour")
-async def get_settings_flat(request: Request):
+async def get_settings_flat(request: Request, v: Optional[str] = None):
     """ Получение плоских настроек. Вызывается в ESP32
+
+    Параметр `v` - версия настроек, уже сохраненная на устройстве
+    (поле settings_version из предыдущего ответа). Если она совпадает
+    с текущей, возвращается пустой JSON и устройство оставляет свои значения.
+    Также поддерживается ETag / If-None-Match (304 Not Modified).
     """
     print("Запрос принят! settings-flat", request.headers.get("X-Forwarded-For"))
     try:
-        settings = await load_cached_settings(config)
-        return JSONResponse(
-            flatten_settings(settings),
-            headers={"Cache-Control": "public, max-age=300"}
-        )
+        payload = await flat_settings_cache.get()
+        headers = {
+            "Cache-Control": "public, max-age=300",
+            "ETag": payload.etag,
+            "X-Settings-Version": payload.version
+        }
+
+        if etag_matches(request.headers.get("If-None-Match"), payload.etag):
+            return Response(status_code=304, headers=headers)
+
+        if v == payload.version:
+            return Response(b"{}", media_type="application/json", headers=headers)
+
+        return Response(payload.body, media_type="application/json", headers=headers)
     except FileNotFoundError:
         raise HTTPException(404, detail="Файл настроек не найден")
     except json.JSONDecodeError:
@@ -32,9 +48,16 @@ async def get_settings_flat(request: Request):
     except Exception as e:
         logging.error(f"Ошибка получения настроек: {str(e)}", exc_info=True)
         raise HTTPException(500, detail="Внутренняя ошибка сервера")
-    
 
 
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Проверка заголовка If-None-Match"""
+    if not if_none_match:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(',')]
+    return '*' in tags or etag in tags or f"W/{etag}" in tags
+    
+
 def load_settings():
     try:
         with open(config.camera_config_path, 'r') as f:
@@ -46,6 +69,7 @@ def save_settings(settings):
     try:
         with open(config.camera_config_path, 'w') as f:
             json.dump(settings, f, indent=2)
+        flat_settings_cache.invalidate()
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving settings: {str(e)}")
 
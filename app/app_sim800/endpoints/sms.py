@@ -1,28 +1,20 @@
-import csv
-import os
-from typing import List
-from datetime import datetime
+from typing import List, Optional
 from pydantic import BaseModel
 from fastapi import APIRouter, HTTPException
 
-
-
 from config import Settings
+from sms_store import sms_store, migrate_csv
+from utilits import run_in_thread
 
 router = APIRouter()
 config = Settings()
 
-# Путь к CSV файлу для хранения СМС
-SMS_CSV_PATH = config.csv_sms_file_path
+# Наибольший размер страницы /sms-last: больший limit урезается до него
+SMS_PAGE_LIMIT = 100
 
-# Убедимся, что директория существует
-os.makedirs(os.path.dirname(SMS_CSV_PATH), exist_ok=True)
+# Перенос истории из старого sms.csv в SQLite (только для пустого хранилища)
+migrate_csv(config.csv_sms_file_path)
 
-# Создаем CSV файл, если его нет
-if not os.path.exists(SMS_CSV_PATH):
-    with open(SMS_CSV_PATH, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.writer(f)
-        writer.writerow(['timestamp', 'phone', 'message'])
 
 class SmsItem(BaseModel):
     phone: str
@@ -32,85 +24,48 @@ class SmsItem(BaseModel):
 @router.post("/sms-receive")
 async def receive_sms(sms_items: List[SmsItem]):
     try:
-        # Создаем временный список для всех записей
-        all_records = []
-        
-        # Читаем существующие данные из CSV, если файл существует
-        if os.path.exists(SMS_CSV_PATH):
-            with open(SMS_CSV_PATH, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                for row in reader:
-                    if len(row) >= 3:  # Проверяем, что строка содержит все необходимые поля
-                        all_records.append({
-                            'timestamp': row[0],
-                            'phone': row[1],
-                            'message': row[2],
-                            'original_row': row  # Сохраняем оригинальную строку для перезаписи
-                        })
-        
-        # Добавляем новые записи
-        for item in sms_items:
-            all_records.append({
-                'timestamp': item.timestamp,
-                'phone': item.phone,
-                'message': item.message,
-                'original_row': [item.timestamp, item.phone, item.message]
-            })
-        
-        # Удаляем дубликаты: считаем дубликатами записи с одинаковым номером, сообщением и временной меткой
-        seen = set()
-        unique_records = []
-        for record in all_records:
-            # Создаем уникальный ключ на основе всех трех полей
-            record_key = (record['timestamp'], record['phone'], record['message'])
-            if record_key not in seen:
-                seen.add(record_key)
-                unique_records.append(record)
-        
-        # Сортируем записи по временной метке
-        # Пытаемся преобразовать временную метку в объект datetime для корректной сортировки
-        def parse_timestamp(record):
-            try:
-                # Пытаемся распарсить временную метку в datetime объект
-                # Здесь можно добавить более сложную логику парсинга в зависимости от формата временных меток
-                return datetime.strptime(record['timestamp'], "%Y-%m-%dT%H:%M:%S%z")
-            except:
-                # Если парсинг не удался, возвращаем минимально возможную дату
-                return datetime.min
-        
-        sorted_records = sorted(unique_records, key=parse_timestamp)
-        
-        # Перезаписываем CSV с уникальными и отсортированными записями
-        with open(SMS_CSV_PATH, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.writer(f)
-            for record in sorted_records:
-                writer.writerow(record['original_row'])
-        
-        return {"status": "success", "received": len(sms_items), "total_records": len(sorted_records)}
+        # Дубликаты (одинаковые временная метка, номер и текст) отсекаются индексом UNIQUE
+        _, total_records = await run_in_thread(
+            sms_store.add_many,
+            [(item.timestamp, item.phone, item.message) for item in sms_items]
+        )
+        return {"status": "success", "received": len(sms_items), "total_records": total_records}
     except Exception as e:
-        return HTTPException(status_code=500, detail=f"Error saving SMS: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error saving SMS: {str(e)}")
 
 
 @router.get("/sms-last")
-async def get_last_sms(limit: int = 5):
+async def get_last_sms(
+    limit: int = 5,
+    before: Optional[int] = None,
+    after: Optional[int] = None
+):
+    """Последние SMS с курсорной пагинацией.
+
+    `before` - id SMS, до которой нужны более ранние записи (листание истории),
+    `after` - id SMS, после которой нужны новые записи (опрос обновлений).
+    В ответе `next_before` - курсор следующей страницы более ранних SMS
+    (null, если их больше нет), `next_after` - курсор для опроса новых SMS
+    (id последней полученной SMS в порядке поступления).
+    `limit` приводится к диапазону 1..SMS_PAGE_LIMIT.
+    """
+    limit = min(max(limit, 1), SMS_PAGE_LIMIT)
     try:
-        sms_list = []
-        if os.path.exists(SMS_CSV_PATH):
-            with open(SMS_CSV_PATH, 'r', newline='', encoding='utf-8') as f:
-                reader = csv.reader(f)
-                headers = next(reader)  # Пропускаем заголовки
-                sms_list = [row for row in reader]
-                sms_list = sms_list[-limit:] if len(sms_list) > limit else sms_list
-        
-        # Форматируем результат
-        result = []
-        for sms in sms_list:
-            result.append({
-                "timestamp": sms[0],
-                "phone": sms[1],
-                "message": sms[2]
-            })
-        
-        return {"sms": result}
+        # Запрашиваем на одну запись больше, чтобы узнать, есть ли еще страница
+        rows, newest_id = await run_in_thread(sms_store.page, limit + 1, before, after)
+        has_more = len(rows) > limit
+        result = rows[:limit] if after is not None else rows[-limit:]
+        if after is not None:
+            next_after = result[-1]["id"] if result else after
+        else:
+            next_after = newest_id
+
+        # При опросе по `after` перед первой новой записью всегда есть более ранние
+        older_exists = has_more or after is not None
+        return {
+            "sms": result,
+            "next_before": result[0]["id"] if result and older_exists else None,
+            "next_after": next_after
+        }
     except Exception as e:
-        return HTTPException(status_code=500, detail=f"Error reading SMS: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Error reading SMS: {str(e)}")
@@ -1,9 +1,11 @@
 import logging
-from fastapi import APIRouter, UploadFile, File, HTTPException, Request
+from typing import Optional
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, Request, Query
 from fastapi.responses import Response
 
 from config import Settings
-from utilits import process_upload, validate_filename
+from utilits import process_upload, process_raw_upload, validate_filename
 from limiter import limiter
 
 
@@ -30,9 +32,43 @@ async def upload_image(
         return Response(status_code=200)
         #return {"status": "success", "filename": file.filename}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Upload failed: {str(e)}", exc_info=True)
         raise HTTPException(
             status_code=500,
             detail="File processing error"
-        )        
\ No newline at end of file
+        )
+
+
+@upload_router.post("/upload-raw")
+@limiter.limit("50/day")
+@limiter.limit("5/hour")
+async def upload_image_raw(
+    request: Request,
+    filename: Optional[str] = Query(None)
+):
+    """Эндпоинт для загрузки изображения телом запроса (application/octet-stream).
+
+    Имя файла (с метаданными кадра) передается в ?filename= или в заголовке X-Filename.
+    Тело принимается без разбора multipart, лимит размера проверяется по мере приема.
+    """
+    filename = filename or request.headers.get("X-Filename")
+    if not filename or not validate_filename(filename, config):
+        raise HTTPException(status_code=400, detail="Invalid file")
+
+    content_type = request.headers.get("Content-Type", "")
+    if content_type.split(";")[0].strip() != "application/octet-stream":
+        raise HTTPException(status_code=415, detail="Expected application/octet-stream")
+
+    # Объявленный размер проверяется до приема тела
+    content_length = request.headers.get("Content-Length")
+    if content_length is not None:
+        if not content_length.isdigit():
+            raise HTTPException(status_code=400, detail="Invalid Content-Length")
+        if int(content_length) > config.max_upload_size:
+            raise HTTPException(status_code=413, detail="File too large")
+
+    await process_raw_upload(request.stream(), filename, config)
+    return Response(status_code=200)
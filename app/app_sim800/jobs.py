@@ -0,0 +1,196 @@
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional, Tuple
+
+from config import Settings
+
+
+config = Settings()
+
+
+class JobQueue:
+    """Очередь отложенных задач в SQLite (переживает перезапуск контейнера).
+
+    Задача выдается воркеру с арендой на `lease_seconds`: если процесс умер
+    посреди выполнения, после окончания аренды задача будет выдана повторно.
+    Неудачная задача повторяется с экспоненциальной задержкой, после
+    `max_attempts` попыток остается в таблице со статусом 'failed'.
+    """
+    def __init__(self, db_path: str, max_attempts: int = 5, retry_delay: float = 10.0,
+                 max_retry_delay: float = 3600.0, lease_seconds: float = 120.0):
+        self.db_path = Path(db_path)
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def enqueue(self, jobs: Iterable[Tuple[str, Dict]]) -> None:
+        """Постановка задач (kind, payload) одной транзакцией"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                conn.executemany(
+                    'INSERT INTO jobs (kind, payload, next_run, created) VALUES (?, ?, ?, ?)',
+                    ((kind, json.dumps(payload), now, now) for kind, payload in jobs)
+                )
+
+    def claim(self) -> Optional[Tuple[int, str, Dict, int]]:
+        """Выдача ближайшей готовой задачи: (id, kind, payload, attempts)"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                # BEGIN IMMEDIATE: выдача атомарна и между процессами
+                conn.execute('BEGIN IMMEDIATE')
+                row = conn.execute('''
+                    SELECT id, kind, payload, attempts FROM jobs
+                    WHERE status = 'pending' AND next_run <= ?
+                    ORDER BY next_run, id LIMIT 1
+                ''', (now,)).fetchone()
+                if row is None:
+                    return None
+                conn.execute(
+                    'UPDATE jobs SET next_run = ? WHERE id = ?',
+                    (now + self.lease_seconds, row[0])
+                )
+        return row[0], row[1], json.loads(row[2]), row[3]
+
+    def complete(self, job_id: int) -> None:
+        """Удаление выполненной задачи"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM jobs WHERE id = ?', (job_id,))
+
+    def retry(self, job_id: int, attempts: int, error: str) -> bool:
+        """Отложенный повтор задачи (False - попытки исчерпаны)"""
+        attempts += 1
+        failed = attempts >= self.max_attempts
+        delay = min(self.retry_delay * 2 ** (attempts - 1), self.max_retry_delay)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    'UPDATE jobs SET attempts = ?, next_run = ?, status = ?, last_error = ? WHERE id = ?',
+                    (attempts, time.time() + delay, 'failed' if failed else 'pending', error, job_id)
+                )
+        return not failed
+
+    def next_run(self) -> Optional[float]:
+        """Время ближайшей задачи"""
+        with self._lock:
+            return self._connection().execute(
+                "SELECT MIN(next_run) FROM jobs WHERE status = 'pending'"
+            ).fetchone()[0]
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.db_path), timeout=30, check_same_thread=False, isolation_level=None
+            )
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    kind TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_run REAL NOT NULL,
+                    created REAL NOT NULL,
+                    last_error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_next_run ON jobs (status, next_run, id);
+            ''')
+            self._conn = conn
+        return self._conn
+
+
+class JobWorker:
+    """Фоновый исполнитель задач очереди в цикле событий приложения.
+
+    Задачи выполняются по одной в порядке постановки; обработчик выбирается
+    по kind. Воркер просыпается по notify() или по времени ближайшей задачи.
+    """
+    def __init__(self, queue: JobQueue, handlers: Dict[str, Callable[[Dict], Awaitable[Any]]],
+                 poll_interval: float = 30.0):
+        self.queue = queue
+        self.handlers = handlers
+        self.poll_interval = poll_interval
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Запуск воркера (вызывается при старте приложения)"""
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Остановка воркера; незавершенная задача будет выдана повторно"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def notify(self) -> None:
+        """Сигнал о новых задачах"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_event_loop()
+        while True:
+            # Сброс до запроса к очереди: notify() во время запроса не теряется
+            self._wakeup.clear()
+            try:
+                job = await loop.run_in_executor(None, self.queue.claim)
+                if job is not None:
+                    await self._execute(*job)
+                    continue
+                next_run = await loop.run_in_executor(None, self.queue.next_run)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Job queue error: {str(e)}", exc_info=True)
+                next_run = None
+
+            timeout = self.poll_interval
+            if next_run is not None:
+                timeout = min(max(next_run - time.time(), 0.0), self.poll_interval)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _execute(self, job_id: int, kind: str, payload: Dict, attempts: int) -> None:
+        loop = asyncio.get_event_loop()
+        try:
+            handler = self.handlers[kind]
+            await handler(payload)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            retried = await loop.run_in_executor(None, self.queue.retry, job_id, attempts, str(e))
+            if retried:
+                logging.warning(f"Job {kind} #{job_id} failed (attempt {attempts + 1}), will retry: {str(e)}")
+            else:
+                logging.error(f"Job {kind} #{job_id} failed permanently: {str(e)}")
+            return
+        await loop.run_in_executor(None, self.queue.complete, job_id)
+
+
+job_queue = JobQueue(config.jobs_db_path)
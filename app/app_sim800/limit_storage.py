@@ -0,0 +1,113 @@
+import time
+import sqlite3
+import threading
+
+from pathlib import Path
+from typing import Optional
+
+from limits.storage import Storage
+
+
+class SQLiteStorage(Storage):
+    """Хранилище счетчиков slowapi/limits в SQLite, общее для всех воркеров uvicorn.
+
+    Подключается по URI 'sqlite:///data/limits.db' (относительный путь) или
+    'sqlite:////abs/path/limits.db'. Для стратегии фиксированного окна на ключ
+    хранится одна строка (счетчик и конец окна); увеличение счетчика - один
+    UPSERT в транзакции BEGIN IMMEDIATE, поэтому атомарно и между процессами.
+    Строки с истекшим окном (ключи без запросов) удаляются раз в
+    `eviction_interval` секунд, так что размер таблицы ограничен числом
+    клиентов за самое длинное окно, а не за все время работы.
+    """
+    STORAGE_SCHEME = ['sqlite']
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False,
+                 eviction_interval: float = 60.0, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        path = uri[len('sqlite://'):]
+        self.db_path = Path(path[1:] if path.startswith('/') else path)
+        self.eviction_interval = float(eviction_interval)
+        self._next_eviction = 0.0
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def incr(self, key: str, expiry: float, elastic_expiry: bool = False, amount: int = 1) -> int:
+        """Увеличение счетчика; истекшее окно начинается заново"""
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('BEGIN IMMEDIATE')
+                if now >= self._next_eviction:
+                    conn.execute('DELETE FROM limits WHERE expiry <= ?', (now,))
+                    self._next_eviction = now + self.eviction_interval
+                conn.execute('''
+                    INSERT INTO limits (key, count, expiry) VALUES (?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET
+                        count = CASE WHEN expiry <= ? THEN excluded.count ELSE count + excluded.count END,
+                        expiry = CASE WHEN expiry <= ? OR ? THEN excluded.expiry ELSE expiry END
+                ''', (key, amount, now + expiry, now, now, elastic_expiry))
+                return conn.execute('SELECT count FROM limits WHERE key = ?', (key,)).fetchone()[0]
+
+    def get(self, key: str) -> int:
+        """Текущее значение счетчика (0 - окно истекло или ключа нет)"""
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT count FROM limits WHERE key = ? AND expiry > ?', (key, time.time())
+            ).fetchone()
+        return row[0] if row else 0
+
+    def get_expiry(self, key: str) -> float:
+        """Время окончания окна (unix time)"""
+        now = time.time()
+        with self._lock:
+            row = self._connection().execute(
+                'SELECT expiry FROM limits WHERE key = ? AND expiry > ?', (key, now)
+            ).fetchone()
+        return row[0] if row else now
+
+    def check(self) -> bool:
+        """Проверка доступности базы"""
+        try:
+            with self._lock:
+                self._connection().execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> Optional[int]:
+        """Удаление всех счетчиков"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                return conn.execute('DELETE FROM limits').rowcount
+
+    def clear(self, key: str) -> None:
+        """Сброс счетчика ключа"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM limits WHERE key = ?', (key,))
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(
+                str(self.db_path), timeout=30, check_same_thread=False, isolation_level=None
+            )
+            conn.execute('PRAGMA journal_mode=WAL')
+            # Потеря последних счетчиков при сбое питания допустима
+            conn.execute('PRAGMA synchronous=NORMAL')
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS limits (
+                    key TEXT PRIMARY KEY,
+                    count INTEGER NOT NULL,
+                    expiry REAL NOT NULL
+                ) WITHOUT ROWID
+            ''')
+            self._conn = conn
+        return self._conn
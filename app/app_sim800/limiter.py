@@ -1,16 +1,42 @@
+from typing import Optional
+
 from slowapi import Limiter
-from slowapi.util import get_remote_address
 from fastapi import Request
+from starlette.types import Scope
 from config import Settings
 
+import limit_storage  # noqa: F401 - регистрация схемы sqlite:// в limits
+
 
 config = Settings()
 
 def get_client_ip(request: Request) -> str:
     """Определение IP клиента с учетом прокси"""
+    return get_scope_client_ip(request.scope)
+
+def get_scope_client_ip(scope: Scope) -> str:
+    """Определение IP клиента по ASGI scope (без создания Request).
+
+    За прокси берется адрес, который добавил сам nginx: X-Real-IP
+    ($remote_addr) или последний адрес в X-Forwarded-For. Начало
+    X-Forwarded-For приходит от клиента и может быть подделано.
+    """
     if config.behind_proxy:
-        return request.headers.get("X-Forwarded-For", get_remote_address(request))
-    return get_remote_address(request)
+        real_ip = get_scope_header(scope, b"x-real-ip")
+        if real_ip:
+            return real_ip.strip()
+        forwarded = get_scope_header(scope, b"x-forwarded-for")
+        if forwarded:
+            return forwarded.rsplit(",", 1)[-1].strip()
+    client = scope.get("client")
+    return client[0] if client else "127.0.0.1"
+
+def get_scope_header(scope: Scope, name: bytes, default: Optional[str] = None) -> Optional[str]:
+    """Значение заголовка из ASGI scope (имя в нижнем регистре)"""
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return default
 
 def rate_limit_key_func(request: Request) -> str:
     """Генерация ключа для лимитера с исключением доверенных IP"""
@@ -22,8 +48,11 @@ def rate_limit_key_func(request: Request) -> str:
     return client_ip
 
 # Инициализация лимитера с кастомной функцией
+# Счетчики в общем хранилище (SQLite или Redis), чтобы лимиты действовали
+# на все воркеры вместе, а не на каждый по отдельности
 limiter = Limiter(
     key_func=rate_limit_key_func,
     default_limits=["100/day", "5/hour"],
-    headers_enabled=True
-)
\ No newline at end of file
+    headers_enabled=True,
+    storage_uri=config.rate_limit_storage_uri
+)
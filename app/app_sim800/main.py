@@ -1,3 +1,7 @@
+import logging
+
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI, Request, status
 from fastapi.responses import JSONResponse
 from slowapi.errors import RateLimitExceeded
@@ -7,7 +11,8 @@ from config import Settings, setup_logging
 from endpoints.upload import upload_router
 from endpoints.settings import settings_router
 from endpoints.sms import router as sms_router
-from security import SecurityMiddleware, setup_cors
+from security import SecurityMiddleware, blocklist, nginx_exporter, server_error, setup_cors
+from utilits import job_worker
 
 
 # --- Инициализация конфигурации ---
@@ -16,8 +21,21 @@ config = Settings()
 # --- Логирование ---
 setup_logging(config)
 
+# --- Фоновая обработка загрузок и наблюдение за списком блокировок ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_worker.start()
+    blocklist.start()
+    if nginx_exporter is not None:
+        nginx_exporter.start()
+    yield
+    if nginx_exporter is not None:
+        nginx_exporter.stop()
+    blocklist.stop()
+    await job_worker.stop()
+
 # --- Инициализация приложения ---
-app = FastAPI(title="Camera API", version="0.0.1")
+app = FastAPI(title="Camera API", version="0.0.1", lifespan=lifespan)
 
 # --- Подключение роутеров --- 
 app.include_router(upload_router)
@@ -34,6 +52,10 @@ async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
         status_code=status.HTTP_429_TOO_MANY_REQUESTS
     )
 
+@app.exception_handler(Exception)
+async def server_error_handler(request: Request, exc: Exception):
+    return server_error()
+
 # --- Безопасность ---
 
 # Настройка CORS
@@ -46,10 +68,14 @@ app.add_middleware(SecurityMiddleware, config=config)
 # --- Запуск приложения ---
 if __name__ == "__main__":
     import uvicorn
+    if config.api_workers > 1 and config.rate_limit_storage_uri.startswith("memory://"):
+        logging.warning("Лимиты запросов в памяти считаются отдельно в каждом воркере")
     uvicorn.run(
-        app,
+        # Несколько воркеров запускаются только по строке импорта
+        "main:app" if config.api_workers > 1 else app,
         host="0.0.0.0",
         port=config.app_port_api,
+        workers=config.api_workers,
         #ssl_keyfile="key.pem",
         #ssl_certfile="cert.pem"
     )
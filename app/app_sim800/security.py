@@ -1,167 +1,110 @@
-import re
 import logging
 import asyncio
-import aiofiles
 
-from pathlib import Path
-from fastapi import Request
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.types import ASGIApp
+from starlette.types import ASGIApp, Receive, Scope, Send
 
 from config import Settings
-from limiter import get_client_ip
-
-class SecurityPatterns:
-    # Компилируем все паттерны в регулярные выражения
-    BLOCKED_PATHS = re.compile(
-        r'(\.env|\.git|config\.json|secrets\.ya?ml|php-cgi|wp-admin|adminer|backup|'
-        r'\.powenv|\.profile|cgi-bin|bin/sh|eval-stdin\.php|pearcmd|\.s3cfg|vendor/phpunit|'
-        r'think/app|Util/PHP|_info\.php|_phpinfo\.php|restore\.php|backup\.php|recovery\.php|'
-        r'_poopinfo\.php|wp-login\.php|admin\.php|config\.php|\.phpinfo|_profiler/info)',
-        re.IGNORECASE
-    )
-    
-    BLOCKED_KEYWORDS = re.compile(
-        r'(allow_url_include|auto_prepend_file|call_user_func_array|invokefunction|'
-        r'config-create|/../../|%2e%2e|xdebug_session_start|phpstorm|debug)',
-        re.IGNORECASE
-    )
-    
-    TRAVERSAL = re.compile(
-        r'(\.\./|\.\.\\|%2e%2e/|%2e%2e%2f|\.\.;/|\.\.5c|\.\.%255c|\.\.%c0%af)',
-        re.IGNORECASE
-    )
-    
-    PHP_INJECTION = re.compile(
-        r'(php://|<\?php|<\?=|phar://|expect://|zlib://|data://|glob://|ssh2://)',
-        re.IGNORECASE
-    )
-    
-    EXPLOITS = re.compile(
-        r'(s=/index/\\think\\app/invokefunction|function=call_user_func_array|'
-        r'vars\[0\]=md5|lang=../../../../../../../../)',
-        re.IGNORECASE
-    )
-    
-    USER_AGENTS = re.compile(
-        r'(nmap|sqlmap|nikto|metasploit|havij|dirbuster|wpscan|acunetix|nessus|'
-        r'firefox/14\.0a1|firefox/44\.0|chrome/3\.0\.195\.17)',
-        re.IGNORECASE
-    )
+from limiter import get_scope_client_ip, get_scope_header
+from common.security_patterns import security_matcher
+from common.blocklist import Blocklist
+from common.nginx_blocklist import NginxBlocklistExporter
 
-               
-class IPBlocker:
-    """Менеджер блокировки IP-адресов"""
-    def __init__(self, config: Settings):
-        self.config = config
-        self._blocked_ips = set()
-        self._last_modified = 0.0
-        self._lock = asyncio.Lock()
 
-    async def update_cache(self):
-        """Обновление кэша заблокированных IP"""
-        try:
-            path = Path(self.config.blocked_ips_file)
-            current_mtime = path.stat().st_mtime
-            
-            if current_mtime > self._last_modified:
-                async with self._lock:
-                    async with aiofiles.open(path, 'r', encoding='utf-8') as f:
-                        ips = await f.readlines()
-                        self._blocked_ips = {ip.strip() for ip in ips if ip.strip()}
-                    self._last_modified = current_mtime
-        except Exception as e:
-            logging.error(f"Ошибка обновления кэша IP: {e}")
+config = Settings()
 
-    async def is_blocked(self, ip: str) -> bool:
-        """Проверка блокировки IP"""
-        await self.update_cache()
-        return ip in self._blocked_ips
+# Список заблокированных IP (наблюдение за файлом запускается в lifespan приложения)
+blocklist = Blocklist(config.blocked_ips_file, config.trusted_ips, config.blocked_ip_ttl)
 
-    async def block_ip(self, ip: str, reason: str):
-        """Блокировка нового IP"""
-        if ip in self.config.trusted_ips:
-            return
+# Экспорт списка в nginx (включается параметром nginx_blocklist_path)
+nginx_exporter = NginxBlocklistExporter(
+    blocklist, config.nginx_blocklist_path, config.nginx_reload_command
+) if config.nginx_blocklist_path else None
+
+# Описание сработавших правил (common.security_patterns.RULES) для журнала
+VIOLATION_REASONS = {
+    'blocked_path': "Обнаружен опасный путь",
+    'blocked_keyword': "Обнаружено опасное ключевое слово",
+    'traversal': "Попытка обхода директорий",
+    'php_injection': "Попытка PHP-инъекции",
+    'exploit': "Обнаружен известный эксплойт",
+    'user_agent': "Обнаружен опасный User-Agent",
+    'url_length': "Слишком длинный URL",
+}
+
+# Ответы отклоненным запросам: объект ответа создается на каждый запрос,
+# т.к. Response изменяемый (заголовки, фоновые задачи)
+def access_denied() -> JSONResponse:
+    return JSONResponse({"error": "Доступ запрещен"}, status_code=403)
 
-        async with self._lock:
-            try:
-                async with aiofiles.open(self.config.blocked_ips_file, 'a', encoding='utf-8') as f:
-                    await f.write(f"{ip}\n")
-                self._blocked_ips.add(ip)
-                logging.warning(f"Заблокирован IP: {ip} - Причина: {reason}")
-            except Exception as e:
-                logging.error(f"Ошибка блокировки IP {ip}: {e}")                
-            
-            
-class SecurityMiddleware(BaseHTTPMiddleware):
-    """Middleware для обработки безопасности"""
+def threat_detected() -> JSONResponse:
+    return JSONResponse({"error": "Обнаружена угроза безопасности"}, status_code=403)
+
+def server_error() -> JSONResponse:
+    return JSONResponse({"error": "Внутренняя ошибка сервера"}, status_code=500)
+
+               
+class SecurityMiddleware:
+    """ASGI middleware безопасности.
+
+    Решение принимается только по scope (IP, путь, строка запроса, User-Agent),
+    receive/send передаются приложению без обертки, поэтому тело запроса
+    (/upload по GPRS) и ответа идут потоком без промежуточных задач и буферов.
+    """
     def __init__(self, app: ASGIApp, config: Settings):
-        super().__init__(app)
+        self.app = app
         self.config = config
-        self.ip_blocker = IPBlocker(config)
-        self.security_patterns = SecurityPatterns()
+        self.blocklist = blocklist
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        client_ip = get_scope_client_ip(scope)
 
-    async def dispatch(self, request: Request, call_next):
-        #client_ip = request.client.host if request.client else "unknown"
-        client_ip = get_client_ip(request)
-        
         # Пропускаем доверенные IP
         if client_ip in self.config.trusted_ips:
-            return await call_next(request)
-        
+            await self.app(scope, receive, send)
+            return
+
         # Проверка заблокированных IP
-        if await self.ip_blocker.is_blocked(client_ip):
+        if self.blocklist.is_blocked(client_ip):
             logging.warning(f"Попытка доступа с заблокированного IP: {client_ip}")
-            return JSONResponse(
-                {"error": "Доступ запрещен"},
-                status_code=403
-            )
+            await access_denied()(scope, receive, send)
+            return
 
         # Проверка безопасности запроса
-        if await self.check_security_violations(request, client_ip):
-            return JSONResponse(
-                {"error": "Обнаружена угроза безопасности"},
-                status_code=403
-            )
+        if await self.check_security_violations(scope, client_ip):
+            await threat_detected()(scope, receive, send)
+            return
 
-        # Обработка запроса
+        # Обработка запроса; ответ 500 отдает обработчик исключений приложения
         try:
-            return await call_next(request)
+            await self.app(scope, receive, send)
         except Exception as e:
             logging.error(f"Ошибка обработки запроса: {e}", exc_info=True)
-            await self.ip_blocker.block_ip(client_ip, f"Ошибка сервера: {str(e)}")
-            return JSONResponse(
-                {"error": "Внутренняя ошибка сервера"},
-                status_code=500
-            )
+            await self.block_ip(client_ip, f"Ошибка сервера: {str(e)}")
+            raise
 
-    async def check_security_violations(self, request: Request, client_ip: str) -> bool:
+    async def check_security_violations(self, scope: Scope, client_ip: str) -> bool:
         """Выполнение проверок безопасности"""
-        url = str(request.url).lower()
-        user_agent = request.headers.get("User-Agent", "").lower()
-        full_check = f"{request.url.path}?{request.url.query}".lower()
-
-        checks = (
-            (self.security_patterns.BLOCKED_PATHS, "Обнаружен опасный путь"),
-            (self.security_patterns.BLOCKED_KEYWORDS, "Обнаружено опасное ключевое слово"),
-            (self.security_patterns.TRAVERSAL, "Попытка обхода директорий"),
-            (self.security_patterns.PHP_INJECTION, "Попытка PHP-инъекции"),
-            (self.security_patterns.EXPLOITS, "Обнаружен известный эксплойт"),
-            (self.security_patterns.USER_AGENTS, "Обнаружен опасный User-Agent"),
+        violation = security_matcher.check(
+            scope["path"],
+            scope["query_string"].decode("latin-1"),
+            get_scope_header(scope, b"user-agent", ""),
         )
+        if violation is None:
+            return False
 
-        for pattern, reason in checks:
-            if pattern.search(full_check) or (pattern == self.security_patterns.USER_AGENTS and pattern.search(user_agent)):
-                await self.ip_blocker.block_ip(client_ip, f"{reason}: {pattern.pattern}")
-                return True
-
-        if len(url) > 512:
-            await self.ip_blocker.block_ip(client_ip, "Слишком длинный URL")
-            return True
+        rule, pattern = violation
+        await self.block_ip(client_ip, f"{VIOLATION_REASONS.get(rule, rule)}: {pattern}")
+        return True
 
-        return False
+    async def block_ip(self, ip: str, reason: str) -> None:
+        """Блокировка IP (запись в файл вне цикла событий)"""
+        await asyncio.get_event_loop().run_in_executor(None, self.blocklist.block, ip, reason)
 
 
 def setup_cors(app: ASGIApp, config: Settings) -> None:
@@ -0,0 +1,181 @@
+import csv
+import sys
+import logging
+import sqlite3
+import threading
+
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import Settings
+
+
+config = Settings()
+
+# Формат временной метки SMS от устройства
+SMS_TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%S%z"
+
+# Ключ сортировки для нераспознанных меток (datetime.min) - такие записи идут первыми
+UNPARSED_SORT_KEY = -62135596800.0
+
+
+def sort_key(timestamp: str) -> float:
+    """Ключ сортировки SMS по временной метке"""
+    try:
+        return datetime.strptime(timestamp, SMS_TIMESTAMP_FORMAT).timestamp()
+    except (ValueError, TypeError):
+        return UNPARSED_SORT_KEY
+
+
+class SmsStore:
+    """Хранилище SMS в SQLite.
+
+    Уникальность (timestamp, phone, message) обеспечивается ограничением UNIQUE,
+    порядок - индексом по (sort_key, id), поэтому вставка пачки стоит O(пачки),
+    а не O(истории). Общее количество записей поддерживается триггерами.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def add_many(self, items: Iterable[Tuple[str, str, str]]) -> Tuple[int, int]:
+        """Добавление пачки SMS (timestamp, phone, message).
+
+        :return: (кол-во новых записей, общее кол-во записей)
+        """
+        rows = [(ts, phone, message, sort_key(ts)) for ts, phone, message in items]
+        with self._lock:
+            conn = self._connection()
+            before = self._count(conn)
+            with conn:
+                conn.executemany(
+                    'INSERT OR IGNORE INTO sms (timestamp, phone, message, sort_key) VALUES (?, ?, ?, ?)',
+                    rows
+                )
+            total = self._count(conn)
+            return total - before, total
+
+    def last(self, limit: int) -> List[Dict]:
+        """Последние `limit` SMS в хронологическом порядке"""
+        return self.page(limit)[0]
+
+    def page(self, limit: int, before: Optional[int] = None,
+             after: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+        """Страница SMS и id последней добавленной SMS (курсор опроса).
+
+        Выборка стоит O(limit):
+        - без курсоров - последние `limit` записей по времени SMS;
+        - `before` - записи, предшествующие SMS с этим id (листание истории
+          по индексу (sort_key, id));
+        - `after` - записи, добавленные после SMS с этим id, в порядке
+          поступления. Опрос идет по id, а не по времени: SMS с более ранней
+          или нераспознанной меткой, пришедшая позже, тоже будет получена,
+          а удаленная SMS-курсор не останавливает опрос.
+        """
+        if after is not None:
+            query = '''
+                SELECT id, timestamp, phone, message FROM sms
+                WHERE id > ? ORDER BY id LIMIT ?
+            '''
+            params = (after, limit)
+        elif before is not None:
+            query = '''
+                SELECT id, timestamp, phone, message FROM sms
+                WHERE (sort_key, id) < (SELECT sort_key, id FROM sms WHERE id = ?)
+                ORDER BY sort_key DESC, id DESC LIMIT ?
+            '''
+            params = (before, limit)
+        else:
+            query = '''
+                SELECT id, timestamp, phone, message FROM sms
+                ORDER BY sort_key DESC, id DESC LIMIT ?
+            '''
+            params = (limit,)
+
+        with self._lock:
+            conn = self._connection()
+            # Страница и курсор читаются из одного снимка БД, поэтому SMS,
+            # добавленная между двумя запросами, не пропадет из опроса
+            conn.execute('BEGIN')
+            try:
+                rows = [dict(row) for row in conn.execute(query, params)]
+                newest_id = conn.execute('SELECT MAX(id) FROM sms').fetchone()[0]
+            finally:
+                conn.rollback()
+        return (rows if after is not None else rows[::-1]), newest_id
+
+    def count(self) -> int:
+        """Общее количество SMS"""
+        with self._lock:
+            return self._count(self._connection())
+
+    def import_csv(self, csv_path: str) -> int:
+        """Миграция: импорт SMS из CSV файла формата timestamp,phone,message"""
+        path = Path(csv_path)
+        if not path.exists():
+            return 0
+
+        with open(path, 'r', newline='', encoding='utf-8') as f:
+            rows = [
+                (row[0], row[1], row[2]) for row in csv.reader(f)
+                if len(row) >= 3 and row[:3] != ['timestamp', 'phone', 'message']
+            ]
+        inserted, total = self.add_many(rows)
+        logging.info(f"Imported {inserted} SMS from {path} (total {total})")
+        return inserted
+
+    def _count(self, conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT value FROM meta WHERE key = 'count'").fetchone()[0]
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS sms (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    timestamp TEXT NOT NULL,
+                    phone TEXT NOT NULL,
+                    message TEXT NOT NULL,
+                    sort_key REAL NOT NULL,
+                    UNIQUE (timestamp, phone, message)
+                );
+                CREATE INDEX IF NOT EXISTS idx_sms_sort ON sms (sort_key, id);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO meta (key, value) VALUES ('count', 0);
+                CREATE TRIGGER IF NOT EXISTS sms_count_insert AFTER INSERT ON sms
+                BEGIN
+                    UPDATE meta SET value = value + 1 WHERE key = 'count';
+                END;
+                CREATE TRIGGER IF NOT EXISTS sms_count_delete AFTER DELETE ON sms
+                BEGIN
+                    UPDATE meta SET value = value - 1 WHERE key = 'count';
+                END;
+            ''')
+            self._conn = conn
+        return self._conn
+
+
+sms_store = SmsStore(config.sms_db_path)
+
+
+def migrate_csv(csv_path: str = config.csv_sms_file_path) -> None:
+    """Однократный импорт старого sms.csv в пустое хранилище"""
+    try:
+        if sms_store.count() == 0:
+            sms_store.import_csv(csv_path)
+    except Exception as e:
+        logging.error(f"SMS CSV migration failed: {str(e)}", exc_info=True)
+
+
+if __name__ == "__main__":
+    # python sms_store.py [путь к sms.csv ...]
+    for path in sys.argv[1:] or [config.csv_sms_file_path]:
+        print(f"{path}: imported {sms_store.import_csv(path)}, total {sms_store.count()}")
@@ -0,0 +1,302 @@
+import os
+import csv
+import fcntl
+import logging
+import threading
+
+from contextlib import contextmanager
+from io import StringIO
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from config import Settings
+from common.rollups import TelemetryRollups
+from common.columnar import ColumnarTelemetry
+from common.devices import DevicePartitions, device_path
+
+
+config = Settings()
+
+# Порядок колонок signals.csv (читается в app_web через pd.read_csv)
+FIELDS = ['date', 'humidity', 'temperature', 'signal', 'voltage_sim', 'voltage_akb']
+
+
+class PendingRow:
+    """Строка, ожидающая групповой записи"""
+    __slots__ = ('row', 'done', 'error')
+
+    def __init__(self, row: Dict):
+        self.row = row
+        self.done = False
+        self.error: Optional[Exception] = None
+
+
+class TelemetryStore:
+    """Append-only хранилище телеметрии в CSV с индексом по дате.
+
+    Новая строка дописывается в конец файла за O(1). Индекс дат в памяти
+    позволяет заметить повтор метки времени; сами дубликаты убираются
+    фоновой компакцией (семантика drop_duplicates(subset='date', keep='last')).
+
+    Производные хранилища (агрегаты, колоночные файлы) получают каждое новое
+    показание сразу; повтор метки времени учитывается при их пересчете после
+    компакции. Производное хранилище реализует add(row), rebuild(rows), readings()
+    и accepts(date) - учитывает ли оно показание с такой датой.
+
+    Файл может писаться несколькими воркерами: запись и компакция выполняются
+    под fcntl.flock на соседнем файле '<имя>.lock' (сам CSV заменяется при
+    компакции), строки других воркеров дочитываются в индекс с места, где он
+    остановился. Строки из параллельных запросов, накопившиеся за время
+    текущей записи, дописываются следующей записью одним write и одним fsync
+    (групповая фиксация).
+    """
+    def __init__(self, csv_path: str, compact_delay: float = 60.0,
+                 sinks: Iterable = (), fsync: bool = True):
+        self.path = Path(csv_path)
+        self.lock_path = self.path.with_name(f"{self.path.name}.lock")
+        self.compact_delay = compact_delay
+        self.sinks = list(sinks)
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._pending_lock = threading.Lock()
+        self._pending: List[PendingRow] = []
+        self._index: Dict[str, int] = {}  # дата -> кол-во строк с этой датой
+        self._indexed_size = -1           # размер файла, которому соответствует индекс
+        self._indexed_inode: Optional[int] = None
+        self._needs_newline = False
+        self._duplicates = 0
+        self._compact_timer: Optional[threading.Timer] = None
+
+    def append(self, row: Dict) -> None:
+        """Дописывание строки телеметрии в конец файла.
+
+        Возвращается после записи строки на диск. Поток, захвативший запись,
+        забирает все накопившиеся строки; остальные ждут и находят свою
+        строку уже записанной.
+        """
+        pending = PendingRow(row)
+        with self._pending_lock:
+            self._pending.append(pending)
+
+        with self._lock:
+            if not pending.done:
+                with self._pending_lock:
+                    batch, self._pending = self._pending, []
+                try:
+                    self._write_batch([item.row for item in batch])
+                except Exception as e:
+                    for item in batch:
+                        item.error = e
+                finally:
+                    for item in batch:
+                        item.done = True
+
+        if pending.error is not None:
+            raise pending.error
+
+    def _write_batch(self, rows: List[Dict]) -> None:
+        """Запись группы строк одним write и одним fsync (вызывается под self._lock)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._file_lock():
+            self._sync_index()
+
+            buffer = StringIO()
+            writer = csv.writer(buffer, lineterminator='\n')
+            if self._indexed_size == 0:
+                writer.writerow(FIELDS)
+            elif self._needs_newline:
+                buffer.write('\n')
+            writer.writerows([row.get(field, 'N/A') for field in FIELDS] for row in rows)
+            data = buffer.getvalue().encode('utf-8')
+
+            with open(self.path, 'ab') as f:
+                f.write(data)
+                if self.fsync:
+                    f.flush()
+                    os.fsync(f.fileno())
+                self._indexed_inode = os.fstat(f.fileno()).st_ino
+            self._indexed_size += len(data)
+            self._needs_newline = False
+
+            for row in rows:
+                date = row['date']
+                if date in self._index:
+                    self._duplicates += 1
+                else:
+                    self._update_sinks(row)
+                self._index[date] = self._index.get(date, 0) + 1
+
+        if self._duplicates:
+            self._schedule_compaction()
+
+    def compact(self) -> None:
+        """Удаление дубликатов по дате (остается последняя запись)"""
+        with self._lock:
+            self._compact_timer = None
+            with self._file_lock():
+                self._sync_index()
+            if not self._duplicates:
+                return
+            snapshot_size = self._indexed_size
+            snapshot_inode = self._indexed_inode
+
+        # Тяжелая часть выполняется без блокировки: новые строки продолжают дописываться
+        try:
+            with open(self.path, 'rb') as f:
+                content = f.read(snapshot_size).decode('utf-8')
+            rows = self._dedup(content)
+
+            # Свой временный файл у каждого воркера: компакции могут идти параллельно
+            tmp_path = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f, lineterminator='\n')
+                writer.writerow(FIELDS)
+                writer.writerows(rows)
+
+            with self._lock, self._file_lock():
+                if self.path.stat().st_ino != snapshot_inode:
+                    # Файл уже уплотнил другой воркер
+                    tmp_path.unlink()
+                    self._sync_index()
+                    return
+                # Переносим строки, дописанные во время компакции
+                with open(self.path, 'rb') as src, open(tmp_path, 'ab') as dst:
+                    src.seek(snapshot_size)
+                    dst.write(src.read())
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.replace(tmp_path, self.path)
+                self._rebuild_index(rebuild_sinks=True)
+                if self._duplicates:
+                    self._schedule_compaction()
+            logging.info(f"Telemetry compaction done: {self.path}")
+        except Exception as e:
+            logging.error(f"Telemetry compaction failed: {str(e)}", exc_info=True)
+
+    @contextmanager
+    def _file_lock(self):
+        """Блокировка записи между процессами"""
+        with open(self.lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _sync_index(self) -> None:
+        """Обновление индекса, если файл изменился не через это хранилище.
+
+        Строки, дописанные другим воркером, дочитываются с конца индекса
+        (производные хранилища этот воркер уже обновил); замененный или
+        укороченный файл индексируется заново.
+        """
+        try:
+            stat = self.path.stat()
+            size, inode = stat.st_size, stat.st_ino
+        except FileNotFoundError:
+            size, inode = 0, None
+
+        if size == self._indexed_size and inode == self._indexed_inode:
+            return
+        if inode is None or inode != self._indexed_inode or size < self._indexed_size or self._needs_newline:
+            self._rebuild_index()
+            return
+
+        with open(self.path, 'rb') as f:
+            f.seek(self._indexed_size)
+            delta = f.read(size - self._indexed_size)
+        self._indexed_size += len(delta)
+        self._needs_newline = not delta.endswith(b'\n')
+        self._index_rows(csv.reader(StringIO(delta.decode('utf-8'))))
+        if self._duplicates:
+            self._schedule_compaction()
+
+    def _rebuild_index(self, rebuild_sinks: bool = False) -> None:
+        """Построение индекса дат по содержимому файла"""
+        self._index = {}
+        self._duplicates = 0
+        self._needs_newline = False
+
+        if not self.path.exists():
+            self._indexed_size = 0
+            self._indexed_inode = None
+            return
+
+        with open(self.path, 'rb') as f:
+            content = f.read()
+            self._indexed_inode = os.fstat(f.fileno()).st_ino
+        self._indexed_size = len(content)
+        self._needs_newline = bool(content) and not content.endswith(b'\n')
+
+        reader = csv.reader(StringIO(content.decode('utf-8')))
+        next(reader, None)  # заголовок
+        self._index_rows(reader)
+
+        if self._duplicates:
+            self._schedule_compaction()
+        else:
+            # Производные хранилища пересчитываются после компакции и при расхождении
+            # с файлом (первый запуск, правка файла вручную)
+            self._rebuild_sinks(content, force=rebuild_sinks)
+
+    def _index_rows(self, reader: Iterable[List[str]]) -> None:
+        for row in reader:
+            if not row:
+                continue
+            if row[0] in self._index:
+                self._duplicates += 1
+            self._index[row[0]] = self._index.get(row[0], 0) + 1
+
+    def _update_sinks(self, row: Dict) -> None:
+        for sink in self.sinks:
+            try:
+                sink.add(row)
+            except Exception as e:
+                logging.error(f"Telemetry {type(sink).__name__} update failed: {str(e)}", exc_info=True)
+
+    def _rebuild_sinks(self, content: bytes, force: bool = False) -> None:
+        rows = None
+        for sink in self.sinks:
+            try:
+                # Строки с датой, которую хранилище не учитывает ('N/A'), не в счет
+                expected = sum(1 for date in self._index if sink.accepts(date))
+                if not force and sink.readings() == expected:
+                    continue
+                if rows is None:
+                    rows = list(csv.DictReader(StringIO(content.decode('utf-8'))))
+                sink.rebuild(rows)
+                logging.info(f"Telemetry {type(sink).__name__} rebuilt: {expected} readings")
+            except Exception as e:
+                logging.error(f"Telemetry {type(sink).__name__} rebuild failed: {str(e)}", exc_info=True)
+
+    @staticmethod
+    def _dedup(content: str) -> List[List[str]]:
+        """Дедупликация строк по дате с сохранением последней записи"""
+        reader = csv.reader(StringIO(content))
+        next(reader, None)  # заголовок
+        unique: Dict[str, List[str]] = {}
+        for row in reader:
+            if not row:
+                continue
+            unique.pop(row[0], None)
+            unique[row[0]] = row
+        return list(unique.values())
+
+    def _schedule_compaction(self) -> None:
+        """Отложенный запуск компакции в фоновом потоке"""
+        if self._compact_timer is not None:
+            return
+        self._compact_timer = threading.Timer(self.compact_delay, self.compact)
+        self._compact_timer.daemon = True
+        self._compact_timer.start()
+
+
+def create_telemetry_store(device: str) -> TelemetryStore:
+    """Хранилище телеметрии раздела устройства (CSV, агрегаты, колоночные файлы)"""
+    sinks = [TelemetryRollups(str(device_path(config.rollups_db_path, device)))]
+    if config.telemetry_columnar:
+        sinks.append(ColumnarTelemetry(str(device_path(config.telemetry_columnar_dir, device))))
+    return TelemetryStore(str(device_path(config.csv_file_path, device)), sinks=sinks)
+
+
+telemetry_stores = DevicePartitions(create_telemetry_store)
@@ -1,4 +1,6 @@
+import os
 import json
+import hashlib
 import logging
 import asyncio
 import aiofiles
@@ -6,19 +8,33 @@ import aiofiles
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
-from typing import Tuple, List, Dict
-from io import StringIO
+from typing import AsyncIterator, Tuple, List, Dict, NamedTuple, Optional
 
-import pandas as pd
 from fastapi import UploadFile, HTTPException
 from werkzeug.utils import secure_filename
 
 from config import Settings
-from security import SecurityPatterns
+from telemetry import telemetry_stores
+from common.devices import DevicePartitions, device_partition, device_path, parse_devices
+from common.image_index import ImageIndex
+from common.thumbnails import ThumbnailPool
+from common.phash import dhash, distance
+from common.enhance import enhance_file
+from common.security_patterns import traversal_matcher
+from jobs import JobWorker, job_queue
 
 
 config = Settings()
 executor = ThreadPoolExecutor()
+devices = parse_devices(config.devices)
+# Индекс кадров и миниатюры - отдельно для каждого устройства
+image_indexes = DevicePartitions(lambda device: ImageIndex(
+    str(device_path(config.image_folder, device)), str(device_path(config.image_index_path, device))
+))
+thumbnail_pools = DevicePartitions(lambda device: ThumbnailPool(
+    str(device_path(config.image_folder, device)), str(device_path(config.thumbnail_folder, device)),
+    config.thumbnail_workers
+))
 
 
 async def run_in_thread(func, *args, **kwargs):
@@ -33,35 +49,115 @@ def validate_filename(filename: str, config: Settings) -> bool:
     return (
         '.' in filename and 
         filename.rsplit('.', 1)[1].lower() in config.image_extensions and
-        SecurityPatterns.TRAVERSAL.search(filename) is None
+        traversal_matcher.search(filename) is None
     )
         
 async def process_upload(file: UploadFile, config: Settings) -> Dict:
-    """Основной процесс обработки загрузки файла"""
+    """Основной процесс обработки загрузки файла.
+
+    Ответ отдается сразу после записи файла на диск; статистика, миниатюра
+    и очистка директории выполняются очередью задач.
+    """
     try:
-        file_path = await save_file(file, config)
-        await update_stats(file_path, config)
-        await clean_directory(config)
-        return {"filename": file.filename}
+        saved = await save_file(file, config)
+        if not saved.duplicate:
+            await enqueue_post_upload(saved.path)
+        return {"filename": file.filename, "duplicate": saved.duplicate}
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Upload processing failed: {str(e)}", exc_info=True)
         raise HTTPException(500, "File processing error")
 
-async def save_file(file: UploadFile, config: Settings) -> Path:
-    """Сохранение файла с генерацией безопасного имени"""
-    upload_dir = Path(config.image_folder)
-    upload_dir.mkdir(exist_ok=True)
-    
-    safe_name = secure_filename(file.filename)
+async def process_raw_upload(stream: AsyncIterator[bytes], filename: str, config: Settings) -> Dict:
+    """Обработка загрузки с телом application/octet-stream"""
+    try:
+        saved = await save_stream(stream, filename, config)
+        if not saved.duplicate:
+            await enqueue_post_upload(saved.path)
+        return {"filename": filename, "duplicate": saved.duplicate}
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Raw upload processing failed: {str(e)}", exc_info=True)
+        raise HTTPException(500, "File processing error")
+
+
+class SavedUpload(NamedTuple):
+    path: Path        # сохраненный кадр (для повтора - ранее сохраненный)
+    duplicate: bool   # повтор недавней загрузки, файл не записан
+
+
+def upload_path(filename: str, config: Settings) -> Path:
+    """Путь для нового кадра с безопасным именем (в разделе устройства)"""
+    safe_name = secure_filename(filename)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_path = upload_dir / f"{timestamp}_{safe_name}"
-    
-    async with aiofiles.open(file_path, "wb") as buffer:
+    name = f"{timestamp}_{safe_name}"
+
+    upload_dir = device_path(config.image_folder, device_partition(name, config.default_device, devices))
+    upload_dir.mkdir(parents=True, exist_ok=True)
+    return upload_dir / name
+
+async def save_file(file: UploadFile, config: Settings) -> SavedUpload:
+    """Сохранение файла с генерацией безопасного имени"""
+    async def chunks() -> AsyncIterator[bytes]:
         while content := await file.read(1024 * 1024):  # 1MB chunks
-            await buffer.write(content)
-    
-    return file_path
+            yield content
+
+    return await save_stream(chunks(), file.filename, config)
+
+async def save_stream(stream: AsyncIterator[bytes], filename: str, config: Settings) -> SavedUpload:
+    """Прием тела запроса и запись кадра в каталог устройства.
 
+    Тело накапливается в памяти (не больше max_upload_size, при превышении
+    прием прерывается с 413) с подсчетом sha256. Повтор кадра после таймаута
+    AT+HTTPACTION имеет то же содержимое, но получает новое имя (время
+    сервера): если хеш уже зарегистрирован в индексе кадров устройства за
+    последние upload_dedup_ttl секунд, повтор подтверждается без записи на
+    диск. Новый кадр пишется в скрытый .part файл и после fsync
+    переименовывается в итоговый.
+    """
+    digest = hashlib.sha256()
+    chunks = []
+    size = 0
+    async for chunk in stream:
+        size += len(chunk)
+        if size > config.max_upload_size:
+            raise HTTPException(413, "File too large")
+        digest.update(chunk)
+        chunks.append(chunk)
+    if size == 0:
+        raise HTTPException(400, "Empty file")
+
+    file_path = upload_path(filename, config)
+    part_path = file_path.with_name(f".{file_path.name}.part")
+    # Раздел, а не USER_ID из имени: число ключей ограничено списком devices
+    device = device_partition(file_path.name, config.default_device, devices)
+    image_index = image_indexes.get(device)
+
+    # Индекс общий для всех воркеров uvicorn: повтор может попасть в другой воркер
+    original = await run_in_thread(
+        image_index.reserve_upload, digest.hexdigest(), file_path.name, config.upload_dedup_ttl
+    )
+    if original is not None:
+        logging.info(f"Duplicate upload from device {device or config.default_device} acknowledged: {original}")
+        return SavedUpload(file_path.with_name(original), True)
+
+    dir_mtime_ns = await run_in_thread(image_index.dir_mtime_ns)
+    try:
+        async with aiofiles.open(part_path, "wb") as buffer:
+            for chunk in chunks:
+                await buffer.write(chunk)
+            await buffer.flush()
+            await run_in_thread(os.fsync, buffer.fileno())
+        await run_in_thread(os.replace, part_path, file_path)
+    except BaseException:
+        await run_in_thread(image_index.release_upload, digest.hexdigest(), file_path.name)
+        await run_in_thread(part_path.unlink, missing_ok=True)
+        raise
+
+    await run_in_thread(image_index.add, file_path.name, dir_mtime_ns)
+    return SavedUpload(file_path, False)
 
 
 def extract_info_from_filename(filename: str) -> Tuple:
@@ -90,94 +186,178 @@ def extract_info_from_filename(filename: str) -> Tuple:
         logging.warning(f"Error parsing filename {filename}: {str(e)}")
         return ('N/A',) * 7
 
-async def update_stats(file_path: Path, config: Settings) -> None:
-    """Обновление статистики в CSV файле"""
+async def update_stats(file_path: Path, config: Settings, device: str = '') -> None:
+    """Обновление статистики в CSV файле устройства"""
     try:
         data = await parse_file_data(file_path.name, config)
-        await write_to_csv(data, config.csv_file_path)
+        await run_in_thread(telemetry_stores.get(device).append, data)
     except Exception as e:
         logging.error(f"Failed to update stats: {str(e)}", exc_info=True)
         raise
 
-async def parse_file_data(filename: str, config: Settings) -> pd.DataFrame:
+async def parse_file_data(filename: str, config: Settings) -> Dict:
     """Парсинг данных из имени файла"""
     file_info = await run_in_thread(extract_info_from_filename, filename)
-    return pd.DataFrame({
-        'date': [file_info[4]],
-        'humidity': [file_info[5]],
-        'temperature': [file_info[6]],
-        'signal': [file_info[2]],
-        'voltage_sim': [file_info[0]],
-        'voltage_akb': [file_info[1]]
-    })
-
-async def write_to_csv(new_df: pd.DataFrame, csv_path: str) -> None:
-    """Асинхронная запись данных в CSV"""
-    path = Path(csv_path)
-    
-    # Чтение существующих данных
-    existing_df = await read_existing_csv(path) if await run_in_thread(path.exists) else pd.DataFrame()
-
-    # Объединение и дедупликация
-    combined_df = await run_in_thread(
-        lambda: pd.concat([existing_df, new_df])
-                  .drop_duplicates(subset='date', keep='last')
-    )
+    return {
+        'date': file_info[4],
+        'humidity': file_info[5],
+        'temperature': file_info[6],
+        'signal': file_info[2],
+        'voltage_sim': file_info[0],
+        'voltage_akb': file_info[1]
+    }
 
-    # Асинхронная запись
-    async with aiofiles.open(path, 'w') as f:
-        csv_content = await run_in_thread(
-            combined_df.to_csv, 
-            index=False, 
-            lineterminator='\n'
-        )
-        await f.write(csv_content)
-
-async def read_existing_csv(path: Path) -> pd.DataFrame:
-    """Чтение существующего CSV файла"""
+async def clean_directory(config: Settings, device: str = '') -> List[str]:
+    """Очистка директории устройства от старых файлов (лимит - на каждое устройство)"""
     try:
-        async with aiofiles.open(path, 'r') as f:
-            content = await f.read()
-            return await run_in_thread(pd.read_csv, StringIO(content))
-    except Exception as e:
-        logging.warning(f"Error reading CSV {path}: {str(e)}")
-        return pd.DataFrame()
+        image_dir = device_path(config.image_folder, device)
+        image_index = image_indexes.get(device)
 
-async def clean_directory(config: Settings) -> List[str]:
-    """Очистка директории от старых файлов"""
-    try:
-        image_dir = Path(config.image_folder)
-        if not await run_in_thread(image_dir.exists):
-            return []
+        if config.retention_dedup:
+            rows = await run_in_thread(image_index.rows)
+            old_files = await run_in_thread(retention_candidates, rows, config)
+        else:
+            # Самые старые файлы сверх лимита выбираются по индексу
+            old_files = await run_in_thread(image_index.evict_candidates, config.display_last_images)
 
-        # Получение и сортировка файлов
-        image_files = await get_sorted_images(image_dir)
-        
         # Удаление старых файлов
-        await delete_old_files(image_files, config.display_last_images)
-        
-        return [str(f) for f in image_files[:config.display_last_images]]
+        await delete_old_files([image_dir / name for name in old_files], device)
+
+        latest = await run_in_thread(image_index.latest, config.display_last_images)
+        return [str(image_dir / name) for name in reversed(latest)]
     except Exception as e:
         logging.error(f"Directory cleanup failed: {str(e)}", exc_info=True)
         raise
 
-async def get_sorted_images(image_dir: Path) -> List[Path]:
-    """Получение отсортированного списка изображений"""
-    return await run_in_thread(
-        lambda: sorted(
-            image_dir.glob('*.jpg'),
-            key=lambda x: x.stat().st_mtime,
-            reverse=True
-        )
-    )
+def wakeup_code(name: str) -> str:
+    """Код причины пробуждения из имени кадра"""
+    parts = Path(name).stem.split('_')
+    return parts[8] if len(parts) > 8 else ''
+
+def retention_candidates(rows: List[Tuple[str, float, Optional[int]]], config: Settings) -> List[str]:
+    """Кадры сверх лимита с учетом перцептивных хешей.
+
+    Последние кадры по датчику движения (до доли retention_motion_share от
+    лимита) не вытесняются плановыми кадрами. Из остальных сначала удаляются
+    почти одинаковые кадры (dHash в пределах retention_dedup_distance от
+    предыдущего сохраняемого кадра), затем самые старые.
+
+    :param rows: (имя, mtime, phash) в порядке от новых к старым.
+    """
+    keep_count = config.display_last_images
+    if len(rows) <= keep_count:
+        return []
+
+    motion_budget = int(keep_count * config.retention_motion_share)
+    protected = set()
+    pool = []
+    for name, _, value in rows:
+        if wakeup_code(name) in config.motion_wakeup_reasons and len(protected) < motion_budget:
+            protected.add(name)
+        else:
+            pool.append((name, value))
+
+    excess = len(pool) - (keep_count - len(protected))
+    if excess <= 0:
+        return []
+
+    # Почти одинаковые кадры: от старых к новым относительно последнего оставленного
+    # (самый новый кадр остается всегда)
+    duplicates = []
+    reference = None
+    for name, value in reversed(pool[1:]):
+        if value is not None and distance(value, reference) <= config.retention_dedup_distance:
+            duplicates.append(name)
+        else:
+            reference = value
 
-async def delete_old_files(files: List[Path], keep_count: int) -> None:
+    candidates = duplicates[:excess]
+    if len(candidates) < excess:
+        chosen = set(candidates)
+        oldest = [name for name, _ in reversed(pool) if name not in chosen]
+        candidates += oldest[:excess - len(candidates)]
+    return candidates
+
+async def delete_old_files(files: List[Path], device: str = '') -> None:
     """Удаление файлов сверх лимита"""
-    for file in files[keep_count:]:
+    thumbnails = thumbnail_pools.get(device)
+    image_index = image_indexes.get(device)
+    dir_mtime_ns = await run_in_thread(image_index.dir_mtime_ns)
+    deleted = []
+    for file in files:
         try:
             await run_in_thread(file.unlink)
+            deleted.append(file.name)
+        except FileNotFoundError:
+            deleted.append(file.name)
         except Exception as e:
             logging.warning(f"Error deleting {file}: {str(e)}")
+            continue
+        await run_in_thread(thumbnails.remove, file.name)
+    await run_in_thread(image_index.remove, deleted, dir_mtime_ns)
+
+async def enqueue_post_upload(file_path: Path) -> None:
+    """Постановка отложенной обработки загруженного файла"""
+    device = device_partition(file_path.name, config.default_device, devices)
+    payload = {"name": file_path.name, "device": device}
+    jobs = [("update_stats", payload)]
+    if config.enhance_uploads:
+        jobs.append(("enhance", payload))
+    jobs += [
+        ("phash", payload),
+        ("thumbnail", payload),
+        ("clean_directory", {"device": device}),
+    ]
+    await run_in_thread(job_queue.enqueue, jobs)
+    job_worker.notify()
+
+# Задачи, поставленные до разделения по устройствам, не содержат "device"
+def job_image_path(payload: Dict) -> Path:
+    return device_path(config.image_folder, payload.get("device", "")) / payload["name"]
+
+async def job_update_stats(payload: Dict) -> None:
+    await update_stats(job_image_path(payload), config, payload.get("device", ""))
+
+async def job_thumbnail(payload: Dict) -> None:
+    if not job_image_path(payload).exists():
+        return  # кадр уже удален очисткой
+    future = thumbnail_pools.get(payload.get("device", "")).submit(payload["name"])
+    if future is None:
+        raise RuntimeError("Thumbnail queue is full")
+    await asyncio.wrap_future(future)
+
+async def job_enhance(payload: Dict) -> None:
+    file_path = job_image_path(payload)
+    if not file_path.exists():
+        return  # кадр уже удален очисткой
+    # Задачи выполняются не менее одного раза: повтор не должен
+    # перекодировать уже скорректированный JPEG
+    image_index = image_indexes.get(payload.get("device", ""))
+    if not await run_in_thread(image_index.claim_enhance, payload["name"]):
+        return
+    try:
+        await run_in_thread(enhance_file, file_path, file_path)
+    except Exception:
+        await run_in_thread(image_index.release_enhance, payload["name"])
+        raise
+
+async def job_phash(payload: Dict) -> None:
+    file_path = job_image_path(payload)
+    if not file_path.exists():
+        return  # кадр уже удален очисткой
+    value = await run_in_thread(dhash, file_path)
+    await run_in_thread(image_indexes.get(payload.get("device", "")).set_phash, payload["name"], value)
+
+async def job_clean_directory(payload: Dict) -> None:
+    await clean_directory(config, payload.get("device", ""))
+
+job_worker = JobWorker(job_queue, {
+    "update_stats": job_update_stats,
+    "enhance": job_enhance,
+    "phash": job_phash,
+    "thumbnail": job_thumbnail,
+    "clean_directory": job_clean_directory,
+})
 
 async def load_cached_settings(config: Settings) -> Dict:
     """Загрузка настроек из JSON файла"""
@@ -200,4 +380,54 @@ def flatten_settings(data: Dict, prefix: str = '') -> Dict:
                 result[current_key] = value['current']
             else:
                 result.update(flatten_settings(value, f"{current_key}_"))
-    return result
\ No newline at end of file
+    return result
+
+
+class FlatSettings(NamedTuple):
+    """Готовый ответ /settings-flat для одной ревизии настроек"""
+    body: bytes
+    etag: str
+    version: str
+
+
+def build_flat_settings(settings: Dict) -> FlatSettings:
+    """Сериализация плоских настроек с версией (хэш содержимого)"""
+    flat = flatten_settings(settings)
+    content = json.dumps(flat, ensure_ascii=False, separators=(',', ':'))
+    version = hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+    body = json.dumps(
+        {**flat, 'settings_version': version},
+        ensure_ascii=False,
+        separators=(',', ':')
+    ).encode('utf-8')
+    return FlatSettings(body=body, etag=f'"{version}"', version=version)
+
+
+class FlatSettingsCache:
+    """Кэш плоских настроек: файл читается и разбирается только при его изменении"""
+    def __init__(self, config: Settings):
+        self.config = config
+        self._revision = None
+        self._payload = None
+
+    async def get(self) -> FlatSettings:
+        """Ответ для текущей ревизии файла настроек"""
+        config_file = Path(self.config.camera_config_path)
+        try:
+            stat = config_file.stat()
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Config file {config_file} not found")
+
+        revision = (stat.st_mtime_ns, stat.st_size)
+        if revision != self._revision:
+            settings = await load_cached_settings(self.config)
+            self._payload = await run_in_thread(build_flat_settings, settings)
+            self._revision = revision
+        return self._payload
+
+    def invalidate(self) -> None:
+        """Сброс кэша после изменения настроек"""
+        self._revision = None
+
+
+flat_settings_cache = FlatSettingsCache(config)
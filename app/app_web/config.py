@@ -1,6 +1,8 @@
 import os
 from datetime import timedelta
 
+from common.devices import parse_devices
+
 
 USE_NGINX = os.environ.get('USE_NGINX', False)
 USE_HTTPS = os.environ.get('USE_HTTPS', True)
@@ -64,14 +66,24 @@ class ConfigApp:
 
 class ConfigMain:    
 
-    # Глубина фотоархива (кол-во кадров)
+    # Глубина фотоархива (кол-во кадров на устройство)
     DISPLAY_N_LAST_IMAGES = 1000
 
+    # Устройство, данные которого лежат по исходным путям (устройства из DEVICES - в
+    # static/devices/<id>/..., data/devices/<id>/..., data/csv/devices/<id>/...);
+    # должно совпадать с DEFAULT_DEVICE sim800-api
+    DEFAULT_DEVICE = os.environ.get('DEFAULT_DEVICE', '')
+    # Устройства с отдельными разделами ('A,B7,cam-2'); должен совпадать с DEVICES sim800-api
+    DEVICES = parse_devices(os.environ.get('DEVICES', ''))
+
     # Максимальная задержка между кадрами для "поднятия тревоги" (в минутах)
     CAMERA_UPDATE_MINUTES = 30 + 3
 
     # Путь к папке для сохранения изображений в методе /upload 
     IMAGE_FOLDER = 'static/images'
+
+    # Путь к индексу изображений (SQLite, общий с sim800-api)
+    IMAGE_INDEX_PATH = 'data/images.db'
     
     # Разрешенные форматы присылаемых кадров в методе /upload 
     IMAGE_EXTENSIONS = {'jpg'} # 'jpg', 'jpeg', 'png', 'bmp'
@@ -79,12 +91,43 @@ class ConfigMain:
     # Путь к csv файлу для сбора статистики
     CSV_FILE_PATH = 'data/csv/signals.csv'
 
+    # Путь к почасовым/посуточным агрегатам телеметрии (SQLite, ведет sim800-api)
+    ROLLUPS_DB_PATH = 'data/rollups.db'
+
+    # Колоночное хранилище телеметрии (memmap, ведет sim800-api при TELEMETRY_COLUMNAR)
+    TELEMETRY_COLUMNAR = os.environ.get('TELEMETRY_COLUMNAR', False)
+    TELEMETRY_COLUMNAR_DIR = 'data/telemetry'
+
+    # Кэш графиков /api/plot (кол-во графиков в памяти)
+    CHART_CACHE_SIZE = 32
+
+    # Частота перерисовки графика, пока камера не выходит на связь (в секундах)
+    CHART_ALARM_REFRESH_SECONDS = 5 * 60
+
+    # Фоновая отрисовка графиков сразу после поступления новых данных
+    CHART_PRERENDER = os.environ.get('CHART_PRERENDER', False)
+    CHART_PRERENDER_INTERVAL_SECONDS = 10
+
+    # Количество точек на метрику в /api/series (по умолчанию и максимум)
+    SERIES_DEFAULT_POINTS = 500
+    SERIES_MAX_POINTS = 2000
+
     # Путь к конфигу с настрйоками устройства
     CAMERA_CONFIG_PATH = 'camera_settings.json'
     
     # Путь к файлу с заблокированными ip
     BLOCKED_IPS_FILE_PATH = 'blocked_ips.txt'
     
+    # Срок автоматической блокировки IP в секундах (0 - бессрочно). Веб-интерфейс
+    # блокирует людей, а не модем: ложное срабатывание не должно быть вечным
+    BLOCKED_IP_TTL = int(os.environ.get('BLOCKED_IP_TTL', 24 * 60 * 60))
+    
+    # Целевое время проверки пароля (мс): по нему при старте подбирается стоимость bcrypt
+    PASSWORD_HASH_TARGET_MS = int(os.environ.get('PASSWORD_HASH_TARGET_MS', 250))
+    # Потоки для bcrypt и макс. кол-во ожидающих проверок (остальные получают 503)
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 1))
+    PASSWORD_HASH_QUEUE = int(os.environ.get('PASSWORD_HASH_QUEUE', 4))
+    
     # Путь к файлу для сохранения логов
     FLASK_LOGS_FILE_PATH = 'web.log'
     
@@ -1,7 +1,8 @@
-from database import init_db, add_user
+from database import init_db, add_user, calibrate_hash_cost
 
 if __name__ == '__main__':
     init_db()
+    calibrate_hash_cost()
     if add_user('admin', 'admin_password'):
         print("Admin user created successfully")
     else:
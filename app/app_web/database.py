@@ -1,8 +1,91 @@
+import math
+import time
+import queue
+import logging
 import sqlite3
+import threading
 import bcrypt
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
+from config import ConfigMain
+
+logger = logging.getLogger(__name__)
+
 DATABASE_NAME = 'data/users.db'
+POOL_SIZE = 4           # Сколько простаивающих соединений держать открытыми
+USER_CACHE_SIZE = 256   # Пользователей в кэше get_user_by_id
+USER_CACHE_TTL = 300    # Секунд до повторного чтения пользователя из БД
+
+MIN_HASH_COST = 10      # Нижняя граница стоимости bcrypt независимо от скорости CPU
+MAX_HASH_COST = 15
+DEFAULT_HASH_COST = 12  # До калибровки (как bcrypt.gensalt())
+HASH_PROBES = 5         # Замеров при калибровке (берется самый быстрый)
+
+_pool: 'queue.LifoQueue[sqlite3.Connection]' = queue.LifoQueue(maxsize=POOL_SIZE)
+
+# bcrypt отпускает GIL, поэтому проверка в отдельном потоке не останавливает
+# остальные запросы; число одновременных проверок ограничено
+_hash_executor = ThreadPoolExecutor(
+    max_workers=ConfigMain.PASSWORD_HASH_WORKERS, thread_name_prefix='bcrypt'
+)
+_hash_slots = threading.BoundedSemaphore(
+    ConfigMain.PASSWORD_HASH_WORKERS + ConfigMain.PASSWORD_HASH_QUEUE
+)
+_hash_cost = DEFAULT_HASH_COST
+
+
+class PasswordCheckBusy(Exception):
+    """Очередь проверки паролей заполнена"""
+
+
+class UserCache:
+    """LRU-кэш пользователей по id с ограниченным сроком жизни записей
+
+    load_user вызывается на каждый запрос авторизованного пользователя,
+    кэш избавляет эти запросы от чтения с SD-карты. Записи удаляются при
+    изменении пользователей (invalidate) и перечитываются через
+    USER_CACHE_TTL секунд, поэтому изменения из другого процесса
+    (create_admin.py) видны без перезапуска.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: 'OrderedDict[str, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        key = str(user_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            user, expires = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return user
+
+    def put(self, user_id, user):
+        with self._lock:
+            self._entries[str(user_id)] = (user, time.monotonic() + self.ttl)
+            self._entries.move_to_end(str(user_id))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_id=None):
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(user_id), None)
+
+
+user_cache = UserCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
 
 def init_db():
     with db_connection() as conn:
@@ -13,19 +96,111 @@ def init_db():
             password_hash TEXT NOT NULL
         )
         ''')
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS settings (
+            key TEXT PRIMARY KEY,
+            value TEXT NOT NULL
+        )
+        ''')
         conn.commit()
 
+def _connect():
+    conn = sqlite3.connect(DATABASE_NAME, timeout=30, check_same_thread=False)
+    conn.row_factory = sqlite3.Row  # Для доступа к полям по имени
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
 @contextmanager
 def db_connection():
-    conn = sqlite3.connect(DATABASE_NAME)
-    conn.row_factory = sqlite3.Row  # Для доступа к полям по имени
+    """Соединение из пула (открывается только при пустом пуле)
+
+    Соединение не закрывается после запроса, поэтому sqlite3 переиспользует
+    подготовленные выражения из своего кэша. Пул общий для потоков:
+    dev-сервер Flask создает новый поток на каждый запрос.
+    """
+    try:
+        conn = _pool.get_nowait()
+    except queue.Empty:
+        conn = _connect()
     try:
         yield conn
     finally:
-        conn.close()
+        if conn.in_transaction:
+            conn.rollback()  # Незавершенная транзакция не должна держать блокировку
+        try:
+            _pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+def calibrate_hash_cost(target_ms=ConfigMain.PASSWORD_HASH_TARGET_MS, force=False):
+    """Подбор стоимости bcrypt под целевое время проверки на этом CPU
+
+    Время хеширования удваивается с каждой единицей стоимости, поэтому
+    достаточно замерить быструю стоимость и экстраполировать. Берется
+    самый быстрый из нескольких замеров (после прогрева), а результат
+    сохраняется в БД: при перезапусках стоимость не колеблется на
+    границе округления. Повторный замер - при смене target_ms или force.
+    """
+    global _hash_cost
+    stored = _load_hash_cost(target_ms)
+    if stored is not None and not force:
+        _hash_cost = stored
+        logger.info(f"bcrypt cost {_hash_cost} (calibrated earlier, target {target_ms} ms)")
+        return _hash_cost
+
+    probe_cost = 8
+    salt = bcrypt.gensalt(rounds=probe_cost)
+    bcrypt.hashpw(b'calibration', salt)  # прогрев
+    timings = []
+    for _ in range(HASH_PROBES):
+        started = time.perf_counter()
+        bcrypt.hashpw(b'calibration', salt)
+        timings.append(time.perf_counter() - started)
+    elapsed_ms = max(min(timings) * 1000, 1e-3)
+
+    cost = probe_cost + round(math.log2(target_ms / elapsed_ms))
+    cost = min(max(cost, MIN_HASH_COST), MAX_HASH_COST)
+    # Одновременно запущенные воркеры принимают значение, сохраненное первым
+    _hash_cost = _store_hash_cost(cost, target_ms, replace=force)
+    logger.info(
+        f"bcrypt cost {_hash_cost} (~{elapsed_ms * 2 ** (_hash_cost - probe_cost):.0f} ms, target {target_ms} ms)"
+    )
+    return _hash_cost
+
+def _load_hash_cost(target_ms):
+    """Сохраненная стоимость bcrypt для target_ms (None - калибровки не было)"""
+    with db_connection() as conn:
+        rows = dict(conn.execute(
+            "SELECT key, value FROM settings WHERE key IN ('hash_cost', 'hash_target_ms')"
+        ).fetchall())
+    if rows.get('hash_target_ms') != str(target_ms) or 'hash_cost' not in rows:
+        return None
+    return int(rows['hash_cost'])
+
+def _store_hash_cost(cost, target_ms, replace=False):
+    """Сохранение стоимости bcrypt; без replace уже сохраненная для target_ms не меняется"""
+    with db_connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        stored = conn.execute("SELECT value FROM settings WHERE key = 'hash_target_ms'").fetchone()
+        if replace or stored is None or stored[0] != str(target_ms):
+            conn.executemany(
+                'INSERT OR REPLACE INTO settings (key, value) VALUES (?, ?)',
+                [('hash_cost', str(cost)), ('hash_target_ms', str(target_ms))]
+            )
+        value = conn.execute("SELECT value FROM settings WHERE key = 'hash_cost'").fetchone()[0]
+        conn.commit()
+    return int(value)
+
+def hash_password(password):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=_hash_cost))
+
+def hash_cost(password_hash):
+    """Стоимость из хеша вида $2b$12$..."""
+    return int(password_hash[4:6])
 
 def add_user(username, password):
-    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    password_hash = hash_password(password)
     with db_connection() as conn:
         try:
             conn.execute(
@@ -33,16 +208,24 @@ def add_user(username, password):
                 (username, password_hash)
             )
             conn.commit()
+            user_cache.invalidate()
             return True
         except sqlite3.IntegrityError:
             return False
 
 def get_user_by_id(user_id):
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
     with db_connection() as conn:
-        cursor = conn.execute(
+        row = conn.execute(
             'SELECT id, username FROM users WHERE id = ?',
-            (user_id,))
-        return cursor.fetchone()
+            (user_id,)).fetchone()
+    if row is None:
+        return None
+    user = dict(row)
+    user_cache.put(user_id, user)
+    return user
 
 def get_user_by_username(username):
     with db_connection() as conn:
@@ -51,9 +234,44 @@ def get_user_by_username(username):
             (username,))
         return cursor.fetchone()
 
+def _rehash(user_id, old_hash, password):
+    """Перехеширование пароля с текущей стоимостью (если хеш не успели изменить)"""
+    try:
+        new_hash = hash_password(password)
+        with db_connection() as conn:
+            conn.execute(
+                'UPDATE users SET password_hash = ? WHERE id = ? AND password_hash = ?',
+                (new_hash, user_id, old_hash))
+            conn.commit()
+        user_cache.invalidate(user_id)
+    except Exception as e:
+        logger.error(f"Password rehash failed for user {user_id}: {e}")
+
 def verify_user(username, password):
+    """Проверка пароля в пуле потоков bcrypt
+
+    При заполненной очереди сразу выбрасывает PasswordCheckBusy, чтобы
+    запросы входа не копились. Хеш со стоимостью ниже текущей после
+    успешного входа заменяется в фоне.
+    """
     user = get_user_by_username(username)
-    if user:
-        # Правильное обращение к полям Row-объекта
-        return bcrypt.checkpw(password.encode('utf-8'), user['password_hash'])
-    return False
\ No newline at end of file
+    if not user:
+        return False
+    # Правильное обращение к полям Row-объекта
+    password_hash = user['password_hash']
+
+    if not _hash_slots.acquire(blocking=False):
+        raise PasswordCheckBusy()
+    try:
+        future = _hash_executor.submit(bcrypt.checkpw, password.encode('utf-8'), password_hash)
+    except BaseException:
+        _hash_slots.release()
+        raise
+    future.add_done_callback(lambda _: _hash_slots.release())
+    if not future.result():
+        return False
+
+    # Только повышение: хеши с большей стоимостью не ослабляются
+    if hash_cost(password_hash) < _hash_cost:
+        _hash_executor.submit(_rehash, user['id'], password_hash, password)
+    return True
@@ -1,15 +1,15 @@
 import os
 import io
-import glob
 import json
+import time
+import sqlite3
 import base64
 import logging
+import threading
 #import functools
-import asyncio
-import aiofiles
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional, Tuple, Set
-from pathlib import Path
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple, Set
 
 import pandas as pd
 import matplotlib
@@ -35,7 +35,16 @@ except:
     from werkzeug.security import escape
 
 from config import ConfigApp, ConfigMain
-from database import init_db, get_user_by_id, get_user_by_username, verify_user
+from database import (
+    PasswordCheckBusy, calibrate_hash_cost, init_db, get_user_by_id, get_user_by_username, verify_user
+)
+from series import downsample
+from common.devices import DevicePartitions, device_path, list_devices
+from common.image_index import ImageIndex
+from common.rollups import RESOLUTIONS, TelemetryRollups
+from common.columnar import ColumnarTelemetry
+from common.security_patterns import web_security_matcher
+from common.blocklist import Blocklist
 
 try:
     import redis
@@ -45,39 +54,15 @@ except ImportError:
 
 # Constants
 ALLOWED_METHODS = ['GET', 'POST', 'HEAD', 'OPTIONS']
-BLOCKED_PATHS = [
-    '.env', '.git', 'config.json', 'secrets.yaml', 'secrets.yml',
-    'php-cgi', 'wp-admin', 'adminer', 'backup', '.powenv', '.profile',
-    'cgi-bin', 'bin/sh', 'eval-stdin.php', 'pearcmd', '.s3cfg',
-    'vendor/phpunit', 'think/app', 'Util/PHP', '_info.php', '_phpinfo.php',
-    'restore.php', 'backup.php', 'recovery.php', '_poopinfo.php',
-    'wp-login.php', 'admin.php', 'config.php', '.phpinfo', '_profiler/info'
-]
-BLOCKED_KEYWORDS = [
-    'allow_url_include', 'auto_prepend_file', 
-    'call_user_func_array', 'invokefunction',
-    'config-create', '/../../', '%2e%2e',
-    'xdebug_session_start', 'phpstorm', 'debug'
-]
-BLOCKED_USER_AGENTS = [
-    'nmap', 'sqlmap', 'nikto', 'metasploit', 'havij',
-    'dirbuster', 'wpscan', 'acunetix', 'nessus',
-    'firefox/14.0a1', 'firefox/44.0', 'chrome/3.0.195.17'
-]
-TRAVERSAL_PATTERNS = [
-    '../', '..\\', '%2e%2e/', '%2e%2e%2f',
-    '..;/', '..5c', '..%255c', '..%c0%af'
-]
-PHP_PATTERNS = [
-    'php://', '<?php', '<?=', 'phar://', 'expect://',
-    'zlib://', 'data://', 'glob://', 'ssh2://'
-]
-EXPLOIT_PATTERNS = [
-    's=/index/\\think\\app/invokefunction',
-    'function=call_user_func_array',
-    'vars[0]=md5',
-    'lang=../../../../../../../../'
-]
+VIOLATION_REASONS = {
+    'blocked_path': "Blocked path/query pattern",
+    'blocked_keyword': "Blocked path/query pattern",
+    'traversal': "Directory traversal attempt",
+    'php_injection': "PHP injection attempt",
+    'exploit': "Known exploit pattern",
+    'user_agent': "Blocked User-Agent",
+    'url_length': "URL too long",
+}
 
 # Logging configuration
 logging.basicConfig(
@@ -94,6 +79,18 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Storage partitions per device ('' - default device, original paths)
+image_indexes = DevicePartitions(lambda device: ImageIndex(
+    str(device_path(ConfigMain.IMAGE_FOLDER, device)), str(device_path(ConfigMain.IMAGE_INDEX_PATH, device))
+))
+telemetry_rollups = DevicePartitions(lambda device: TelemetryRollups(
+    str(device_path(ConfigMain.ROLLUPS_DB_PATH, device))
+))
+telemetry_columns = DevicePartitions(lambda device: ColumnarTelemetry(
+    str(device_path(ConfigMain.TELEMETRY_COLUMNAR_DIR, device))
+))
+blocklist = Blocklist(ConfigMain.BLOCKED_IPS_FILE_PATH, ConfigApp.TRUSTED_IPS, ConfigMain.BLOCKED_IP_TTL)
+
 
 class FileManager:
     """Manages file operations with thread safety and error handling"""
@@ -121,71 +118,30 @@ class FileManager:
             raise
 
     @staticmethod
-    def get_image_list(keep_count: Optional[int] = None) -> List[str]:
-        """Get sorted list of JPG images with optional limit"""
-        image_dir = ConfigMain.IMAGE_FOLDER
+    def get_image_list(keep_count: Optional[int] = None, device: str = '') -> List[str]:
+        """Get sorted list of the device's JPG images with optional limit"""
         try:
-            images = sorted(
-                glob.glob(os.path.join(image_dir, '*.jpg')),
-                key=os.path.getmtime,
-                reverse=False
-            )
-            if keep_count:
-                images = images[-keep_count:]
-            return [os.path.basename(img) for img in images]
-        except OSError as e:
+            return image_indexes.get(device).latest(keep_count)
+        except (OSError, sqlite3.Error) as e:
             logger.error(f"Image list error: {str(e)}")
             return []
 
-
-class IPBlocker:
-    """Менеджер блокировки IP-адресов"""
-    def __init__(self):
-        self._blocked_ips = set()
-        self._last_modified = 0.0
-        self._lock = asyncio.Lock()
-
-    async def update_cache(self):
-        """Обновление кэша заблокированных IP"""
+    @staticmethod
+    def get_image_count(keep_count: Optional[int] = None, device: str = '') -> int:
+        """Get number of the device's JPG images with optional limit"""
         try:
-            path = Path(ConfigMain.BLOCKED_IPS_FILE_PATH)
-            current_mtime = path.stat().st_mtime
-            
-            if current_mtime > self._last_modified:
-                async with self._lock:
-                    async with aiofiles.open(path, 'r', encoding='utf-8') as f:
-                        ips = await f.readlines()
-                        self._blocked_ips = {ip.strip() for ip in ips if ip.strip()}
-                    self._last_modified = current_mtime
-        except Exception as e:
-            logging.error(f"Ошибка обновления кэша IP: {e}")
-
-    async def is_blocked(self, ip: str) -> bool:
-        """Проверка блокировки IP"""
-        await self.update_cache()
-        return ip in self._blocked_ips
-
-    async def block_ip(self, ip: str, reason: str):
-        """Блокировка нового IP"""
-        if ip in ConfigApp.TRUSTED_IPS:
-            return
-
-        async with self._lock:
-            try:
-                async with aiofiles.open(ConfigMain.BLOCKED_IPS_FILE_PATH, 'a', encoding='utf-8') as f:
-                    await f.write(f"{ip}\n")
-                self._blocked_ips.add(ip)
-                logging.warning(f"Заблокирован IP: {ip} - Причина: {reason}")
-            except Exception as e:
-                logging.error(f"Ошибка блокировки IP {ip}: {e}")       
+            count = image_indexes.get(device).count()
+            return min(count, keep_count) if keep_count else count
+        except (OSError, sqlite3.Error) as e:
+            logger.error(f"Image count error: {str(e)}")
+            return 0
 
 
 class SecurityManager:
     """Handles security-related operations and threat detection"""
     
     def __init__(self):
-        self.ip_blocker = IPBlocker()
-        self.last_mtime: float = 0.0
+        self.blocklist = blocklist
 
     async def is_request_allowed(self, request) -> Tuple[bool, Optional[str]]:
         """Comprehensive security check for incoming requests"""
@@ -196,58 +152,30 @@ class SecurityManager:
             return True, None
             
         # Check blocked IPs cache
-        if await self.ip_blocker.is_blocked(client_ip):
-            logging.warning(self.ip_blocker._blocked_ips)
+        if self.blocklist.is_blocked(client_ip):
             return False, f"Blocked IP: {client_ip}"
  
-        # Validate request components
-        path = request.path.lower()
-        query = request.query_string.decode().lower()
-        
-        # 1. Check blocked paths and keywords
-        if (any(bp in path for bp in BLOCKED_PATHS) or
-            any(bk in query for bk in BLOCKED_KEYWORDS)):
-            return False, "Blocked path/query pattern"
-
-        # 2. Check for traversal patterns
-        if any(tp in path or tp in query for tp in TRAVERSAL_PATTERNS):
-            return False, "Directory traversal attempt"
-
-        # 3. Check for PHP injection patterns
-        if any(php in query for php in PHP_PATTERNS):
-            return False, "PHP injection attempt"
-
-        # 4. Check for known exploits
-        if any(ep in query for ep in EXPLOIT_PATTERNS):
-            return False, "Known exploit pattern"
+        # 1. Single-pass check of path, query and User-Agent (common.security_patterns);
+        #    path rules apply to the path only, keyword and injection rules to the query
+        violation = web_security_matcher.check(
+            request.path,
+            request.query_string.decode('latin-1'),
+            request.headers.get('User-Agent', '')
+        )
+        if violation is not None:
+            rule, pattern = violation
+            return False, f"{VIOLATION_REASONS.get(rule, rule)}: {pattern}"
 
-        # 5. Validate request data integrity
+        # 2. Validate request data integrity
         if not self._validate_request_data(request):
             return False, "Invalid request data"
 
-        # 6. Additional security checks
-        if not self._validate_request_components(request):
+        # 3. HTTP method check
+        if request.method not in ALLOWED_METHODS:
             return False, "Invalid request components"
 
         return True, None
 
-    def _validate_request_components(self, request) -> bool:
-        """Validate various request components"""
-        # HTTP method check
-        if request.method not in ALLOWED_METHODS:
-            return False
-            
-        # User-Agent validation
-        ua = request.headers.get('User-Agent', '').lower()
-        if any(bad_ua in ua for bad_ua in BLOCKED_USER_AGENTS):
-            return False
-            
-        # URL length check
-        if len(request.url) > 512:
-            return False
-            
-        return True
-
     def _validate_request_data(self, request) -> bool:
         """Validate request data integrity"""
         try:
@@ -259,6 +187,13 @@ class SecurityManager:
             return False
 
 
+class ChartData(NamedTuple):
+    """Data of one chart timeframe"""
+    frame: pd.DataFrame  # points to plot (raw readings or rollup means)
+    last_date: Optional[datetime]  # last reading of the device (alarm line)
+    markersize: int
+
+
 class PlotGenerator:
     """Handles generation of visualization plots with full legacy support"""
     
@@ -281,12 +216,57 @@ class PlotGenerator:
         }
     }
     
+    TIMEFRAMES = {
+        'last_day': (timedelta(days=1), 4),
+        'last_week': (timedelta(weeks=1), 0),
+        'last_month': (timedelta(days=31), 0),
+        'last_year': (timedelta(days=365), 0),
+        'all': (None, 0)
+    }
+    
+    # Длинные диапазоны строятся по агрегатам (разрешение агрегата, частота сетки)
+    ROLLUP_TIMEFRAMES = {
+        'last_month': ('hour', 'h'),
+        'last_year': ('day', 'D'),
+        'all': ('day', 'D')
+    }
+    
     @staticmethod
-    def generate_plot(data: pd.DataFrame, 
+    def chart_data(timeframe: str, device: str = '') -> Optional[ChartData]:
+        """Data of the chart timeframe (None - the device has no telemetry)
+
+        Long timeframes are built from the rollups without reading raw
+        readings; the raw data is loaded only when the rollups are unavailable.
+        """
+        if timeframe not in PlotGenerator.TIMEFRAMES:
+            raise ValueError("Invalid timeframe")
+
+        rollup = PlotGenerator._rollup_data(timeframe, device)
+        if rollup is not None:
+            frame, last_date = rollup
+            return ChartData(frame, last_date, PlotGenerator.TIMEFRAMES[timeframe][1])
+
+        data = load_sensors_frame(PlotGenerator.timeframe_start(timeframe), device)
+        if data is None:
+            return None
+        if not pd.api.types.is_datetime64_any_dtype(data['date']):
+            data['date'] = pd.to_datetime(data['date'], format='%d.%m.%Y %H:%M:%S')
+        filtered_df, markersize = PlotGenerator._filter_data(data, timeframe)
+        # Агрегация данных для больших временных диапазонов
+        if timeframe == 'last_year' and not filtered_df.empty:
+            filtered_df = PlotGenerator._resample_data(filtered_df, 'D')
+        last_date = data['date'].max() if not data.empty else None
+        return ChartData(filtered_df, last_date, markersize)
+
+    @staticmethod
+    def generate_plot(chart: ChartData,
                      timeframe: str,
                      chart_type: str,
                      theme: str = 'dark') -> Optional[str]:
         """Generate matplotlib plot image with theme support"""
+        if chart.frame.empty:
+            return json.dumps({"error": "No data available"})
+
         plt.ioff()
         theme_config = PlotGenerator.THEME_CONFIG.get(theme)
         
@@ -295,22 +275,13 @@ class PlotGenerator:
             ax2 = None
             
             try:
-                data['date'] = pd.to_datetime(data['date'], format='%d.%m.%Y %H:%M:%S')
-                filtered_df, markersize = PlotGenerator._filter_data(data, timeframe)
-                
-                if filtered_df.empty:
-                    return json.dumps({"error": "No data available"})
-                
-                # Агрегация данных для больших временных диапазонов
-                if timeframe == 'last_year':
-                    filtered_df = PlotGenerator._resample_data(filtered_df, 'D')
-                
                 chart_config = PlotGenerator._get_chart_config(chart_type, theme)
                 if not chart_config:
                     return None
                 
-                ax2 = PlotGenerator._create_plot(ax, filtered_df, chart_config, markersize, theme_config)
-                PlotGenerator._add_vertical_line(ax, filtered_df, data, theme_config)
+                filtered_df = chart.frame.copy()
+                ax2 = PlotGenerator._create_plot(ax, filtered_df, chart_config, chart.markersize, theme_config)
+                PlotGenerator._add_vertical_line(ax, chart.last_date, theme_config)
                 PlotGenerator._configure_axes(ax, ax2, filtered_df, chart_config, timeframe, theme_config)
                 
                 return PlotGenerator._save_plot_to_bytes(fig, theme_config)
@@ -326,24 +297,56 @@ class PlotGenerator:
         """Агрегация данных для больших временных диапазонов"""
         return df.resample(freq, on='date').mean().reset_index()
 
+    @staticmethod
+    def _rollup_data(timeframe: str, device: str = '') -> Optional[Tuple[pd.DataFrame, datetime]]:
+        """Средние значения из агрегатов устройства и дата последнего показания
+
+        None - агрегаты недоступны или не содержат данных за диапазон.
+        """
+        if timeframe not in PlotGenerator.ROLLUP_TIMEFRAMES:
+            return None
+        resolution, freq = PlotGenerator.ROLLUP_TIMEFRAMES[timeframe]
+        delta = PlotGenerator.TIMEFRAMES[timeframe][0]
+
+        try:
+            rollups = telemetry_rollups.get(device)
+            if not rollups.readings():
+                return None
+            start = None
+            if delta:
+                start = RESOLUTIONS[resolution]((datetime.now() - delta).strftime('%Y-%m-%d %H:%M:%S'))
+            rows = rollups.rows(resolution, start)
+            last_date = rollups.last_date()
+        except sqlite3.Error as e:
+            logger.error(f"Rollups read error: {str(e)}")
+            return None
+        if not rows:
+            return None
+
+        df = pd.DataFrame(rows, columns=['date', 'metric', 'count', 'mean', 'min', 'max'])
+        df = df.pivot(index='date', columns='metric', values='mean')
+        df.index = pd.to_datetime(df.index, format='%Y-%m-%d %H:%M:%S')
+        # Пропуски в данных остаются разрывами на графике, как при resample
+        full_range = pd.date_range(df.index.min(), df.index.max(), freq=freq)
+        frame = df.reindex(full_range).rename_axis('date').reset_index()
+        return frame, datetime.strptime(last_date, '%Y-%m-%d %H:%M:%S')
+
+    @staticmethod
+    def timeframe_start(timeframe: str) -> Optional[datetime]:
+        """Начало временного диапазона (None - вся история)"""
+        delta = PlotGenerator.TIMEFRAMES.get(timeframe, (None, 0))[0]
+        return datetime.now() - delta if delta else None
+
     @staticmethod
     def _filter_data(df: pd.DataFrame, timeframe: str) -> Tuple[pd.DataFrame, int]:
         """Фильтрация данных по временному диапазону"""
         now = datetime.now()
         markersize = 0
         
-        timeframes = {
-            'last_day': (timedelta(days=1), 4),
-            'last_week': (timedelta(weeks=1), 0),
-            'last_month': (timedelta(days=31), 0),
-            'last_year': (timedelta(days=365), 0),
-            'all': (None, 0)
-        }
-        
-        if timeframe not in timeframes:
+        if timeframe not in PlotGenerator.TIMEFRAMES:
             raise ValueError("Invalid timeframe")
             
-        delta, markersize = timeframes[timeframe]
+        delta, markersize = PlotGenerator.TIMEFRAMES[timeframe]
         if delta:
             start_date = now - delta
             return df[df['date'] >= start_date], markersize
@@ -445,11 +448,11 @@ class PlotGenerator:
         
     @staticmethod
     def _add_vertical_line(ax, 
-                          filtered_df: pd.DataFrame, 
-                          full_df: pd.DataFrame,
+                          last_date: Optional[datetime],
                           theme: Dict) -> None:
         """Добавление вертикальной линии тревоги"""
-        last_date = full_df['date'].max()
+        if last_date is None:
+            return
         current_time = datetime.now()
         time_diff = current_time - last_date
         
@@ -523,6 +526,138 @@ class PlotGenerator:
         return base64.b64encode(img.getvalue()).decode('utf-8')
 
 
+class ChartCache:
+    """LRU cache of rendered charts keyed by (timeframe, chart_type, theme, revision)
+
+    The telemetry revision is the device plus the (mtime, size) of its CSV file
+    (or of the columnar date file), so only new data invalidates a chart. An
+    entry also expires when the alarm line state changes: at the moment the
+    camera becomes overdue, and then periodically while it stays overdue (the
+    line is drawn at the current time).
+    """
+
+    NO_DATA = 'no_data'
+
+    def __init__(self, max_entries: int, alarm_refresh_seconds: int):
+        self.max_entries = max_entries
+        self.alarm_refresh = timedelta(seconds=alarm_refresh_seconds)
+        self._entries: 'OrderedDict[Tuple, Tuple[Any, datetime]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._render_lock = threading.Lock()  # matplotlib is not thread-safe
+
+    @staticmethod
+    def telemetry_revision(device: str = '') -> Optional[Tuple]:
+        """Revision of the device's telemetry data (changes on every write)"""
+        if ConfigMain.TELEMETRY_COLUMNAR:
+            revision = telemetry_columns.get(device).revision()
+            return (device,) + tuple(revision) if revision is not None else None
+        try:
+            stat = os.stat(device_path(ConfigMain.CSV_FILE_PATH, device))
+            return device, stat.st_mtime_ns, stat.st_size
+        except FileNotFoundError:
+            return None
+
+    def get(self, timeframe: str, chart_type: str, theme: str = 'dark', device: str = '') -> Optional[str]:
+        """Rendered chart from cache, rendering it on a miss"""
+        revision = self.telemetry_revision(device)
+        if revision is None:
+            return self.NO_DATA
+
+        key = (timeframe, chart_type, theme, revision)
+        cached = self._lookup(key)
+        if cached is not None:
+            return cached
+
+        with self._render_lock:
+            # Another request may have rendered the chart while we waited
+            cached = self._lookup(key)
+            if cached is not None:
+                return cached
+            return self._render(revision, [(timeframe, chart_type, theme)], device)[0]
+
+    def prerender(self, theme: str = 'dark', device: str = '') -> None:
+        """Render all dashboard charts of the device for the current data revision"""
+        revision = self.telemetry_revision(device)
+        if revision is None:
+            return
+
+        with self._render_lock:
+            keys = [
+                (timeframe, chart_type, theme)
+                for timeframe in PlotGenerator.TIMEFRAMES
+                for chart_type in ('temp_hue', 'volt_sig')
+                if self._lookup((timeframe, chart_type, theme, revision)) is None
+            ]
+            if keys:
+                self._render(revision, keys, device)
+                logger.info(f"Pre-rendered {len(keys)} charts")
+
+    def _lookup(self, key: Tuple) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            result, expires_at = entry
+            if datetime.now() >= expires_at:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return result
+
+    def _render(self, revision: Tuple, keys: List[Tuple[str, str, str]],
+                device: str = '') -> List[Optional[str]]:
+        """Render charts for the given keys, loading each timeframe's data once"""
+        charts: Dict[str, Optional[ChartData]] = {}
+        results = []
+        for timeframe, chart_type, theme in keys:
+            if timeframe not in charts:
+                charts[timeframe] = PlotGenerator.chart_data(timeframe, device)
+            chart = charts[timeframe]
+            if chart is None:
+                results.append(self.NO_DATA)
+                continue
+
+            # Нет показаний: графики с ошибкой "No data available" до следующей проверки
+            if chart.last_date is not None:
+                expires_at = self._expiry(chart.last_date)
+            else:
+                expires_at = datetime.now() + self.alarm_refresh
+
+            result = PlotGenerator.generate_plot(chart, timeframe, chart_type, theme)
+            if result is not None:
+                with self._lock:
+                    self._entries[(timeframe, chart_type, theme, revision)] = (result, expires_at)
+                    self._entries.move_to_end((timeframe, chart_type, theme, revision))
+                    while len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+            results.append(result)
+        return results
+
+    def _expiry(self, last_date: datetime) -> datetime:
+        """Time when the alarm line of the chart changes"""
+        now = datetime.now()
+        alarm_at = last_date + timedelta(minutes=ConfigMain.CAMERA_UPDATE_MINUTES)
+        return alarm_at if alarm_at > now else now + self.alarm_refresh
+
+
+def run_chart_prerender(interval_seconds: int) -> None:
+    """Background loop: pre-render charts as soon as new telemetry lands"""
+    last_revisions: Dict[str, Tuple] = {}
+    while True:
+        try:
+            for device in [''] + list_devices(ConfigMain.IMAGE_FOLDER, ConfigMain.DEVICES):
+                revision = ChartCache.telemetry_revision(device)
+                if revision is not None and revision != last_revisions.get(device):
+                    chart_cache.prerender(device=device)
+                    last_revisions[device] = revision
+        except Exception as e:
+            logger.error(f"Chart pre-render failed: {str(e)}", exc_info=True)
+        time.sleep(interval_seconds)
+
+
+chart_cache = ChartCache(ConfigMain.CHART_CACHE_SIZE, ConfigMain.CHART_ALARM_REFRESH_SECONDS)
+
+
 # Flask application setup
 app = Flask(__name__)
 app.config.from_object(ConfigApp)
@@ -580,7 +715,8 @@ async def perform_security_checks():
     """Global security checks before request processing"""
     allowed, reason = await security.is_request_allowed(request)
     if not allowed:
-        security.ip_blocker.block_ip(request.remote_addr, reason)
+        # remote_addr - адрес клиента из X-Forwarded-For (ProxyFix), а не nginx
+        security.blocklist.block(request.remote_addr, reason, ConfigMain.BLOCKED_IP_TTL)
         logger.warning(f"Security violation: {reason}")
         abort(403)
 
@@ -620,7 +756,13 @@ def login():
         username = escape(request.form.get('username', ''))
         password = request.form.get('password', '')
 
-        if verify_user(username, password):
+        try:
+            verified = verify_user(username, password)
+        except PasswordCheckBusy:
+            logger.warning(f"Login check queue is full, rejected: {username}")
+            return render_template('login.html'), 503
+
+        if verified:
             user_data = get_user_by_username(username)
             login_user(User(user_data['id'],
                             user_data['username']), remember=True)
@@ -658,14 +800,34 @@ def custom_static(filename):
 
 
 # Application routes
+def selected_device() -> str:
+    """Device from ?device= ('' - default device); 404 for unknown devices"""
+    device = request.args.get('device', '')
+    if not device or device == ConfigMain.DEFAULT_DEVICE:
+        return ''
+    if device not in list_devices(ConfigMain.IMAGE_FOLDER, ConfigMain.DEVICES):
+        abort(404)
+    return device
+
 @app.route('/')
 @login_required
 @limiter.limit("5 per minute", exempt_when=exempt_trusted_ips)
 def index():
+    device = selected_device()
     try:
-        images = FileManager.get_image_list(ConfigMain.DISPLAY_N_LAST_IMAGES)
+        images = FileManager.get_image_list(ConfigMain.DISPLAY_N_LAST_IMAGES, device)
         metadata = [parse_image_metadata(img) for img in images]
-        return render_template('index.html', images=metadata)
+        devices = [(ConfigMain.DEFAULT_DEVICE, ConfigMain.DEFAULT_DEVICE or 'Основное')]
+        devices += [(name, name) for name in list_devices(ConfigMain.IMAGE_FOLDER, ConfigMain.DEVICES)]
+        return render_template(
+            'index.html',
+            images=metadata,
+            devices=devices,
+            device=device or ConfigMain.DEFAULT_DEVICE,
+            device_query=f"?device={device}" if device else '',
+            images_path=device_path('images', device).as_posix(),
+            thumbs_path=device_path('thumbs', device).as_posix()
+        )
     except Exception as e:
         logger.error(f"Index error: {str(e)}")
         abort(500)
@@ -699,9 +861,10 @@ def manage_settings():
 @app.route('/api/last_image')
 @limiter.limit("5 per minute", exempt_when=exempt_trusted_ips)
 def last_image() -> Dict[str, Any]:
-    """Получение метаданных последнего изображения"""
+    """Получение метаданных последнего изображения устройства"""
+    device = selected_device()
     try:
-        images = FileManager.get_image_list(ConfigMain.DISPLAY_N_LAST_IMAGES)
+        images = FileManager.get_image_list(1, device)
         if not images:
             return {'last_image': None}
 
@@ -709,7 +872,7 @@ def last_image() -> Dict[str, Any]:
         metadata = parse_image_metadata(last_img)
         
         return {
-            'images_count': len(images),
+            'images_count': FileManager.get_image_count(ConfigMain.DISPLAY_N_LAST_IMAGES, device),
             'last_image': last_img,
             'voltage_sim': metadata['voltage_sim'],
             'voltage_akb': metadata['voltage_akb'],
@@ -733,12 +896,17 @@ def last_image() -> Dict[str, Any]:
 @limiter.limit("5 per minute", exempt_when=exempt_trusted_ips)
 def generate_plot(timeframe, chart_type):
     """Генерация графиков с поддержкой старого формата"""
+    device = selected_device()
     try:
-        df = load_sensors_data(ConfigMain.CSV_FILE_PATH)
-        if df is None or df.empty:
+        theme = request.args.get('theme', 'dark')
+        if theme not in PlotGenerator.THEME_CONFIG:
+            return jsonify(error="Invalid theme"), 400
+        if timeframe not in PlotGenerator.TIMEFRAMES:
+            return jsonify(error="Invalid timeframe"), 400
+
+        result = chart_cache.get(timeframe, chart_type, theme, device)
+        if result == ChartCache.NO_DATA:
             return jsonify(error="No data available"), 404
-
-        result = PlotGenerator.generate_plot(df, timeframe, chart_type)
         
         if not result:
             return jsonify(error="Invalid chart type"), 400
@@ -754,6 +922,39 @@ def generate_plot(timeframe, chart_type):
         return jsonify(error="Internal server error"), 500
 
 
+@app.route('/api/series/<timeframe>')
+@limiter.limit("5 per minute", exempt_when=exempt_trusted_ips)
+def telemetry_series(timeframe):
+    """Телеметрия в JSON с прореживанием (LTTB / min-max) для отрисовки на клиенте"""
+    device = selected_device()
+    try:
+        points = request.args.get('points', ConfigMain.SERIES_DEFAULT_POINTS, type=int)
+        points = max(10, min(points, ConfigMain.SERIES_MAX_POINTS))
+        method = request.args.get('method', 'lttb')
+        if method not in ('lttb', 'minmax'):
+            return jsonify(error="Invalid method"), 400
+        if timeframe not in PlotGenerator.TIMEFRAMES:
+            return jsonify(error="Invalid timeframe"), 400
+
+        df = load_sensors_frame(PlotGenerator.timeframe_start(timeframe), device)
+        if df is None:
+            return jsonify(error="No data available"), 404
+
+        filtered_df, _ = PlotGenerator._filter_data(df, timeframe)
+        if filtered_df.empty:
+            return jsonify(error="No data available"), 404
+
+        return jsonify(
+            timeframe=timeframe,
+            method=method,
+            total=len(filtered_df),
+            series=downsample(filtered_df, points, method)
+        )
+    except Exception as e:
+        logger.error(f"Series generation failed: {str(e)}", exc_info=True)
+        return jsonify(error="Internal server error"), 500
+
+
 # Helper functions
 def parse_image_metadata(filename: str) -> Dict[str, Any]:
     """Extract metadata from image filename"""
@@ -801,6 +1002,32 @@ def load_sensors_data(csv_file_path):
     else:
         logger.error(f"CSV file does not exist. File:{csv_file_path}")
         return None     
+
+_sensors_frame_lock = threading.Lock()
+_sensors_frames: Dict[str, Tuple[Optional[Tuple], Optional[pd.DataFrame]]] = {}
+
+def load_sensors_frame(start: Optional[datetime] = None, device: str = '') -> Optional[pd.DataFrame]:
+    """Device telemetry with parsed dates starting at `start`
+
+    The columnar store is sliced through memory mapping; the CSV is parsed
+    once and cached until the data revision changes.
+    """
+    if ConfigMain.TELEMETRY_COLUMNAR:
+        columns = telemetry_columns.get(device).read(start)
+        return pd.DataFrame(columns) if columns is not None else None
+
+    revision = ChartCache.telemetry_revision(device)
+    with _sensors_frame_lock:
+        cached_revision, df = _sensors_frames.get(device, (None, None))
+        if revision is None or revision != cached_revision:
+            df = load_sensors_data(str(device_path(ConfigMain.CSV_FILE_PATH, device)))
+            if df is not None:
+                df['date'] = pd.to_datetime(df['date'], format='%d.%m.%Y %H:%M:%S')
+            _sensors_frames[device] = (revision, df)
+    if df is None:
+        return None
+    # Копия: генерация графиков изменяет переданный DataFrame
+    return df[df['date'] >= start].copy() if start is not None else df.copy()
                 
 def update_settings(current: Dict, updates: Dict) -> None:
     """Рекурсивно обновляет настройки, сохраняя типы."""
@@ -850,6 +1077,15 @@ def initialize_app():
     os.makedirs(ConfigMain.IMAGE_FOLDER, exist_ok=True)
     os.makedirs(os.path.dirname(ConfigMain.CSV_FILE_PATH), exist_ok=True)
     init_db()
+    calibrate_hash_cost()
+    blocklist.start()
+
+    if ConfigMain.CHART_PRERENDER:
+        threading.Thread(
+            target=run_chart_prerender,
+            args=(ConfigMain.CHART_PRERENDER_INTERVAL_SECONDS,),
+            daemon=True
+        ).start()
     
     if REDIS_AVAILABLE and ConfigApp.USE_REDIS:
         test_redis_connection()
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+from typing import Any, Dict
+
+
+# Колонки телеметрии, которые используются в графиках (_get_chart_config)
+SERIES_COLUMNS = ['temperature', 'humidity', 'voltage_akb', 'signal']
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Индексы точек, выбранных алгоритмом Largest-Triangle-Three-Buckets.
+
+    Первая и последняя точки сохраняются, остальные делятся на n_out - 2 корзины;
+    в каждой выбирается точка с максимальной площадью треугольника, образованного
+    предыдущей выбранной точкой и средним следующей корзины. Цикл идет по корзинам
+    (не больше n_out итераций), площади внутри корзины считаются векторно.
+
+    :param x: Значения оси X (float, по возрастанию).
+    :param y: Значения оси Y (float, без NaN).
+    :param n_out: Желаемое количество точек.
+    :return: Отсортированный массив индексов.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    starts, ends = edges[:-1], edges[1:]
+
+    # Средние по корзинам (для последней корзины следующей служит последняя точка)
+    csum_x = np.concatenate(([0.0], np.cumsum(x)))
+    csum_y = np.concatenate(([0.0], np.cumsum(y)))
+    counts = ends - starts
+    avg_x = np.append((csum_x[ends] - csum_x[starts]) / counts, x[-1])
+    avg_y = np.append((csum_y[ends] - csum_y[starts]) / counts, y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0] = 0
+    selected[-1] = n - 1
+    prev = 0
+    for i in range(n_out - 2):
+        bx = x[starts[i]:ends[i]]
+        by = y[starts[i]:ends[i]]
+        area = np.abs(
+            (x[prev] - avg_x[i + 1]) * (by - y[prev]) -
+            (x[prev] - bx) * (avg_y[i + 1] - y[prev])
+        )
+        prev = starts[i] + int(np.argmax(area))
+        selected[i + 1] = prev
+    return selected
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Индексы минимума и максимума в каждой из (n_out - 2) // 2 корзин.
+
+    Полностью векторная реализация: точки сортируются по (корзина, значение),
+    первая точка корзины - минимум, последняя - максимум. Первая и последняя
+    точки ряда сохраняются всегда, как в LTTB.
+    """
+    n = len(y)
+    n_buckets = (n_out - 2) // 2
+    if n_buckets < 1 or n_out >= n:
+        return np.arange(n)
+
+    bucket = (np.arange(n) * n_buckets) // n
+    order = np.lexsort((y, bucket))
+    bounds = np.flatnonzero(np.diff(bucket[order])) + 1
+    first = np.concatenate(([0], bounds))
+    last = np.concatenate((bounds - 1, [n - 1]))
+    return np.unique(np.concatenate(([0, n - 1], order[first], order[last])))
+
+
+def downsample(df: pd.DataFrame, points: int, method: str = 'lttb') -> Dict[str, Any]:
+    """
+    Прореживание колонок телеметрии до заданного количества точек.
+
+    :param df: DataFrame с колонкой date (datetime64) и колонками SERIES_COLUMNS.
+    :param points: Максимальное количество точек на каждую колонку.
+    :param method: 'lttb' или 'minmax'.
+    :return: Словарь {колонка: {'t': [...], 'y': [...]}}; время в формате ISO (локальное).
+    """
+    dates = df['date'].to_numpy(dtype='datetime64[s]')
+    x_all = dates.astype(np.int64).astype(np.float64)
+
+    series = {}
+    for column in SERIES_COLUMNS:
+        if column not in df:
+            continue
+        y_all = pd.to_numeric(df[column], errors='coerce').to_numpy(dtype=np.float64)
+        mask = ~np.isnan(y_all)
+        x, y, t = x_all[mask], y_all[mask], dates[mask]
+
+        if method == 'minmax':
+            idx = minmax_indices(y, points)
+        else:
+            idx = lttb_indices(x, y, points)
+
+        series[column] = {
+            't': np.datetime_as_string(t[idx], unit='s').tolist(),
+            'y': np.round(y[idx], 3).tolist()
+        }
+    return series
@@ -1,9 +1,9 @@
 import os
 import glob
 import json
-import numpy as np
 import pandas as pd
-from PIL import Image, ImageEnhance
+
+from common.enhance import enhance_file
 
 
 
@@ -129,65 +129,9 @@ def extract_info_from_filename(filename):
 
 
 def auto_adjust_brightness_contrast(image_path, output_path):
-    # Open the image
-    image = Image.open(image_path)
-    
-    # Convert image to numpy array for analysis
-    image_array = np.array(image)
-
-    # Calculate the mean brightness of the image
-    mean_brightness = np.mean(image_array)
-
-    # Define target brightness (you can adjust this value)
-    target_brightness = 48  # Midpoint of 0-255 range
-
-    # Calculate brightness adjustment factor
-    brightness_factor = target_brightness / mean_brightness
-
-    # Adjust brightness
-    enhancer = ImageEnhance.Brightness(image)
-    adjusted_image = enhancer.enhance(brightness_factor)
-
-    # Calculate contrast adjustment
-    contrast_enhancer = ImageEnhance.Contrast(adjusted_image)
-    contrast_factor = 1.1  # You can adjust this value for more or less contrast
-    adjusted_image = contrast_enhancer.enhance(contrast_factor)
-
-    # Save the adjusted image
-    adjusted_image.save(output_path)
+    """Автокоррекция яркости и контраста (таблица преобразования common.enhance)"""
+    enhance_file(image_path, output_path, balance=False)
 
 def auto_adjust_color_balance(image_path, output_path):
-    # Open the image
-    image = Image.open(image_path)
-    
-    # Convert image to numpy array
-    image_array = np.array(image)
-
-    # Calculate the mean of each color channel (R, G, B)
-    mean_r = np.mean(image_array[:, :, 0])  # Red channel
-    mean_g = np.mean(image_array[:, :, 1])  # Green channel
-    mean_b = np.mean(image_array[:, :, 2])  # Blue channel
-
-    # Calculate the average mean
-    mean_rgb = (mean_r + mean_g + mean_b) / 3
-
-    # Calculate adjustment factors for each channel
-    r_adjust = mean_rgb / mean_r
-    g_adjust = mean_rgb / mean_g
-    b_adjust = mean_rgb / mean_b
-
-    # If the green channel is significantly higher, apply a stronger adjustment
-    if mean_g > mean_rgb * 1.1:  # Adjust this threshold as needed
-        g_adjust *= 2.0  # Reduce the green channel more aggressively
-
-    # Apply adjustments to each channel
-    adjusted_image_array = image_array.copy()
-    adjusted_image_array[:, :, 0] = np.clip(adjusted_image_array[:, :, 0] * r_adjust, 0, 255)  # Red
-    adjusted_image_array[:, :, 1] = np.clip(adjusted_image_array[:, :, 1] * g_adjust, 0, 255)  # Green
-    adjusted_image_array[:, :, 2] = np.clip(adjusted_image_array[:, :, 2] * b_adjust, 0, 255)  # Blue
-
-    # Convert back to an image
-    adjusted_image = Image.fromarray(adjusted_image_array.astype('uint8'))
-
-    # Save the adjusted image
-    adjusted_image.save(output_path)
\ No newline at end of file
+    """Автокоррекция баланса цвета (таблица преобразования common.enhance)"""
+    enhance_file(image_path, output_path, brightness=False)
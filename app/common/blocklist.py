@@ -0,0 +1,458 @@
+import os
+import math
+import time
+import fcntl
+import signal
+import logging
+import socket
+import threading
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+try:
+    from inotify_simple import INotify, flags
+    INOTIFY_AVAILABLE = True
+except ImportError:
+    INOTIFY_AVAILABLE = False
+
+
+# Запись списка: (версия IP, длина префикса, номер подсети = адрес >> (бит - префикс))
+Entry = Tuple[int, int, int]
+
+FAMILIES = {4: (socket.AF_INET, 32), 6: (socket.AF_INET6, 128)}
+
+# Срок действия бессрочной записи
+PERMANENT = math.inf
+
+
+def parse_address(ip: str) -> Tuple[int, int]:
+    """Адрес в виде (версия, целое число); IPv4-mapped IPv6 приводится к IPv4"""
+    if ':' in ip:
+        value = int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), 'big')
+        if value >> 32 == 0xFFFF:
+            return 4, value & 0xFFFFFFFF
+        return 6, value
+    return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, ip), 'big')
+
+
+def parse_network(text: str) -> Entry:
+    """Разбор 'IP' или 'IP/префикс' (биты адреса за префиксом отбрасываются)"""
+    ip, _, prefix = text.partition('/')
+    try:
+        version, value = parse_address(ip)
+    except OSError:
+        raise ValueError(f"Invalid IP address: {ip}")
+    bits = FAMILIES[version][1]
+    prefixlen = int(prefix) if prefix else bits
+    if not 0 <= prefixlen <= bits:
+        raise ValueError(f"Invalid prefix length: {text}")
+    return version, prefixlen, value >> (bits - prefixlen)
+
+
+def parse_entry(line: str) -> Optional[Tuple[Entry, float]]:
+    """Разбор строки файла: 'IP[/префикс] [срок действия, unix time] [# комментарий]'"""
+    line = line.split('#', 1)[0].strip()
+    if not line:
+        return None
+    parts = line.split()
+    expires = float(parts[1]) if len(parts) > 1 else PERMANENT
+    return parse_network(parts[0]), expires
+
+
+def format_address(version: int, value: int) -> str:
+    family, bits = FAMILIES[version]
+    return socket.inet_ntop(family, value.to_bytes(bits // 8, 'big'))
+
+
+def format_entry(entry: Entry, expires: float) -> str:
+    """Строка файла (адрес без '/32' и '/128', срок - только у временных записей)"""
+    version, prefixlen, value = entry
+    bits = FAMILIES[version][1]
+    text = format_address(version, value << (bits - prefixlen))
+    if prefixlen != bits:
+        text = f"{text}/{prefixlen}"
+    return text if expires == PERMANENT else f"{text} {math.ceil(expires)}"
+
+
+class BlocklistTable:
+    """Таблица поиска по списку блокировок.
+
+    Отдельные адреса хранятся в словаре по строке адреса (поиск без разбора IP).
+    Подсети хранятся в словарях по длине префикса: ключ - номер подсети
+    (адрес, сдвинутый вправо на 32/128 - префикс бит). Поиск адреса проверяет
+    по одному словарю на каждую встречающуюся длину префикса, т.е. не более
+    32 (IPv4) или 128 (IPv6) обращений - как проход по двоичному префиксному
+    дереву, но без отдельного объекта на каждый узел.
+    """
+    def __init__(self):
+        self.addresses: Dict[str, float] = {}
+        self.networks: Dict[int, List[Tuple[int, int, Dict[int, float]]]] = {4: [], 6: []}
+        self._by_prefix: Dict[Tuple[int, int], Dict[int, float]] = {}
+
+    def add(self, entry: Entry, expires: float) -> None:
+        """Добавление записи (из двух сроков остается более поздний)"""
+        version, prefixlen, value = entry
+        bits = FAMILIES[version][1]
+        if prefixlen == bits:
+            key = format_address(version, value)
+            if self.addresses.get(key, 0.0) < expires:
+                self.addresses[key] = expires
+            return
+
+        nets = self._by_prefix.get((version, prefixlen))
+        if nets is None:
+            nets = self._by_prefix[(version, prefixlen)] = {}
+            # Новый список вместо изменения текущего: читатели не видят промежуточного состояния
+            self.networks[version] = sorted(
+                self.networks[version] + [(prefixlen, bits - prefixlen, nets)]
+            )
+        if nets.get(value, 0.0) < expires:
+            nets[value] = expires
+
+    def expires(self, ip: str) -> float:
+        """Срок блокировки адреса с учетом подсетей (0 - не заблокирован)"""
+        found = self.addresses.get(ip, 0.0)
+        if not (self.networks[4] or self.networks[6]):
+            return found
+        try:
+            version, value = parse_address(ip)
+        except OSError:
+            return found
+        for _, shift, nets in self.networks[version]:
+            found = max(found, nets.get(value >> shift, 0.0))
+        return found
+
+    def covered(self, entry: Entry, expires: float) -> bool:
+        """Запись уже покрыта той же или более широкой записью с не меньшим сроком"""
+        version, prefixlen, value = entry
+        bits = FAMILIES[version][1]
+        if prefixlen == bits and self.addresses.get(format_address(version, value), 0.0) >= expires:
+            return True
+        address = value << (bits - prefixlen)
+        for level, shift, nets in self.networks[version]:
+            if level > prefixlen:
+                break
+            if nets.get(address >> shift, 0.0) >= expires:
+                return True
+        return False
+
+    def entries(self) -> Iterator[Tuple[Entry, float]]:
+        """Все записи: подсети от широких к узким, затем адреса"""
+        for version in (4, 6):
+            for prefixlen, _, nets in self.networks[version]:
+                for value, expires in nets.items():
+                    yield (version, prefixlen, value), expires
+        for ip, expires in self.addresses.items():
+            yield parse_network(ip), expires
+
+    def __len__(self) -> int:
+        return len(self.addresses) + sum(len(nets) for nets in self._by_prefix.values())
+
+
+class Blocklist:
+    """Список заблокированных IP и подсетей в памяти с фоновой перезагрузкой файла.
+
+    Строка файла: 'IP' или 'IP/префикс', через пробел - необязательный срок
+    действия (unix time). Проверка is_blocked() - только поиск в BlocklistTable,
+    без обращений к диску. Файл перечитывается фоновым потоком: по событиям
+    inotify (если доступен inotify_simple), иначе опросом stat() раз в
+    `poll_interval` секунд, а также по сигналу `reload_signal`. Новая таблица
+    строится целиком и заменяет старую одним присваиванием.
+
+    Уже заблокированный адрес повторно в файл не пишется. Истекшие, повторные
+    и покрытые подсетями строки удаляются фоновым уплотнением. Файл
+    перезаписывается на месте под flock, а не через os.replace: в
+    docker-compose он смонтирован отдельным файлом в оба сервиса, и оба
+    дописывают в него под той же блокировкой.
+    """
+    def __init__(self, path: str, trusted: Iterable[str] = (), ttl: float = 0,
+                 poll_interval: float = 2.0, compact_interval: float = 600.0,
+                 reload_signal: Optional[int] = getattr(signal, 'SIGHUP', None)):
+        self.path = Path(path)
+        self.trusted = frozenset(trusted)
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.compact_interval = compact_interval
+        self.reload_signal = reload_signal
+        self._table = BlocklistTable()
+        self._write_lock = threading.Lock()
+        self._reload_requested = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._inode: Optional[int] = None
+        self._offset = 0
+        self._tail = b''
+        self._garbage = 0
+        self._next_expiry = PERMANENT
+        self._next_compact = 0.0
+        self.version = 0  # растет при каждом изменении таблицы (для экспорта в nginx)
+        self.reload()
+
+    def is_blocked(self, ip: str) -> bool:
+        """Проверка блокировки IP (без системных вызовов)"""
+        now = time.time()
+        table = self._table
+        return table.addresses.get(ip, 0.0) > now or table.expires(ip) > now
+
+    def block(self, ip: str, reason: str, ttl: Optional[float] = None) -> None:
+        """Блокировка IP или подсети; ttl - срок в секундах (0 - бессрочно)"""
+        if ip in self.trusted:
+            return
+        ttl = self.ttl if ttl is None else ttl
+        expires = time.time() + ttl if ttl else PERMANENT
+        try:
+            entry = parse_network(ip)
+        except ValueError as e:
+            logging.error(f"Ошибка блокировки IP {ip}: {e}")
+            return
+
+        with self._write_lock:
+            if self._table.covered(entry, expires):
+                return
+            try:
+                with self._locked('a', fcntl.LOCK_EX) as f:
+                    f.write(f"{format_entry(entry, expires)}\n")
+                self._table.add(entry, expires)
+                self._next_expiry = min(self._next_expiry, expires)
+                self.version += 1
+                logging.warning(f"Заблокирован IP: {ip} - Причина: {reason}")
+            except OSError as e:
+                logging.error(f"Ошибка блокировки IP {ip}: {e}")
+
+    def reload(self) -> None:
+        """Перечитывание файла и атомарная замена таблицы"""
+        try:
+            with self._locked('rb', fcntl.LOCK_SH) as f:
+                data = f.read()
+                inode = os.fstat(f.fileno()).st_ino
+        except FileNotFoundError:
+            data, inode = b'', None
+        except OSError as e:
+            logging.error(f"Ошибка обновления кэша IP: {e}")
+            return
+
+        offset = data.rfind(b'\n') + 1  # незаконченная строка дочитывается позже
+        table, garbage, next_expiry = self._parse(self._decode(data[:offset]))
+        with self._write_lock:
+            self._table = table
+            self.version += 1
+            self._garbage = garbage
+            self._next_expiry = next_expiry
+            self._set_position(inode, offset, data[:offset])
+
+    def refresh(self) -> None:
+        """Дочитывание дописанных в конец файла строк.
+
+        Если файл заменен, укорочен или перезаписан (уплотнение), выполняется
+        полная перезагрузка. Перезапись определяется по последним байтам уже
+        прочитанной части.
+        """
+        try:
+            stat = self.path.stat()
+        except FileNotFoundError:
+            if self._inode is not None:
+                self.reload()
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self.reload()
+            return
+        if stat.st_size == self._offset:
+            return
+
+        try:
+            with self._locked('rb', fcntl.LOCK_SH) as f:
+                f.seek(self._offset - len(self._tail))
+                if f.read(len(self._tail)) != self._tail:
+                    data = None
+                else:
+                    data = f.read()
+        except OSError as e:
+            logging.error(f"Ошибка обновления кэша IP: {e}")
+            return
+        if data is None:
+            self.reload()
+            return
+
+        end = data.rfind(b'\n') + 1
+        if not end:
+            return
+        now = time.time()
+        with self._write_lock:
+            for line in self._decode(data[:end]):
+                try:
+                    entry = parse_entry(line)
+                except ValueError:
+                    continue
+                if entry is None or entry[1] <= now or self._table.covered(*entry):
+                    self._garbage += 1  # оценка: свои записи из block() тоже попадают сюда
+                    continue
+                self._table.add(*entry)
+                self._next_expiry = min(self._next_expiry, entry[1])
+                self.version += 1
+            self._set_position(self._inode, self._offset + end, self._tail + data[:end])
+
+    def compact(self) -> int:
+        """Уплотнение файла: удаление истекших, повторных и покрытых подсетями строк.
+
+        :return: количество удаленных строк.
+        """
+        with self._write_lock:
+            try:
+                with self._locked('r+b', fcntl.LOCK_EX) as f:
+                    lines = self._decode(f.read())
+                    table, garbage, next_expiry = self._parse(lines)
+                    if not garbage:
+                        self._garbage = 0
+                        self._next_expiry = next_expiry
+                        return 0
+                    data = ''.join(
+                        f"{format_entry(entry, expires)}\n" for entry, expires in table.entries()
+                    ).encode('utf-8')
+                    f.seek(0)
+                    f.write(data)
+                    f.truncate()
+                    inode = os.fstat(f.fileno()).st_ino
+            except FileNotFoundError:
+                return 0
+            self._set_position(inode, len(data), data)
+            self._table = table
+            self.version += 1
+            self._garbage = 0
+            self._next_expiry = next_expiry
+        logging.info(f"Список блокировок уплотнен: удалено строк {garbage}, осталось {len(table)}")
+        return garbage
+
+    def active(self) -> Tuple[List[str], float]:
+        """Действующие записи ('IP' или 'IP/префикс') и ближайший срок истечения"""
+        now = time.time()
+        with self._write_lock:
+            items = list(self._table.entries())
+        networks = [format_entry(entry, PERMANENT) for entry, expires in items if expires > now]
+        next_expiry = min((expires for _, expires in items if expires > now), default=PERMANENT)
+        return networks, next_expiry
+
+    def request_reload(self, *_) -> None:
+        """Запрос перечитывания (обработчик сигнала: только выставляет флаг)"""
+        self._reload_requested.set()
+
+    def start(self) -> None:
+        """Запуск фонового наблюдения за файлом (вызывать из главного потока)"""
+        if self._thread is not None:
+            return
+        if self.reload_signal is not None and threading.current_thread() is threading.main_thread():
+            signal.signal(self.reload_signal, self.request_reload)
+        self._stopped.clear()
+        target = self._watch_inotify if INOTIFY_AVAILABLE else self._watch_poll
+        self._thread = threading.Thread(target=target, name='blocklist-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Остановка наблюдения"""
+        self._stopped.set()
+        self._reload_requested.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    @contextmanager
+    def _locked(self, mode: str, operation: int):
+        with open(self.path, mode, encoding=None if 'b' in mode else 'utf-8') as f:
+            fcntl.flock(f, operation)
+            try:
+                yield f
+            finally:
+                f.flush()
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _set_position(self, inode: Optional[int], offset: int, tail: bytes) -> None:
+        """Запоминание прочитанной части файла для refresh()"""
+        self._inode = inode
+        self._offset = offset
+        self._tail = tail[-64:]
+
+    @staticmethod
+    def _decode(data: bytes) -> List[str]:
+        return data.decode('utf-8', errors='replace').splitlines()
+
+    def _parse(self, lines: List[str]) -> Tuple[BlocklistTable, int, float]:
+        """Таблица действующих записей, кол-во лишних строк и ближайший срок истечения"""
+        now = time.time()
+        entries = []
+        invalid = 0
+        for line in lines:
+            try:
+                entry = parse_entry(line)
+            except ValueError:
+                invalid += 1
+                continue
+            if entry is not None and entry[1] > now:
+                entries.append(entry)
+
+        # Широкие подсети первыми: узкие записи под ними отбрасываются как покрытые
+        entries.sort(key=lambda item: (item[0][0], item[0][1], -item[1]))
+        table = BlocklistTable()
+        for entry, expires in entries:
+            if not table.covered(entry, expires):
+                table.add(entry, expires)
+
+        if invalid:
+            logging.warning(f"Пропущено некорректных строк в {self.path}: {invalid}")
+        next_expiry = min((expires for _, expires in entries), default=PERMANENT)
+        garbage = sum(1 for line in lines if line.strip()) - invalid - len(table)
+        return table, garbage, next_expiry
+
+    def _maybe_compact(self) -> None:
+        now = time.time()
+        if now < self._next_compact or not (self._garbage or self._next_expiry <= now):
+            return
+        self._next_compact = now + self.compact_interval
+        try:
+            self.compact()
+        except OSError as e:
+            logging.error(f"Ошибка уплотнения списка блокировок: {e}")
+
+    def _watch_poll(self) -> None:
+        while not self._stopped.is_set():
+            self._reload_requested.wait(self.poll_interval)
+            requested = self._reload_requested.is_set()
+            self._reload_requested.clear()
+            if requested:
+                self.reload()
+            else:
+                self.refresh()
+            self._maybe_compact()
+
+    def _watch_inotify(self) -> None:
+        mask = (flags.MODIFY | flags.CLOSE_WRITE | flags.ATTRIB |
+                flags.DELETE_SELF | flags.MOVE_SELF)
+        with INotify() as inotify:
+            watch = None
+            while not self._stopped.is_set():
+                if watch is None:
+                    try:
+                        watch = inotify.add_watch(str(self.path), mask)
+                        self.reload()  # файл мог смениться, пока наблюдения не было
+                    except OSError:
+                        # Файла пока нет - ждем его появления, как при опросе
+                        self.reload()
+                        self._reload_requested.wait(self.poll_interval)
+                        self._reload_requested.clear()
+                        continue
+
+                events = inotify.read(timeout=int(self.poll_interval * 1000))
+                if self._reload_requested.is_set():
+                    self._reload_requested.clear()
+                    self.reload()
+                if any(event.mask & (flags.DELETE_SELF | flags.MOVE_SELF | flags.IGNORED) for event in events):
+                    # Файл заменен (os.replace) или удален: наблюдение за новым inode
+                    try:
+                        inotify.rm_watch(watch)
+                    except OSError:
+                        pass
+                    watch = None
+                    continue
+                if events:
+                    self.refresh()
+                self._maybe_compact()
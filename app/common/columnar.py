@@ -0,0 +1,283 @@
+import os
+import csv
+import json
+import fcntl
+import math
+import logging
+import threading
+
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+
+# Числовые колонки телеметрии (float64, NaN - нет значения)
+COLUMNS = ['humidity', 'temperature', 'signal', 'voltage_sim', 'voltage_akb']
+
+# Формат даты в signals.csv
+DATE_FORMAT = '%d.%m.%Y %H:%M:%S'
+
+EPOCH = datetime(1970, 1, 1)
+TS_DTYPE = np.dtype('<i8')
+VALUE_DTYPE = np.dtype('<f8')
+
+
+def to_epoch(date: str) -> Optional[int]:
+    """Дата из signals.csv -> секунды от 1970-01-01 (локальное время без пояса, как в CSV)"""
+    try:
+        return int((datetime.strptime(date, DATE_FORMAT) - EPOCH).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+def to_value(value) -> float:
+    """Числовое значение колонки ('N/A' -> NaN)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def format_value(value: float) -> str:
+    """Значение для CSV: NaN -> 'N/A', целые без дробной части"""
+    if math.isnan(value):
+        return 'N/A'
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class ColumnarTelemetry:
+    """Колоночное хранилище телеметрии: по файлу фиксированной ширины на колонку.
+
+    `date.<gen>.i8` - int64 секунды, `<колонка>.<gen>.f8` - float64. Файлы читаются
+    через np.memmap, диапазон времени выбирается бинарным поиском по колонке
+    дат, поэтому чтение не разбирает всю историю. meta.json хранит текущее
+    поколение файлов (полная перезапись создает новое поколение и атомарно
+    переключает его) и признак упорядоченности дат. Запись защищена
+    блокировкой каталога (.lock), поэтому колонки могут дописывать несколько
+    процессов.
+    """
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self._lock = threading.Lock()
+
+    def add(self, row: Dict) -> None:
+        """Дописывание показания в конец колонок"""
+        ts = to_epoch(str(row.get('date', '')))
+        if ts is None:
+            return
+
+        with self._lock, self._file_lock():
+            meta = self._load_meta()
+            rows = self._repair(meta)
+            last_ts = self._last_date(meta, rows)
+
+            # Колонка дат пишется последней: ее длина определяет количество строк
+            for column in COLUMNS:
+                with open(self._path(column, meta), 'ab') as f:
+                    f.write(np.array([to_value(row.get(column))], dtype=VALUE_DTYPE).tobytes())
+            with open(self._path('date', meta), 'ab') as f:
+                f.write(np.array([ts], dtype=TS_DTYPE).tobytes())
+
+            if meta['sorted'] and last_ts is not None and ts <= last_ts:
+                meta['sorted'] = False
+                self._save_meta(meta)
+
+    def rebuild(self, rows: Iterable[Dict]) -> None:
+        """Полная перезапись хранилища (сортировка по дате, при повторе даты остается последняя строка)"""
+        dates, values = [], {column: [] for column in COLUMNS}
+        for row in rows:
+            ts = to_epoch(str(row.get('date', '')))
+            if ts is None:
+                continue
+            dates.append(ts)
+            for column in COLUMNS:
+                values[column].append(to_value(row.get(column)))
+
+        ts = np.array(dates, dtype=TS_DTYPE)
+        # Стабильная сортировка; из повторов берется последний
+        order = np.argsort(ts, kind='stable')
+        keep = np.append(ts[order][1:] != ts[order][:-1], True) if len(ts) else np.array([], dtype=bool)
+        order = order[keep]
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with self._lock, self._file_lock():
+            old = self._load_meta()
+            meta = {'generation': old['generation'] + 1, 'sorted': True}
+            ts[order].tofile(str(self._path('date', meta)))
+            for column in COLUMNS:
+                np.array(values[column], dtype=VALUE_DTYPE)[order].tofile(str(self._path(column, meta)))
+            self._save_meta(meta)
+
+            # Уже открытые читателями memmap остаются валидными после удаления файлов
+            for column in ['date'] + COLUMNS:
+                try:
+                    self._path(column, old).unlink()
+                except FileNotFoundError:
+                    pass
+
+    def accepts(self, date: str) -> bool:
+        """Записывается ли показание с датой из signals.csv"""
+        return to_epoch(date) is not None
+
+    def readings(self) -> int:
+        """Количество показаний"""
+        with self._lock:
+            meta = self._load_meta()
+            return self._rows(meta)
+
+    def revision(self) -> Optional[Tuple[int, int, int]]:
+        """Ревизия данных: меняется при каждой записи"""
+        meta = self._load_meta()
+        try:
+            stat = self._path('date', meta).stat()
+        except FileNotFoundError:
+            return None
+        return meta['generation'], stat.st_mtime_ns, stat.st_size
+
+    def read(self, start: Optional[datetime] = None,
+             end: Optional[datetime] = None) -> Optional[Dict[str, np.ndarray]]:
+        """Показания в диапазоне [start, end]: {'date': datetime64[s], колонка: float64}
+
+        :return: None, если хранилище не создано.
+        """
+        for _ in range(2):
+            meta = self._load_meta()
+            try:
+                return self._read(meta, start, end)
+            except FileNotFoundError:
+                # Между чтением meta.json и открытием файлов прошла перезапись
+                continue
+        return None
+
+    def export_csv(self, csv_path: str) -> int:
+        """Выгрузка в CSV формата signals.csv"""
+        data = self.read()
+        if data is None:
+            return 0
+        dates = data['date'].astype(object)
+        with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(['date'] + COLUMNS)
+            for i, date in enumerate(dates):
+                writer.writerow(
+                    [date.strftime(DATE_FORMAT)] +
+                    [format_value(float(data[column][i])) for column in COLUMNS]
+                )
+        return len(dates)
+
+    def import_csv(self, csv_path: str) -> int:
+        """Конвертация существующего signals.csv (хранилище перезаписывается)"""
+        with open(csv_path, 'r', newline='', encoding='utf-8') as f:
+            self.rebuild(csv.DictReader(f))
+        return self.readings()
+
+    def _read(self, meta: Dict, start: Optional[datetime],
+              end: Optional[datetime]) -> Optional[Dict[str, np.ndarray]]:
+        if not self._path('date', meta).exists():
+            return None
+        rows = self._rows(meta)
+        ts = self._column('date', meta, TS_DTYPE, rows)
+
+        if meta['sorted']:
+            lo = 0 if start is None else int(np.searchsorted(ts, int((start - EPOCH).total_seconds()), 'left'))
+            hi = rows if end is None else int(np.searchsorted(ts, int((end - EPOCH).total_seconds()), 'right'))
+            index = slice(lo, hi)
+        else:
+            # Нарушен порядок дат (до ближайшей перезаписи): полная сортировка
+            order = np.argsort(ts, kind='stable')
+            keep = np.append(ts[order][1:] != ts[order][:-1], True) if rows else np.array([], dtype=bool)
+            index = order[keep]
+            mask = np.ones(len(index), dtype=bool)
+            if start is not None:
+                mask &= ts[index] >= int((start - EPOCH).total_seconds())
+            if end is not None:
+                mask &= ts[index] <= int((end - EPOCH).total_seconds())
+            index = index[mask]
+
+        data = {'date': np.array(ts[index]).astype('datetime64[s]')}
+        for column in COLUMNS:
+            data[column] = np.array(self._column(column, meta, VALUE_DTYPE, rows)[index])
+        return data
+
+    def _column(self, column: str, meta: Dict, dtype: np.dtype, rows: int) -> np.ndarray:
+        if rows == 0:
+            # memmap не открывает пустые файлы
+            return np.empty(0, dtype=dtype)
+        return np.memmap(str(self._path(column, meta)), dtype=dtype, mode='r', shape=(rows,))
+
+    def _last_date(self, meta: Dict, rows: int) -> Optional[int]:
+        """Последняя записанная дата (читается из файла, а не из памяти процесса)"""
+        if rows == 0:
+            return None
+        with open(self._path('date', meta), 'rb') as f:
+            f.seek((rows - 1) * TS_DTYPE.itemsize)
+            return int(np.frombuffer(f.read(TS_DTYPE.itemsize), dtype=TS_DTYPE)[0])
+
+    @contextmanager
+    def _file_lock(self):
+        """Блокировка записи между процессами"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / '.lock', 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _rows(self, meta: Dict) -> int:
+        """Количество полностью записанных строк"""
+        sizes = []
+        for column in ['date'] + COLUMNS:
+            try:
+                sizes.append(self._path(column, meta).stat().st_size)
+            except FileNotFoundError:
+                return 0
+        return min(sizes) // 8
+
+    def _repair(self, meta: Dict) -> int:
+        """Обрезка колонок до общей длины после прерванной записи"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        for column in ['date'] + COLUMNS:
+            self._path(column, meta).touch(exist_ok=True)
+        rows = self._rows(meta)
+        for column in ['date'] + COLUMNS:
+            path = self._path(column, meta)
+            if path.stat().st_size != rows * 8:
+                logging.warning(f"Columnar telemetry: truncating {path} to {rows} rows")
+                os.truncate(path, rows * 8)
+        return rows
+
+    def _path(self, column: str, meta: Dict) -> Path:
+        extension = 'i8' if column == 'date' else 'f8'
+        return self.directory / f"{column}.{meta['generation']}.{extension}"
+
+    def _load_meta(self) -> Dict:
+        try:
+            with open(self.directory / 'meta.json', 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'generation': 0, 'sorted': True}
+
+    def _save_meta(self, meta: Dict) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.directory / f'meta.json.{os.getpid()}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.directory / 'meta.json')
+
+
+if __name__ == "__main__":
+    # python -m common.columnar import <signals.csv> <каталог>
+    # python -m common.columnar export <каталог> <signals.csv>
+    import sys
+
+    command, source, target = sys.argv[1:4]
+    if command == 'import':
+        print(f"{target}: {ColumnarTelemetry(target).import_csv(source)} readings")
+    elif command == 'export':
+        print(f"{target}: {ColumnarTelemetry(source).export_csv(target)} readings")
+    else:
+        sys.exit(f"Unknown command: {command}")
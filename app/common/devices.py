@@ -0,0 +1,92 @@
+import os
+import re
+import threading
+
+from pathlib import Path
+from typing import Callable, Collection, Dict, FrozenSet, Generic, List, TypeVar
+
+
+# Идентификатор устройства (USER_ID прошивки, третья часть имени кадра)
+DEVICE_ID_PATTERN = re.compile(r'[A-Za-z0-9-]{1,32}')
+
+# Имя сохраненного кадра прошивки: дата_время_USER_ID_volt_..._akb_...
+FRAME_NAME_PATTERN = re.compile(r'\d{8}_\d{6}_([A-Za-z0-9-]{1,32})_volt_.*_akb_[^_]*')
+
+T = TypeVar('T')
+
+
+def is_device_id(value: str) -> bool:
+    return DEVICE_ID_PATTERN.fullmatch(value) is not None
+
+
+def parse_devices(value: str) -> FrozenSet[str]:
+    """Список устройств с отдельными разделами из строки 'A,B7,cam-2' (DEVICES в .env)"""
+    return frozenset(
+        device for device in (part.strip() for part in value.split(','))
+        if is_device_id(device)
+    )
+
+
+def device_partition(filename: str, default_device: str = '',
+                     devices: Collection[str] = ()) -> str:
+    """Раздел хранилища для кадра: идентификатор устройства из имени
+    (дата_время_устройство_volt_..._akb_...) или '' для устройства по умолчанию.
+
+    Раздел получают только устройства из списка `devices`: имя кадра задает
+    клиент, и без списка любая загрузка создавала бы новый раздел со своим
+    лимитом хранения. Остальные кадры попадают в раздел по умолчанию.
+    """
+    match = FRAME_NAME_PATTERN.fullmatch(Path(filename).stem)
+    device = match.group(1) if match else ''
+    if device not in devices or device == default_device:
+        return ''
+    return device
+
+
+def device_path(path: str, device: str) -> Path:
+    """Путь в разделе устройства: <родитель>/devices/<устройство>/<имя>.
+
+    Раздел '' (устройство по умолчанию) использует исходный путь, поэтому
+    данные, накопленные до разделения, остаются на месте:
+    static/images -> static/devices/<id>/images,
+    data/csv/signals.csv -> data/csv/devices/<id>/signals.csv.
+    """
+    path = Path(path)
+    if not device:
+        return path
+    if not is_device_id(device):
+        raise ValueError(f"Invalid device id: {device!r}")
+    return path.parent / 'devices' / device / path.name
+
+
+def list_devices(path: str, devices: Collection[str]) -> List[str]:
+    """Устройства из `devices`, у которых есть раздел для `path` (без устройства по умолчанию).
+
+    Просматривается только каталог <родитель>/devices, а не сами данные.
+    """
+    root = Path(path).parent / 'devices'
+    try:
+        with os.scandir(root) as entries:
+            return sorted(
+                e.name for e in entries
+                if e.name in devices and e.is_dir() and (root / e.name / Path(path).name).exists()
+            )
+    except FileNotFoundError:
+        return []
+
+
+class DevicePartitions(Generic[T]):
+    """Объекты хранилищ по разделам устройств (создаются при первом обращении)"""
+    def __init__(self, factory: Callable[[str], T]):
+        self.factory = factory
+        self._items: Dict[str, T] = {}
+        self._lock = threading.Lock()
+
+    def get(self, device: str = '') -> T:
+        item = self._items.get(device)
+        if item is None:
+            with self._lock:
+                item = self._items.get(device)
+                if item is None:
+                    item = self._items[device] = self.factory(device)
+        return item
@@ -0,0 +1,127 @@
+import os
+import time
+import logging
+
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+
+# Целевая средняя яркость и коэффициент контраста (app_web/utilits.auto_adjust_brightness_contrast)
+TARGET_BRIGHTNESS = 48
+CONTRAST_FACTOR = 1.1
+
+# Порог преобладания зеленого канала (app_web/utilits.auto_adjust_color_balance)
+GREEN_THRESHOLD = 1.1
+GREEN_FACTOR = 2.0
+
+LEVELS = np.arange(256, dtype=np.float64)
+
+
+def balance_gains(means: np.ndarray) -> np.ndarray:
+    """Коэффициенты баланса цвета: каналы приводятся к общему среднему"""
+    mean_rgb = means.mean()
+    gains = mean_rgb / np.maximum(means, 1e-6)
+    if means[1] > mean_rgb * GREEN_THRESHOLD:
+        gains[1] *= GREEN_FACTOR
+    return gains
+
+
+def build_lut(histogram: List[int], balance: bool = True, brightness: bool = True,
+              target_brightness: float = TARGET_BRIGHTNESS,
+              contrast: float = CONTRAST_FACTOR) -> List[int]:
+    """Единая таблица преобразования RGB (3 x 256) для обеих коррекций.
+
+    Статистика берется из гистограммы, а не из копии пикселей: средние после
+    каждого шага пересчитываются через гистограмму, отображенную текущей
+    таблицей. Округление повторяет исходные функции (отбрасывание дробной части).
+    """
+    hist = np.asarray(histogram, dtype=np.float64).reshape(3, 256)
+    counts = hist.sum(axis=1)
+    lut = np.tile(LEVELS, (3, 1))
+
+    def means() -> np.ndarray:
+        return (hist * lut).sum(axis=1) / counts
+
+    if balance:
+        gains = balance_gains(means())
+        lut = np.floor(np.clip(lut * gains[:, None], 0, 255))
+
+    if brightness:
+        factor = target_brightness / max(means().mean(), 1e-6)
+        lut = np.clip(np.trunc(lut * factor), 0, 255)
+        # Среднее яркости (L = 0.299 R + 0.587 G + 0.114 B), как ImageEnhance.Contrast
+        luma = int(np.dot(means(), [0.299, 0.587, 0.114]) + 0.5)
+        lut = np.clip(np.trunc(luma + contrast * (lut - luma)), 0, 255)
+
+    return lut.astype(np.uint8).ravel().tolist()
+
+
+def enhance_image(image: Image.Image, balance: bool = True, brightness: bool = True) -> Image.Image:
+    """Коррекция изображения за один проход (Image.point с таблицей на 768 значений)"""
+    if image.mode != 'RGB':
+        image = image.convert('RGB')
+    return image.point(build_lut(image.histogram(), balance, brightness))
+
+
+def enhance_file(src: Path, dst: Path, balance: bool = True, brightness: bool = True,
+                 quality: int = 90) -> Path:
+    """Коррекция файла; dst может совпадать с src (замена атомарная, mtime сохраняется)"""
+    src, dst = Path(src), Path(dst)
+    stat = src.stat()
+    with Image.open(src) as image:
+        result = enhance_image(image, balance, brightness)
+
+    dst.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dst.with_name(f".{dst.name}.tmp")
+    image_format = Image.registered_extensions().get(dst.suffix.lower(), 'JPEG')
+    result.save(tmp_path, image_format, quality=quality)
+    os.replace(tmp_path, dst)
+    os.utime(dst, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    return dst
+
+
+def _enhance_one(args: Tuple[Path, Path]) -> Optional[str]:
+    src, dst = args
+    try:
+        enhance_file(src, dst)
+        return None
+    except Exception as e:
+        return f"{src.name}: {str(e)}"
+
+
+def enhance_directory(src_dir: str, dst_dir: str, workers: Optional[int] = None,
+                      extension: str = '.jpg') -> Tuple[int, float]:
+    """Пакетная коррекция архива в несколько процессов.
+
+    :return: (кол-во обработанных изображений, изображений в секунду)
+    """
+    src_dir, dst_dir = Path(src_dir), Path(dst_dir)
+    tasks = [
+        (path, dst_dir / path.name)
+        for path in sorted(src_dir.iterdir())
+        if path.name.endswith(extension) and path.is_file()
+    ]
+
+    started = time.perf_counter()
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for error in pool.map(_enhance_one, tasks, chunksize=8):
+            if error:
+                logging.error(f"Enhance failed for {error}")
+            else:
+                done += 1
+    elapsed = time.perf_counter() - started
+    return done, done / elapsed if elapsed > 0 else 0.0
+
+
+if __name__ == "__main__":
+    # python -m common.enhance <static/images> <каталог результата> [кол-во процессов]
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    count, rate = enhance_directory(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else None)
+    print(f"{sys.argv[2]}: {count} images, {rate:.1f} images/s")
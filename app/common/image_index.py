@@ -0,0 +1,259 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+
+# UPSERT вместо INSERT OR REPLACE: REPLACE не вызывает триггер удаления и сбивает счетчик
+UPSERT_IMAGE = '''
+    INSERT INTO images (name, mtime) VALUES (?, ?)
+    ON CONFLICT (name) DO UPDATE SET
+        mtime = excluded.mtime,
+        phash = CASE WHEN mtime = excluded.mtime THEN phash END,
+        enhanced = CASE WHEN mtime = excluded.mtime THEN enhanced ELSE 0 END
+'''
+
+
+class ImageIndex:
+    """Индекс изображений в SQLite, общий для sim800-api и web-ui.
+
+    Хранит имя файла и время модификации. Запросы «последние N», «количество»
+    и «кандидаты на удаление» идут по индексу mtime без glob и stat() по каждому
+    файлу. Расхождение с директорией определяется одним stat() самой директории
+    (ее mtime меняется при создании и удалении файлов); при расхождении индекс
+    досинхронизируется: stat() выполняется только для новых файлов.
+    """
+    def __init__(self, image_dir: str, db_path: str, extension: str = '.jpg'):
+        self.image_dir = Path(image_dir)
+        self.db_path = Path(db_path)
+        self.extension = extension
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def add(self, name: str, dir_mtime_ns: Optional[int] = None) -> None:
+        """Добавление нового файла в индекс
+
+        `dir_mtime_ns` - mtime директории до записи файла (dir_mtime_ns());
+        без него индекс досинхронизируется с директорией.
+        """
+        mtime = (self.image_dir / name).stat().st_mtime
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(UPSERT_IMAGE, (name, mtime))
+            self._advance_synced(conn, dir_mtime_ns)
+
+    def remove(self, names: Iterable[str], dir_mtime_ns: Optional[int] = None) -> None:
+        """Удаление файлов из индекса (`dir_mtime_ns` - mtime директории до удаления)"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany('DELETE FROM images WHERE name = ?', ((n,) for n in names))
+            self._advance_synced(conn, dir_mtime_ns)
+
+    def latest(self, limit: int = None) -> List[str]:
+        """Последние `limit` изображений в порядке от старых к новым"""
+        with self._lock:
+            conn = self._synced_connection()
+            rows = conn.execute(
+                'SELECT name FROM images ORDER BY mtime DESC, name DESC LIMIT ?',
+                (limit if limit else -1,)
+            ).fetchall()
+        return [row[0] for row in reversed(rows)]
+
+    def count(self) -> int:
+        """Количество изображений"""
+        with self._lock:
+            conn = self._synced_connection()
+            return conn.execute("SELECT value FROM meta WHERE key = 'count'").fetchone()[0]
+
+    def evict_candidates(self, keep_count: int) -> List[str]:
+        """Изображения сверх лимита `keep_count` (самые старые)"""
+        with self._lock:
+            conn = self._synced_connection()
+            rows = conn.execute(
+                'SELECT name FROM images ORDER BY mtime DESC, name DESC LIMIT -1 OFFSET ?',
+                (keep_count,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def set_phash(self, name: str, value: int) -> None:
+        """Сохранение перцептивного хеша кадра"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('UPDATE images SET phash = ? WHERE name = ?', (value, name))
+
+    def claim_enhance(self, name: str) -> bool:
+        """Отметка коррекции кадра перед ее выполнением.
+
+        False - кадр уже корректировался (повтор задачи) или его нет в индексе.
+        Отметка ставится до записи файла: при сбое кадр останется исходным,
+        но не будет перекодирован повторно.
+        """
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                cursor = conn.execute(
+                    'UPDATE images SET enhanced = 1 WHERE name = ? AND enhanced = 0', (name,)
+                )
+            return cursor.rowcount == 1
+
+    def release_enhance(self, name: str) -> None:
+        """Снятие отметки коррекции (коррекция не удалась, файл не изменен)"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('UPDATE images SET enhanced = 0 WHERE name = ?', (name,))
+
+    def reserve_upload(self, digest: str, name: str, ttl: float) -> Optional[str]:
+        """Регистрация хеша содержимого нового кадра `name`.
+
+        Если тот же хеш зарегистрирован менее `ttl` секунд назад (повтор
+        загрузки), возвращает имя ранее сохраненного кадра, иначе None.
+        Таблица общая для всех воркеров: проверка и регистрация выполняются
+        одной транзакцией записи.
+        """
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM uploads WHERE expires <= ?', (now,))
+                cursor = conn.execute(
+                    'INSERT OR IGNORE INTO uploads (digest, name, expires) VALUES (?, ?, ?)',
+                    (digest, name, now + ttl)
+                )
+                if cursor.rowcount == 1:
+                    return None
+                return conn.execute(
+                    'SELECT name FROM uploads WHERE digest = ?', (digest,)
+                ).fetchone()[0]
+
+    def release_upload(self, digest: str, name: str) -> None:
+        """Отмена регистрации хеша (кадр не удалось сохранить)"""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM uploads WHERE digest = ? AND name = ?', (digest, name))
+
+    def rows(self) -> List[Tuple[str, float, Optional[int]]]:
+        """Все изображения (имя, mtime, phash) в порядке от новых к старым"""
+        with self._lock:
+            conn = self._synced_connection()
+            return conn.execute(
+                'SELECT name, mtime, phash FROM images ORDER BY mtime DESC, name DESC'
+            ).fetchall()
+
+    def rebuild(self) -> None:
+        """Полная синхронизация индекса с директорией"""
+        with self._lock:
+            self._sync(self._connection())
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS images (
+                    name TEXT PRIMARY KEY,
+                    mtime REAL NOT NULL,
+                    phash INTEGER,
+                    enhanced INTEGER NOT NULL DEFAULT 0
+                );
+                CREATE INDEX IF NOT EXISTS idx_images_mtime ON images (mtime, name);
+                CREATE TABLE IF NOT EXISTS uploads (
+                    digest TEXT PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    expires REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_uploads_expires ON uploads (expires);
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO meta (key, value) VALUES ('count', 0);
+                INSERT OR IGNORE INTO meta (key, value) VALUES ('dir_mtime_ns', -1);
+                CREATE TRIGGER IF NOT EXISTS images_count_insert AFTER INSERT ON images
+                BEGIN
+                    UPDATE meta SET value = value + 1 WHERE key = 'count';
+                END;
+                CREATE TRIGGER IF NOT EXISTS images_count_delete AFTER DELETE ON images
+                BEGIN
+                    UPDATE meta SET value = value - 1 WHERE key = 'count';
+                END;
+            ''')
+            # Индексы, созданные до появления колонок phash и enhanced
+            columns = {row[1] for row in conn.execute('PRAGMA table_info(images)')}
+            if 'phash' not in columns:
+                conn.execute('ALTER TABLE images ADD COLUMN phash INTEGER')
+            if 'enhanced' not in columns:
+                conn.execute('ALTER TABLE images ADD COLUMN enhanced INTEGER NOT NULL DEFAULT 0')
+            self._conn = conn
+        return self._conn
+
+    def _synced_connection(self) -> sqlite3.Connection:
+        """Соединение с проверкой расхождения индекса и директории"""
+        conn = self._connection()
+        synced = conn.execute("SELECT value FROM meta WHERE key = 'dir_mtime_ns'").fetchone()[0]
+        if self.dir_mtime_ns() != synced:
+            self._sync(conn)
+        return conn
+
+    def _sync(self, conn: sqlite3.Connection) -> None:
+        """Досинхронизация индекса: новые файлы добавляются, удаленные убираются"""
+        on_disk = set()
+        if self.image_dir.exists():
+            with os.scandir(self.image_dir) as entries:
+                on_disk = {
+                    e.name for e in entries
+                    if e.name.endswith(self.extension) and e.is_file()
+                }
+
+        indexed = {row[0] for row in conn.execute('SELECT name FROM images')}
+        added = []
+        for name in on_disk - indexed:
+            try:
+                added.append((name, (self.image_dir / name).stat().st_mtime))
+            except FileNotFoundError:
+                continue
+        removed = indexed - on_disk
+
+        with conn:
+            conn.executemany(UPSERT_IMAGE, added)
+            conn.executemany('DELETE FROM images WHERE name = ?', ((n,) for n in removed))
+            self._mark_synced(conn)
+
+        if added or removed:
+            logging.info(f"Image index synced: +{len(added)} -{len(removed)}")
+
+    def _advance_synced(self, conn: sqlite3.Connection, dir_mtime_ns: Optional[int]) -> None:
+        """Отметка синхронизации после собственного изменения директории
+
+        Отметка сдвигается, только если до изменения директория совпадала с
+        индексом. Иначе файлы меняли извне (например, удалили вручную), и
+        сдвиг отметки скрыл бы это расхождение навсегда.
+        """
+        synced = conn.execute("SELECT value FROM meta WHERE key = 'dir_mtime_ns'").fetchone()[0]
+        if dir_mtime_ns is None or dir_mtime_ns != synced:
+            self._sync(conn)
+            return
+        with conn:
+            self._mark_synced(conn)
+
+    def _mark_synced(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "UPDATE meta SET value = ? WHERE key = 'dir_mtime_ns'",
+            (self.dir_mtime_ns(),)
+        )
+
+    def dir_mtime_ns(self) -> int:
+        """mtime директории изображений (0 - директории нет)"""
+        try:
+            return self.image_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            return 0
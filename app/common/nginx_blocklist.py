@@ -0,0 +1,184 @@
+import os
+import time
+import fcntl
+import shlex
+import logging
+import threading
+import subprocess
+
+from pathlib import Path
+from typing import Optional, Tuple
+
+from common.blocklist import PERMANENT, Blocklist, parse_network
+
+
+HEADER = (
+    "# Сгенерировано common.nginx_blocklist из blocked_ips.txt, вручную не редактировать.\n"
+    "# Подключается внутри блока geo $blocked_ip (nginx.conf).\n"
+)
+
+
+def _is_network(value: str) -> bool:
+    try:
+        parse_network(value)
+        return True
+    except ValueError:
+        return False
+
+
+class NginxBlocklistExporter:
+    """Экспорт списка блокировок в карту geo для nginx.
+
+    Файл содержит строки 'IP[/префикс] 1;' (доверенные IP - '0;', более точная
+    запись в geo побеждает подсеть) и подключается в nginx.conf:
+
+        geo $blocked_ip { default 0; include /etc/nginx/blocklist/blocked_ips.conf; }
+
+    Заблокированные запросы отклоняются nginx по таблице geo и не доходят до
+    приложений. Файл перезаписывается атомарно (временный файл + os.replace)
+    и только при изменении содержимого; изменения копятся, пока список не
+    успокоится на `debounce` секунд (но не дольше `max_delay`), после записи
+    выполняется `reload_command` (если nginx не следит за файлом сам).
+
+    При нескольких воркерах uvicorn фоновый экспорт выполняет один процесс -
+    владелец блокировки <файл>.lock; остальные ждут и подхватывают экспорт,
+    если владелец завершится.
+    """
+    def __init__(self, blocklist: Blocklist, path: str, reload_command: str = '',
+                 debounce: float = 5.0, max_delay: float = 60.0):
+        self.blocklist = blocklist
+        self.path = Path(path)
+        self.reload_command = reload_command
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self._version: Optional[int] = None
+        self._next_expiry = PERMANENT
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._lock_file = None
+
+    def render(self) -> Tuple[str, float]:
+        """Содержимое файла и ближайший срок истечения записи"""
+        networks, next_expiry = self.blocklist.active()
+        lines = [HEADER]
+        lines.extend(f"{ip} 0;\n" for ip in sorted(self.blocklist.trusted) if _is_network(ip))
+        lines.extend(f"{network} 1;\n" for network in sorted(networks) if network not in self.blocklist.trusted)
+        return ''.join(lines), next_expiry
+
+    def export(self) -> bool:
+        """Запись файла при изменении содержимого (True - файл обновлен)"""
+        self._version = self.blocklist.version
+        content, self._next_expiry = self.render()
+        try:
+            if self.path.read_text(encoding='utf-8') == content:
+                return False
+        except FileNotFoundError:
+            pass
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(f".{self.path.name}.{os.getpid()}.tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        logging.info(f"Список блокировок для nginx обновлен: {self.path}")
+        self.reload_nginx()
+        return True
+
+    def reload_nginx(self) -> None:
+        """Выполнение команды перезагрузки nginx (если задана)"""
+        if not self.reload_command:
+            return
+        try:
+            result = subprocess.run(
+                shlex.split(self.reload_command), capture_output=True, text=True, timeout=30
+            )
+        except (OSError, subprocess.TimeoutExpired) as e:
+            logging.error(f"Ошибка перезагрузки nginx: {e}")
+            return
+        if result.returncode != 0:
+            logging.error(f"Ошибка перезагрузки nginx ({result.returncode}): {result.stderr.strip()}")
+
+    def start(self) -> None:
+        """Запуск фонового экспорта"""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name='nginx-blocklist', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Остановка фонового экспорта"""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+        if self._lock_file is not None:
+            self._lock_file.close()  # блокировка снимается вместе с файлом
+            self._lock_file = None
+
+    def _acquire_export_lock(self) -> bool:
+        """Ожидание права на экспорт (False - экспорт остановлен)"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        lock_file = open(self.path.with_name(f".{self.path.name}.lock"), 'a')
+        while True:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                self._lock_file = lock_file
+                return True
+            except BlockingIOError:
+                if self._stopped.wait(self.max_delay):
+                    lock_file.close()
+                    return False
+
+    def _run(self) -> None:
+        try:
+            if not self._acquire_export_lock():
+                return
+        except OSError as e:
+            logging.error(f"Ошибка экспорта списка блокировок для nginx: {e}")
+            return
+        changed_at: Optional[float] = None
+        seen = self.blocklist.version
+        self._safe_export()
+        while not self._stopped.wait(self.debounce):
+            version = self.blocklist.version
+            now = time.time()
+            if version != seen:
+                # Список еще меняется: ждем затишья, но не дольше max_delay
+                seen = version
+                changed_at = changed_at or now
+                if now - changed_at < self.max_delay:
+                    continue
+            if (changed_at is not None and version != self._version) or now >= self._next_expiry:
+                changed_at = None
+                self._safe_export()
+
+    def _safe_export(self) -> None:
+        try:
+            self.export()
+        except OSError as e:
+            logging.error(f"Ошибка экспорта списка блокировок для nginx: {e}")
+
+
+if __name__ == "__main__":
+    # python -m common.nginx_blocklist <blocked_ips.txt> <nginx/blocklist/blocked_ips.conf> ["команда перезагрузки"] [--once]
+    import sys
+
+    logging.basicConfig(level=logging.INFO)
+    args = [arg for arg in sys.argv[1:] if arg != '--once']
+    blocklist = Blocklist(args[0])
+    exporter = NginxBlocklistExporter(blocklist, args[1], args[2] if len(args) > 2 else '')
+    if '--once' in sys.argv:
+        print(f"{args[1]}: {'updated' if exporter.export() else 'unchanged'}")
+        sys.exit(0)
+
+    blocklist.start()
+    exporter.start()
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        exporter.stop()
+        blocklist.stop()
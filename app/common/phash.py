@@ -0,0 +1,54 @@
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+from PIL import Image
+
+
+# Размер хеша: 8x8 бит (сравниваются соседние пиксели 9x8)
+HASH_SIZE = 8
+
+
+def dhash(path: Path, hash_size: int = HASH_SIZE) -> int:
+    """Разностный перцептивный хеш (dHash) изображения как signed int64.
+
+    JPEG декодируется в уменьшенном масштабе (draft), далее кадр сжимается
+    до (hash_size + 1) x hash_size в градациях серого; бит = яркость пикселя
+    меньше яркости соседа справа. Похожие кадры дают хеши с малым
+    расстоянием Хэмминга.
+    """
+    with Image.open(path) as img:
+        img.draft('L', ((hash_size + 1) * 8, hash_size * 8))
+        small = img.convert('L').resize((hash_size + 1, hash_size), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    value = int.from_bytes(np.packbits(bits).tobytes(), 'big')
+    # SQLite хранит INTEGER как signed int64
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+
+def distance(a: Optional[int], b: Optional[int]) -> int:
+    """Расстояние Хэмминга между хешами (64 - хеш отсутствует)"""
+    if a is None or b is None:
+        return 64
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count('1')
+
+
+if __name__ == "__main__":
+    # Хеши для кадров архива без хеша: python -m common.phash <static/images> <data/images.db>
+    import sys
+    import logging
+
+    from common.image_index import ImageIndex
+
+    index = ImageIndex(sys.argv[1], sys.argv[2])
+    done = 0
+    for name, _, value in index.rows():
+        if value is not None:
+            continue
+        try:
+            index.set_phash(name, dhash(Path(sys.argv[1]) / name))
+            done += 1
+        except Exception as e:
+            logging.error(f"dHash failed for {name}: {str(e)}")
+    print(f"{sys.argv[2]}: {done} hashes")
@@ -0,0 +1,174 @@
+import math
+import sqlite3
+import threading
+
+from collections import defaultdict
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# Метрики телеметрии, по которым ведутся агрегаты
+ROLLUP_METRICS = ['humidity', 'temperature', 'signal', 'voltage_sim', 'voltage_akb']
+
+# Разрешения агрегатов: начало корзины по ISO-дате 'YYYY-MM-DD HH:MM:SS'
+RESOLUTIONS = {
+    'hour': lambda iso: f"{iso[:13]}:00:00",
+    'day': lambda iso: f"{iso[:10]} 00:00:00",
+}
+
+
+def to_iso(date: str) -> Optional[str]:
+    """Преобразование даты из signals.csv ('dd.mm.YYYY HH:MM:SS') в ISO-формат"""
+    if len(date) != 19 or date[2] != '.' or date[5] != '.':
+        return None
+    return f"{date[6:10]}-{date[3:5]}-{date[0:2]} {date[11:19]}"
+
+
+def to_number(value) -> Optional[float]:
+    """Числовое значение метрики ('N/A' и NaN - отсутствие значения)"""
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if math.isnan(number) else number
+
+
+class TelemetryRollups:
+    """Почасовые и посуточные агрегаты телеметрии (count/sum/min/max) в SQLite.
+
+    Обновляются инкрементально при записи каждого показания (sim800-api),
+    читаются графиками длинных периодов (web-ui): стоимость запроса зависит
+    от количества корзин, а не от количества исходных показаний.
+    """
+    def __init__(self, db_path: str):
+        self.db_path = Path(db_path)
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def add(self, row: Dict) -> None:
+        """Учет одного показания во всех агрегатах"""
+        iso = to_iso(str(row.get('date', '')))
+        if iso is None:
+            return
+
+        values = [
+            (bucket(iso), resolution, metric, value)
+            for resolution, bucket in RESOLUTIONS.items()
+            for metric, value in ((m, to_number(row.get(m))) for m in ROLLUP_METRICS)
+            if value is not None
+        ]
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany('''
+                    INSERT INTO rollups (bucket, resolution, metric, count, sum, min, max)
+                    VALUES (?1, ?2, ?3, 1, ?4, ?4, ?4)
+                    ON CONFLICT (resolution, bucket, metric) DO UPDATE SET
+                        count = count + 1,
+                        sum = sum + excluded.sum,
+                        min = MIN(min, excluded.min),
+                        max = MAX(max, excluded.max)
+                ''', values)
+                conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'readings'")
+                conn.execute(
+                    "UPDATE meta SET text = MAX(COALESCE(text, ''), ?) WHERE key = 'last_date'",
+                    (iso,)
+                )
+
+    def rebuild(self, rows: Iterable[Dict]) -> None:
+        """Полный пересчет агрегатов по всем показаниям"""
+        stats: Dict[Tuple[str, str, str], List[float]] = defaultdict(lambda: [0, 0.0, math.inf, -math.inf])
+        readings = 0
+        last_date = None
+        for row in rows:
+            iso = to_iso(str(row.get('date', '')))
+            if iso is None:
+                continue
+            readings += 1
+            last_date = max(last_date or iso, iso)
+            for metric in ROLLUP_METRICS:
+                value = to_number(row.get(metric))
+                if value is None:
+                    continue
+                for resolution, bucket in RESOLUTIONS.items():
+                    s = stats[(resolution, bucket(iso), metric)]
+                    s[0] += 1
+                    s[1] += value
+                    s[2] = min(s[2], value)
+                    s[3] = max(s[3], value)
+
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute('DELETE FROM rollups')
+                conn.executemany(
+                    'INSERT INTO rollups (resolution, bucket, metric, count, sum, min, max) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                    (key + tuple(s) for key, s in stats.items())
+                )
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'readings'", (readings,))
+                conn.execute("UPDATE meta SET text = ? WHERE key = 'last_date'", (last_date,))
+
+    def accepts(self, date: str) -> bool:
+        """Учитывается ли показание с датой из signals.csv"""
+        return to_iso(date) is not None
+
+    def readings(self) -> int:
+        """Количество учтенных показаний"""
+        with self._lock:
+            return self._connection().execute(
+                "SELECT value FROM meta WHERE key = 'readings'"
+            ).fetchone()[0]
+
+    def last_date(self) -> Optional[str]:
+        """Дата последнего показания (ISO)"""
+        with self._lock:
+            return self._connection().execute(
+                "SELECT text FROM meta WHERE key = 'last_date'"
+            ).fetchone()[0]
+
+    def rows(self, resolution: str, start: Optional[str] = None) -> List[Tuple]:
+        """Агрегаты (bucket, metric, count, mean, min, max) начиная с ISO-даты `start`"""
+        with self._lock:
+            return self._connection().execute('''
+                SELECT bucket, metric, count, sum / count, min, max FROM rollups
+                WHERE resolution = ? AND bucket >= ?
+                ORDER BY bucket
+            ''', (resolution, start or '')).fetchall()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.executescript('''
+                CREATE TABLE IF NOT EXISTS rollups (
+                    resolution TEXT NOT NULL,
+                    bucket TEXT NOT NULL,
+                    metric TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    sum REAL NOT NULL,
+                    min REAL NOT NULL,
+                    max REAL NOT NULL,
+                    PRIMARY KEY (resolution, bucket, metric)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value INTEGER,
+                    text TEXT
+                );
+                INSERT OR IGNORE INTO meta (key, value) VALUES ('readings', 0);
+                INSERT OR IGNORE INTO meta (key, text) VALUES ('last_date', NULL);
+            ''')
+            self._conn = conn
+        return self._conn
+
+
+if __name__ == "__main__":
+    # Пересчет агрегатов по CSV: python -m common.rollups <signals.csv> <rollups.db>
+    import csv
+    import sys
+
+    with open(sys.argv[1], 'r', newline='', encoding='utf-8') as f:
+        rollups = TelemetryRollups(sys.argv[2])
+        rollups.rebuild(csv.DictReader(f))
+    print(f"{sys.argv[2]}: {rollups.readings()} readings, last {rollups.last_date()}")
@@ -0,0 +1,222 @@
+import re
+
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+
+# Правила проверки запросов: имя правила -> подстроки (сравнение без учета регистра)
+RULES: Dict[str, Tuple[str, ...]] = {
+    'blocked_path': (
+        '.env', '.git', 'config.json', 'secrets.yaml', 'secrets.yml',
+        'php-cgi', 'wp-admin', 'adminer', 'backup', '.powenv', '.profile',
+        'cgi-bin', 'bin/sh', 'eval-stdin.php', 'pearcmd', '.s3cfg',
+        'vendor/phpunit', 'think/app', 'util/php', '_info.php', '_phpinfo.php',
+        'restore.php', 'backup.php', 'recovery.php', '_poopinfo.php',
+        'wp-login.php', 'admin.php', 'config.php', '.phpinfo', '_profiler/info',
+    ),
+    'blocked_keyword': (
+        'allow_url_include', 'auto_prepend_file',
+        'call_user_func_array', 'invokefunction',
+        'config-create', '/../../', '%2e%2e',
+        'xdebug_session_start', 'phpstorm', 'debug',
+    ),
+    'traversal': (
+        '../', '..\\', '%2e%2e/', '%2e%2e%2f',
+        '..;/', '..5c', '..%255c', '..%c0%af',
+    ),
+    'php_injection': (
+        'php://', '<?php', '<?=', 'phar://', 'expect://',
+        'zlib://', 'data://', 'glob://', 'ssh2://',
+    ),
+    'exploit': (
+        's=/index/\\think\\app/invokefunction',
+        'function=call_user_func_array',
+        'vars[0]=md5',
+        'lang=../../../../../../../../',
+    ),
+    'user_agent': (
+        'nmap', 'sqlmap', 'nikto', 'metasploit', 'havij',
+        'dirbuster', 'wpscan', 'acunetix', 'nessus',
+        'firefox/14.0a1', 'firefox/44.0', 'chrome/3.0.195.17',
+    ),
+}
+
+# Правила, которые применяются к User-Agent (к URL применяются все)
+USER_AGENT_RULES = ('user_agent',)
+
+# Части URL, к которым применяются правила в web-ui: слова вроде 'backup' или
+# 'debug' встречаются в обычных адресах интерфейса, поэтому пути проверяются
+# только на опасные пути, строка запроса - на ключевые слова и инъекции.
+# sim800-api проверяет все правила по строке 'путь?запрос'.
+WEB_URL_FIELDS: Dict[str, Tuple[str, ...]] = {
+    'blocked_path': ('path',),
+    'blocked_keyword': ('query',),
+    'traversal': ('path', 'query'),
+    'php_injection': ('query',),
+    'exploit': ('query',),
+}
+
+MAX_URL_LENGTH = 512
+
+
+def trie_pattern(words: Iterable[str]) -> str:
+    """Регулярное выражение-префиксное дерево для набора подстрок.
+
+    Общие префиксы объединяются ('backup', 'backup.php' -> 'backup(?:\\.php)?'),
+    поэтому в каждой позиции строки проверяется не список альтернатив,
+    а один путь по дереву (аналог автомата Ахо-Корасик средствами re).
+    """
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def emit(node: Dict) -> str:
+        final = '' in node
+        branches = [re.escape(char) + emit(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and not final:
+            return branches[0]
+        body = f"(?:{'|'.join(branches)})"
+        return body + '?' if final else body
+
+    return emit(trie)
+
+
+def compile_words(words: Iterable[str]) -> Optional[Pattern]:
+    """Регулярное выражение для набора подстрок (None - набор пуст)"""
+    pattern = trie_pattern(words)
+    return re.compile(pattern) if pattern else None
+
+
+class SecurityMatcher:
+    """Проверка запроса по всем правилам за один проход.
+
+    Все подстроки собраны в одно регулярное выражение (префиксное дерево);
+    сработавшее правило определяется по найденной подстроке. Строка
+    'путь?запрос' и User-Agent приводятся к нижнему регистру и
+    просматриваются по одному разу.
+
+    С `url_fields` (правило -> 'path' / 'query') путь и строка запроса
+    проверяются отдельно, каждая только по своим правилам.
+    """
+    def __init__(self, rules: Dict[str, Tuple[str, ...]] = RULES,
+                 agent_rules: Tuple[str, ...] = USER_AGENT_RULES,
+                 max_url_length: int = MAX_URL_LENGTH,
+                 url_fields: Optional[Dict[str, Tuple[str, ...]]] = None):
+        self.max_url_length = max_url_length
+        self.url_fields = url_fields
+        self._rule_by_word: Dict[str, str] = {}
+        for rule, words in rules.items():
+            for word in words:
+                self._rule_by_word.setdefault(word.lower(), rule)
+        self._url_pattern = compile_words(self._rule_by_word)
+        self._agent_pattern = compile_words(
+            word for word, rule in self._rule_by_word.items() if rule in agent_rules
+        )
+        if url_fields is not None:
+            self._path_pattern = compile_words(
+                word for word, rule in self._rule_by_word.items() if 'path' in url_fields.get(rule, ())
+            )
+            self._query_pattern = compile_words(
+                word for word, rule in self._rule_by_word.items() if 'query' in url_fields.get(rule, ())
+            )
+
+    def search(self, text: str) -> Optional[Tuple[str, str]]:
+        """Поиск по всем правилам в строке: (правило, подстрока) или None"""
+        return self._search(self._url_pattern, text)
+
+    def _search(self, pattern: Optional[Pattern], text: str) -> Optional[Tuple[str, str]]:
+        if pattern is None or not text:
+            return None
+        match = pattern.search(text.lower())
+        if match is None:
+            return None
+        return self._rule_by_word[match.group()], match.group()
+
+    def check(self, path: str, query: str = '', user_agent: str = '') -> Optional[Tuple[str, str]]:
+        """Проверка запроса: (правило, подстрока) или None.
+
+        Длина проверяется по пути и строке запроса (без схемы и хоста),
+        чтобы не собирать полный URL.
+        """
+        if len(path) + len(query) + 1 > self.max_url_length:
+            return 'url_length', str(self.max_url_length)
+
+        if self.url_fields is None:
+            found = self.search(f"{path}?{query}")
+        else:
+            found = self._search(self._path_pattern, path) or self._search(self._query_pattern, query)
+        if found is not None:
+            return found
+        return self._search(self._agent_pattern, user_agent)
+
+
+security_matcher = SecurityMatcher()
+web_security_matcher = SecurityMatcher(url_fields=WEB_URL_FIELDS)
+traversal_matcher = SecurityMatcher({'traversal': RULES['traversal']})
+
+
+def _naive_check(path: str, query: str, user_agent: str) -> Optional[str]:
+    """Прежний способ проверки (отдельный цикл any() по каждому списку) для сравнения"""
+    target = f"{path}?{query}".lower()
+    user_agent = user_agent.lower()
+    for rule, words in RULES.items():
+        if any(word in target for word in words):
+            return rule
+        if rule in USER_AGENT_RULES and any(word in user_agent for word in words):
+            return rule
+    return None
+
+
+def load_corpus(path: Path) -> Iterable[Tuple[str, str, str, str]]:
+    """Корпус запросов: строки 'ожидание<TAB>URL[<TAB>User-Agent]' ('#' - комментарий)"""
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.rstrip('\n')
+            if not line or line.startswith('#'):
+                continue
+            expected, url, *agent = line.split('\t')
+            path, _, query = url.partition('?')
+            yield expected, path, query, agent[0] if agent else ''
+
+
+def corpus_mismatches(matcher: SecurityMatcher, path: Path) -> List[Tuple[str, str, str]]:
+    """Запросы корпуса с неожиданным результатом: (URL, ожидаемое правило, полученное)"""
+    mismatches = []
+    for expected, url_path, query, agent in load_corpus(path):
+        found = matcher.check(url_path, query, agent)
+        rule = found[0] if found else 'allow'
+        if rule != expected:
+            mismatches.append((f"{url_path}?{query}", expected, rule))
+    return mismatches
+
+
+if __name__ == "__main__":
+    # Микробенчмарк: python -m common.security_patterns [корпус] [кол-во повторов]
+    import sys
+    import time
+
+    corpus_path = Path(sys.argv[1]) if len(sys.argv) > 1 else Path(__file__).with_name('security_corpus.txt')
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    corpus = list(load_corpus(corpus_path))
+
+    mismatches = corpus_mismatches(security_matcher, corpus_path)
+    if len(sys.argv) <= 1:
+        mismatches += corpus_mismatches(web_security_matcher, corpus_path.with_name('security_corpus_web.txt'))
+    for url, expected, rule in mismatches:
+        print(f"MISMATCH {url}: expected {expected}, got {rule}")
+
+    for name, check in (('naive any()', _naive_check), ('single pass', security_matcher.check)):
+        for label, subset in (('benign', [r for r in corpus if r[0] == 'allow']),
+                              ('scanner', [r for r in corpus if r[0] != 'allow'])):
+            started = time.perf_counter()
+            for _ in range(repeat):
+                for _, path, query, agent in subset:
+                    check(path, query, agent)
+            elapsed = time.perf_counter() - started
+            print(f"{name:12} {label:8} {elapsed / (repeat * len(subset)) * 1e6:6.2f} us/request")
+    print(f"{len(corpus)} requests, {len(mismatches)} mismatches")
@@ -0,0 +1,121 @@
+import os
+import logging
+import threading
+
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Optional, Tuple
+
+from PIL import Image
+
+
+# Размер миниатюры (вписывается с сохранением пропорций) и качество JPEG
+THUMBNAIL_SIZE = (320, 240)
+THUMBNAIL_QUALITY = 70
+
+
+def make_thumbnail(src: Path, dst: Path, size: Tuple[int, int] = THUMBNAIL_SIZE,
+                   quality: int = THUMBNAIL_QUALITY) -> Path:
+    """Создание миниатюры JPEG.
+
+    draft() включает декодирование JPEG сразу в уменьшенном масштабе (1/2, 1/4, 1/8),
+    поэтому полноразмерный кадр не распаковывается целиком.
+    """
+    with Image.open(src) as img:
+        img.draft('RGB', size)
+        img = img.convert('RGB')
+        img.thumbnail(size)
+
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = dst.with_name(f".{dst.name}.tmp")
+        img.save(tmp_path, 'JPEG', quality=quality, optimize=True)
+    os.replace(tmp_path, dst)
+    return dst
+
+
+class ThumbnailPool:
+    """Фоновое создание миниатюр на ограниченном пуле потоков.
+
+    Очередь ограничена: при переполнении submit() не ставит задачу
+    (вызывающий повторит ее позже или миниатюру досоздаст backfill).
+    """
+    def __init__(self, image_dir: str, thumb_dir: str, workers: int = 2, max_pending: int = 32):
+        self.image_dir = Path(image_dir)
+        self.thumb_dir = Path(thumb_dir)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='thumbnail')
+        self._slots = threading.BoundedSemaphore(max_pending)
+
+    def submit(self, name: str) -> Optional[Future]:
+        """Постановка миниатюры в очередь (None - очередь переполнена)"""
+        if not self._slots.acquire(blocking=False):
+            logging.warning(f"Thumbnail queue is full: {name}")
+            return None
+        try:
+            return self._executor.submit(self._run, name)
+        except RuntimeError:
+            self._slots.release()
+            raise
+
+    def path(self, name: str) -> Path:
+        """Путь к миниатюре кадра"""
+        return self.thumb_dir / name
+
+    def remove(self, name: str) -> None:
+        """Удаление миниатюры вместе с кадром"""
+        try:
+            self.path(name).unlink()
+        except FileNotFoundError:
+            pass
+
+    def _run(self, name: str) -> Path:
+        try:
+            return make_thumbnail(self.image_dir / name, self.path(name))
+        finally:
+            self._slots.release()
+
+
+def _backfill_one(args: Tuple[Path, Path]) -> Optional[str]:
+    src, dst = args
+    try:
+        make_thumbnail(src, dst)
+        return None
+    except Exception as e:
+        return f"{src.name}: {str(e)}"
+
+
+def backfill(image_dir: str, thumb_dir: str, workers: Optional[int] = None,
+             extension: str = '.jpg') -> int:
+    """Создание недостающих (и устаревших) миниатюр для архива кадров в несколько процессов"""
+    image_dir, thumb_dir = Path(image_dir), Path(thumb_dir)
+    tasks = []
+    with os.scandir(image_dir) as entries:
+        for entry in entries:
+            if not entry.name.endswith(extension) or not entry.is_file():
+                continue
+            dst = thumb_dir / entry.name
+            try:
+                if dst.stat().st_mtime >= entry.stat().st_mtime:
+                    continue
+            except FileNotFoundError:
+                pass
+            tasks.append((Path(entry.path), dst))
+
+    done = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for error in pool.map(_backfill_one, tasks, chunksize=16):
+            if error:
+                logging.error(f"Thumbnail failed for {error}")
+            else:
+                done += 1
+    return done
+
+
+if __name__ == "__main__":
+    # python -m common.thumbnails <static/images> <static/thumbs> [кол-во процессов]
+    import sys
+    import time
+
+    logging.basicConfig(level=logging.INFO)
+    started = time.time()
+    count = backfill(sys.argv[1], sys.argv[2], int(sys.argv[3]) if len(sys.argv) > 3 else None)
+    print(f"{sys.argv[2]}: {count} thumbnails in {time.time() - started:.1f}s")
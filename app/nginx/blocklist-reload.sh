@@ -0,0 +1,23 @@
+#!/bin/sh
+# Перезагрузка nginx при изменении карты заблокированных IP.
+# Файл пишет sim800-api (common.nginx_blocklist) атомарной заменой, поэтому
+# изменение видно по inode/mtime. Скрипт запускается из /docker-entrypoint.d.
+
+BLOCKLIST=/etc/nginx/blocklist/blocked_ips.conf
+INTERVAL=${BLOCKLIST_RELOAD_INTERVAL:-5}
+
+watch_blocklist() {
+    last=$(stat -c '%i %Y %s' "$BLOCKLIST" 2>/dev/null)
+    while sleep "$INTERVAL"; do
+        current=$(stat -c '%i %Y %s' "$BLOCKLIST" 2>/dev/null)
+        [ "$current" = "$last" ] && continue
+        last=$current
+        if nginx -t -q; then
+            nginx -s reload
+        else
+            echo "blocklist-reload: invalid $BLOCKLIST, reload skipped" >&2
+        fi
+    done
+}
+
+watch_blocklist &
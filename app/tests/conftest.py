@@ -0,0 +1,81 @@
+import os
+import shutil
+import sys
+import tempfile
+import types
+from pathlib import Path
+
+import pytest
+
+# Сервисы импортируют модули плоско (как в контейнерах), common - из корня app
+APP_DIR = Path(__file__).resolve().parent.parent
+sys.path[:0] = [str(APP_DIR), str(APP_DIR / 'app_sim800')]
+
+# Значение по умолчанию {} в Settings не проходит валидацию как set
+os.environ.setdefault('TRUSTED_IPS', '[]')
+
+# Сервисы работают с относительными путями (.env, data/, static/): тесты
+# запускаются в пустом каталоге, чтобы не читать и не менять файлы репозитория
+os.chdir(tempfile.mkdtemp(prefix='app-tests-'))
+
+
+@pytest.fixture(scope='session')
+def sim800_client():
+    """Клиент API sim800 с отключенными лимитами запросов"""
+    from fastapi.testclient import TestClient
+
+    import main
+    from limiter import limiter
+
+    shutil.copy(APP_DIR / 'camera_settings.json', 'camera_settings.json')
+    limiter.enabled = False
+    with TestClient(main.app) as client:
+        yield client
+    limiter.enabled = True
+
+
+def jpeg_bytes(color=(0, 0, 0), size=(16, 16)) -> bytes:
+    """Небольшой JPEG-кадр (цвет делает содержимое уникальным)"""
+    from io import BytesIO
+
+    from PIL import Image
+
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return buffer.getvalue()
+
+
+# Модули, имена которых совпадают у сервисов sim800 и web
+SHARED_MODULE_NAMES = ('config', 'main', 'utilits')
+
+
+@pytest.fixture(scope='session')
+def web():
+    """Модули web-сервиса (config, database, series, main) за nginx
+
+    Веб-сервис импортируется со своими config/main/utilits, после чего
+    модули sim800 возвращаются в sys.modules под прежними именами.
+    """
+    saved = {name: sys.modules.pop(name, None) for name in SHARED_MODULE_NAMES}
+    os.environ['USE_NGINX'] = 'True'
+    os.environ.setdefault('PASSWORD_HASH_TARGET_MS', '1')
+    sys.path.insert(0, str(APP_DIR / 'app_web'))
+    try:
+        import config
+        import database
+        import series
+        import main
+    finally:
+        sys.path.remove(str(APP_DIR / 'app_web'))
+        for name, module in saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+
+    main.app.template_folder = str(APP_DIR / 'templates')
+    main.app.config['TESTING'] = True
+    main.limiter.enabled = False
+    main.initialize_app()
+    yield types.SimpleNamespace(config=config, database=database, series=series, main=main)
+    main.blocklist.stop()
@@ -0,0 +1,86 @@
+import types
+
+import pytest
+
+import common.blocklist as blocklist_module
+from common.blocklist import Blocklist
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {'time': 1_800_000_000.0}
+    monkeypatch.setattr(blocklist_module, 'time', types.SimpleNamespace(time=lambda: now['time']))
+    return now
+
+
+def make_blocklist(tmp_path, lines=(), **kwargs):
+    path = tmp_path / 'blocked_ips.txt'
+    path.write_text(''.join(f"{line}\n" for line in lines))
+    return path, Blocklist(str(path), reload_signal=None, **kwargs)
+
+
+def test_networks_and_addresses(tmp_path):
+    _, blocklist = make_blocklist(tmp_path, [
+        '10.0.0.0/8', '192.168.1.5/24', '2001:db8::/32', '203.0.113.7', '# комментарий', 'garbage',
+    ])
+    for ip in ('10.200.3.4', '192.168.1.77', '2001:db8:1::5', '203.0.113.7', '::ffff:10.0.0.1'):
+        assert blocklist.is_blocked(ip), ip
+    for ip in ('11.0.0.1', '192.168.2.1', '2001:db9::1', '203.0.113.8', 'testclient'):
+        assert not blocklist.is_blocked(ip), ip
+
+
+def test_block_with_ttl(tmp_path, clock):
+    path, blocklist = make_blocklist(tmp_path, trusted=['198.51.100.1'], ttl=60)
+    blocklist.block('198.51.100.1', 'trusted')
+    blocklist.block('198.51.100.2', 'ttl')
+    blocklist.block('198.51.100.3', 'permanent', ttl=0)
+    assert path.read_text() == f"198.51.100.2 {int(clock['time']) + 60}\n198.51.100.3\n"
+
+    assert not blocklist.is_blocked('198.51.100.1')
+    assert blocklist.is_blocked('198.51.100.2')
+    clock['time'] += 61
+    assert not blocklist.is_blocked('198.51.100.2')
+    assert blocklist.is_blocked('198.51.100.3')
+
+
+def test_covered_block_not_appended(tmp_path):
+    path, blocklist = make_blocklist(tmp_path, ['10.0.0.0/8'])
+    blocklist.block('10.1.1.1', 'covered by a network')
+    blocklist.block('203.0.113.7', 'new')
+    blocklist.block('203.0.113.7', 'repeat')
+    assert path.read_text() == '10.0.0.0/8\n203.0.113.7\n'
+
+
+def test_other_process_appends_read_incrementally(tmp_path):
+    path, web = make_blocklist(tmp_path)
+    sim800 = Blocklist(str(path), reload_signal=None)
+    sim800.block('203.0.113.9', 'scanner')
+    assert not web.is_blocked('203.0.113.9')
+    web.refresh()
+    assert web.is_blocked('203.0.113.9')
+
+
+def test_compaction(tmp_path, clock):
+    expired = int(clock['time']) - 1
+    active = int(clock['time']) + 3600
+    path, blocklist = make_blocklist(tmp_path, [
+        '203.0.113.7', '203.0.113.7',           # повтор
+        f'198.51.100.1 {expired}',              # истек
+        f'198.51.100.2 {active}',
+        '10.1.2.3', '10.0.0.0/8',               # адрес покрыт подсетью
+        'garbage',
+    ])
+    other = Blocklist(str(path), reload_signal=None)
+
+    assert blocklist.compact() == 3
+    assert sorted(path.read_text().splitlines()) == sorted(
+        ['10.0.0.0/8', '203.0.113.7', f'198.51.100.2 {active}']
+    )
+    assert blocklist.compact() == 0
+    assert blocklist.is_blocked('10.1.2.3') and blocklist.is_blocked('198.51.100.2')
+
+    # Файл перезаписан на месте: другой процесс замечает это и перечитывает его
+    blocklist.block('192.0.2.1', 'after compaction')
+    other.refresh()
+    assert other.is_blocked('192.0.2.1') and other.is_blocked('203.0.113.7')
+    assert not other.is_blocked('198.51.100.1')
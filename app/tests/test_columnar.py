@@ -0,0 +1,21 @@
+from datetime import datetime
+
+from common.columnar import ColumnarTelemetry
+
+
+def reading(date):
+    return {'date': date, 'humidity': 40, 'temperature': 21.5, 'signal': 20,
+            'voltage_sim': 4000, 'voltage_akb': 3.9}
+
+
+def test_out_of_order_row_from_other_worker(tmp_path):
+    # Два экземпляра - как два воркера, пишущих в один каталог
+    first = ColumnarTelemetry(str(tmp_path))
+    second = ColumnarTelemetry(str(tmp_path))
+    first.add(reading('18.10.2026 10:00:00'))
+    second.add(reading('18.10.2026 12:00:00'))
+    first.add(reading('18.10.2026 11:00:00'))
+
+    data = second.read(datetime(2026, 10, 18, 10, 30), datetime(2026, 10, 18, 11, 30))
+    assert [str(d) for d in data['date']] == ['2026-10-18T11:00:00']
+    assert first.readings() == 3
@@ -0,0 +1,20 @@
+from common.devices import device_partition, list_devices, parse_devices
+
+FRAME = '20261018_120000_{}_volt_4000_sig_20_up_1_t_21.5_h_40.0_akb_3.91.jpg'
+
+
+def test_only_listed_devices_get_partitions():
+    devices = parse_devices(' B7, cam-2,bad.id,')
+    assert devices == {'B7', 'cam-2'}
+    assert device_partition(FRAME.format('B7'), 'A', devices) == 'B7'
+    assert device_partition(FRAME.format('A'), 'A', devices) == ''
+    assert device_partition(FRAME.format('C'), 'A', devices) == ''
+    # Не имя кадра прошивки
+    assert device_partition('20261018_120000_B7.jpg', 'A', devices) == ''
+    assert device_partition(FRAME.format('B7'), 'A', ()) == ''
+
+
+def test_list_devices_ignores_unlisted_directories(tmp_path):
+    for device in ('B7', 'junk1'):
+        (tmp_path / 'devices' / device / 'images').mkdir(parents=True)
+    assert list_devices(str(tmp_path / 'images'), {'B7', 'C'}) == ['B7']
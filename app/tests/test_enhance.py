@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+import utilits
+from common.devices import DevicePartitions
+from common.image_index import ImageIndex
+from conftest import jpeg_bytes
+
+
+@pytest.fixture
+def frame(tmp_path, monkeypatch):
+    """Кадр в отдельном каталоге изображений, внесенный в индекс"""
+    image_dir = tmp_path / 'images'
+    image_dir.mkdir()
+    index = ImageIndex(str(image_dir), str(tmp_path / 'images.db'))
+    monkeypatch.setattr(utilits.config, 'image_folder', str(image_dir))
+    monkeypatch.setattr(utilits, 'image_indexes', DevicePartitions(lambda device: index))
+
+    path = image_dir / 'a.jpg'
+    path.write_bytes(jpeg_bytes((90, 60, 30), size=(64, 48)))
+    index.add(path.name)
+    return path
+
+
+def run_job(name):
+    asyncio.run(utilits.job_enhance({'name': name, 'device': ''}))
+
+
+def test_enhance_job_applied_once(frame):
+    original, mtime = frame.read_bytes(), frame.stat().st_mtime_ns
+    run_job(frame.name)
+    enhanced = frame.read_bytes()
+    assert enhanced != original
+    assert frame.stat().st_mtime_ns == mtime
+
+    # Повтор задачи (например, после истечения аренды) не перекодирует кадр
+    run_job(frame.name)
+    assert frame.read_bytes() == enhanced
+
+
+def test_failed_enhance_released_for_retry(frame, monkeypatch):
+    original = frame.read_bytes()
+
+    def broken(src, dst):
+        raise OSError('disk full')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(utilits, 'enhance_file', broken)
+        with pytest.raises(OSError):
+            run_job(frame.name)
+    assert frame.read_bytes() == original
+
+    run_job(frame.name)
+    assert frame.read_bytes() != original
+
+
+def test_enhance_job_skips_deleted_frame(frame):
+    frame.unlink()
+    run_job(frame.name)
+    assert not frame.exists()
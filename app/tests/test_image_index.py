@@ -0,0 +1,96 @@
+import os
+import time
+
+from common.image_index import ImageIndex
+
+
+def write_frame(directory, name):
+    (directory / name).write_bytes(b'\xff\xd8')
+
+
+def make_index(tmp_path):
+    image_dir = tmp_path / 'images'
+    image_dir.mkdir()
+    return image_dir, ImageIndex(str(image_dir), str(tmp_path / 'images.db'))
+
+
+def test_add_keeps_external_deletion(tmp_path):
+    image_dir, index = make_index(tmp_path)
+    for name in ('a.jpg', 'b.jpg'):
+        write_frame(image_dir, name)
+    assert index.latest() == ['a.jpg', 'b.jpg']
+
+    time.sleep(0.01)
+    os.remove(image_dir / 'a.jpg')  # удален вручную, индекс еще не читали
+    before = index.dir_mtime_ns()
+    write_frame(image_dir, 'c.jpg')
+    index.add('c.jpg', before)
+
+    assert sorted(index.latest()) == ['b.jpg', 'c.jpg']
+    assert index.count() == 2
+
+
+def test_remove_keeps_external_addition(tmp_path):
+    image_dir, index = make_index(tmp_path)
+    for name in ('a.jpg', 'b.jpg'):
+        write_frame(image_dir, name)
+    assert index.count() == 2
+
+    time.sleep(0.01)
+    write_frame(image_dir, 'x.jpg')  # скопирован вручную
+    before = index.dir_mtime_ns()
+    os.remove(image_dir / 'a.jpg')
+    index.remove(['a.jpg'], before)
+
+    assert sorted(index.latest()) == ['b.jpg', 'x.jpg']
+
+
+def test_own_writes_do_not_rescan(tmp_path, monkeypatch):
+    image_dir, index = make_index(tmp_path)
+    write_frame(image_dir, 'a.jpg')
+    assert index.count() == 1
+
+    def fail(conn):
+        raise AssertionError('unexpected sync')
+
+    monkeypatch.setattr(index, '_sync', fail)
+    before = index.dir_mtime_ns()
+    write_frame(image_dir, 'b.jpg')
+    index.add('b.jpg', before)
+    assert index.latest() == ['a.jpg', 'b.jpg']
+
+
+def test_enhance_claimed_once(tmp_path):
+    image_dir, index = make_index(tmp_path)
+    write_frame(image_dir, 'a.jpg')
+    index.add('a.jpg')
+
+    assert index.claim_enhance('a.jpg')
+    assert not index.claim_enhance('a.jpg')  # повтор задачи
+    index.release_enhance('a.jpg')
+    assert index.claim_enhance('a.jpg')
+    assert not index.claim_enhance('missing.jpg')
+
+    index.rebuild()  # mtime не изменился - отметка сохраняется
+    assert not index.claim_enhance('a.jpg')
+
+
+def test_upload_hash_shared_between_workers(tmp_path):
+    _, index = make_index(tmp_path)
+    other_worker = ImageIndex(str(tmp_path / 'images'), str(tmp_path / 'images.db'))
+
+    assert index.reserve_upload('abc', '20261018_120000_a.jpg', 60) is None
+    assert other_worker.reserve_upload('abc', '20261018_120030_a.jpg', 60) == '20261018_120000_a.jpg'
+    assert other_worker.reserve_upload('def', '20261018_120030_b.jpg', 60) is None
+
+    # Кадр не сохранился - повтор будет записан как новый
+    index.release_upload('abc', '20261018_120000_a.jpg')
+    assert other_worker.reserve_upload('abc', '20261018_120100_a.jpg', 60) is None
+
+
+def test_upload_hash_expires(tmp_path):
+    _, index = make_index(tmp_path)
+    assert index.reserve_upload('abc', 'first.jpg', 0) is None
+    assert index.reserve_upload('abc', 'second.jpg', 60) is None
+    assert index.reserve_upload('abc', 'third.jpg', 60) == 'second.jpg'
+    assert index._connection().execute('SELECT COUNT(*) FROM uploads').fetchone()[0] == 1
@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+from jobs import JobQueue, JobWorker
+
+
+def test_claimed_job_leased_until_expiry(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'), lease_seconds=60)
+    queue.enqueue([('thumbnail', {'name': 'a.jpg'})])
+
+    job_id, kind, payload, attempts = queue.claim()
+    assert (kind, payload, attempts) == ('thumbnail', {'name': 'a.jpg'}, 0)
+    # Задача в аренде у первого воркера
+    assert queue.claim() is None
+    assert queue.next_run() >= time.time() + 59
+
+    # Воркер умер, аренда истекла - задача выдается повторно
+    expired = JobQueue(str(tmp_path / 'jobs.db'), lease_seconds=0)
+    expired.enqueue([('phash', {'name': 'b.jpg'})])
+    first = expired.claim()
+    assert expired.claim()[0] == first[0]
+
+    queue.complete(job_id)
+    queue.complete(first[0])
+    assert queue.claim() is None and queue.next_run() is None
+
+
+def test_retry_backoff_then_failed(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'), max_attempts=3, retry_delay=10, max_retry_delay=15)
+    queue.enqueue([('enhance', {'name': 'a.jpg'})])
+    job_id, _, _, attempts = queue.claim()
+
+    before = time.time()
+    assert queue.retry(job_id, attempts, 'boom') is True
+    assert queue.claim() is None
+    assert before + 10 <= queue.next_run() <= time.time() + 10
+
+    queue.retry(job_id, 1, 'boom')
+    assert queue.next_run() <= time.time() + 15  # задержка ограничена max_retry_delay
+
+    assert queue.retry(job_id, 2, 'final') is False
+    assert queue.next_run() is None
+    status, attempts, error = queue._connection().execute(
+        'SELECT status, attempts, last_error FROM jobs WHERE id = ?', (job_id,)
+    ).fetchone()
+    assert (status, attempts, error) == ('failed', 3, 'final')
+
+
+def test_worker_retries_failed_handler(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'), retry_delay=0)
+    calls = []
+
+    async def flaky(payload):
+        calls.append(payload['n'])
+        if len(calls) == 1:
+            raise OSError('disk busy')
+
+    async def run():
+        worker = JobWorker(queue, {'flaky': flaky}, poll_interval=0.05)
+        worker.start()
+        queue.enqueue([('flaky', {'n': 1})])
+        worker.notify()
+        for _ in range(100):
+            if queue.next_run() is None and len(calls) == 2:
+                break
+            await asyncio.sleep(0.02)
+        await worker.stop()
+
+    asyncio.run(run())
+    assert calls == [1, 1]
+    assert queue._connection().execute('SELECT COUNT(*) FROM jobs').fetchone()[0] == 0
@@ -0,0 +1,57 @@
+import sys
+import time
+
+from common.blocklist import Blocklist
+from common.nginx_blocklist import HEADER, NginxBlocklistExporter
+
+
+def make_exporter(tmp_path, lines=(), trusted=(), **kwargs):
+    path = tmp_path / 'blocked_ips.txt'
+    path.write_text(''.join(f"{line}\n" for line in lines))
+    blocklist = Blocklist(str(path), trusted, reload_signal=None)
+    return blocklist, NginxBlocklistExporter(blocklist, str(tmp_path / 'nginx' / 'blocked_ips.conf'), **kwargs)
+
+
+def test_render_geo_map(tmp_path):
+    expires = int(time.time()) + 600
+    _, exporter = make_exporter(tmp_path, [
+        '203.0.113.7', f'198.51.100.0/24 {expires}', f'192.0.2.1 {int(time.time()) - 1}', '10.0.0.5',
+    ], trusted=['10.0.0.5', '172.21.0.0/16', 'nginx'])
+
+    content, next_expiry = exporter.render()
+    assert content == HEADER + (
+        '10.0.0.5 0;\n'
+        '172.21.0.0/16 0;\n'
+        '198.51.100.0/24 1;\n'
+        '203.0.113.7 1;\n'
+    )
+    assert next_expiry == expires
+
+
+def test_export_only_on_change(tmp_path):
+    marker = tmp_path / 'reloads'
+    command = f"{sys.executable} -c \"open(r'{marker}', 'a').write('x')\""
+    blocklist, exporter = make_exporter(tmp_path, ['203.0.113.7'], reload_command=command)
+
+    assert exporter.export() is True
+    assert exporter.export() is False
+    blocklist.block('203.0.113.8', 'scanner')
+    assert exporter.export() is True
+
+    assert exporter.path.read_text().endswith('203.0.113.7 1;\n203.0.113.8 1;\n')
+    assert marker.read_text() == 'xx'
+    assert [p.name for p in exporter.path.parent.iterdir() if p.name.endswith('.tmp')] == []
+
+
+def test_single_exporting_worker(tmp_path):
+    _, leader = make_exporter(tmp_path)
+    _, follower = make_exporter(tmp_path)
+    assert leader._acquire_export_lock()
+
+    follower._stopped.set()  # не ждать max_delay: попытка без ожидания
+    assert not follower._acquire_export_lock()
+
+    leader.stop()
+    follower._stopped.clear()
+    assert follower._acquire_export_lock()
+    follower.stop()
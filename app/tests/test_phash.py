@@ -0,0 +1,52 @@
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from common.phash import dhash, distance
+from config import Settings
+from utilits import retention_candidates
+
+
+def save_scene(path, flip=False, quality=90, brightness=1.0):
+    y, x = np.mgrid[0:120, 0:160]
+    pixels = (np.sin(x / 17.0) * np.cos(y / 23.0) * 100 + 128 + x / 4).astype(np.uint8)
+    image = Image.fromarray(pixels[:, ::-1] if flip else pixels).convert('RGB')
+    image = ImageEnhance.Brightness(image).enhance(brightness)
+    image.save(path, 'JPEG', quality=quality)
+    return path
+
+
+def test_dhash_close_for_reencoded_frame(tmp_path):
+    original = dhash(save_scene(tmp_path / 'a.jpg'))
+    reencoded = dhash(save_scene(tmp_path / 'b.jpg', quality=40, brightness=1.1))
+    flipped = dhash(save_scene(tmp_path / 'c.jpg', flip=True))
+
+    assert -(1 << 63) <= original < (1 << 63)
+    assert distance(original, reencoded) <= 5
+    assert distance(original, flipped) > 10
+
+
+def test_distance():
+    assert distance(5, 5) == 0
+    assert distance(-1, 0) == 64
+    assert distance(-(1 << 63), 0) == 1
+    assert distance(None, 0) == distance(0, None) == 64
+
+
+def frame(n, up='0'):
+    return f'20261018_12000{n}_A_volt_4100_sig_20_up_{up}_t_21_h_40_akb_3.9.jpg'
+
+
+def test_retention_evicts_near_duplicates_first():
+    config = Settings(display_last_images=3, retention_motion_share=0.0)
+    # От новых к старым; 1 почти совпадает с 2, 3 - точная копия 4
+    rows = [(frame(5), 5, 0b1111), (frame(1), 4, 0b0111), (frame(2), 3, 0b0011),
+            (frame(3), 2, 0xF0F0), (frame(4), 1, 0xF0F0)]
+    assert retention_candidates(rows, config) == [frame(3), frame(1)]
+
+
+def test_retention_keeps_motion_frames():
+    config = Settings(display_last_images=3, retention_motion_share=0.34)
+    rows = [(frame(5), 5, None), (frame(1), 4, None), (frame(2), 3, None),
+            (frame(3), 2, None), (frame(4, up='2'), 1, None)]
+    # Кадр по движению закреплен, вместо него удаляются самые старые плановые
+    assert retention_candidates(rows, config) == [frame(3), frame(2)]
@@ -0,0 +1,101 @@
+import csv
+import os
+import subprocess
+import sys
+from datetime import datetime
+
+import pytest
+
+from common.devices import DevicePartitions
+from common.rollups import TelemetryRollups
+from conftest import APP_DIR
+
+ROWS = [
+    {'date': '18.10.2026 10:05:00', 'temperature': '20', 'humidity': '50', 'signal': '10'},
+    {'date': '18.10.2026 11:40:00', 'temperature': '26', 'humidity': 'N/A', 'signal': '12'},
+    # Показание пришло позже, но относится к уже учтенному часу
+    {'date': '18.10.2026 10:55:00', 'temperature': '17', 'humidity': '54', 'signal': '14'},
+    {'date': '17.10.2026 23:59:59', 'temperature': '5', 'humidity': '90', 'signal': '3'},
+    {'date': 'garbage', 'temperature': '99', 'humidity': '99', 'signal': '99'},
+]
+
+
+def stats(rollups, resolution):
+    return {(bucket, metric): (count, mean, low, high)
+            for bucket, metric, count, mean, low, high in rollups.rows(resolution)}
+
+
+def test_incremental_rollups(tmp_path):
+    rollups = TelemetryRollups(str(tmp_path / 'rollups.db'))
+    for row in ROWS:
+        rollups.add(row)
+
+    assert rollups.readings() == 4
+    assert rollups.last_date() == '2026-10-18 11:40:00'
+
+    hours = stats(rollups, 'hour')
+    assert hours[('2026-10-18 10:00:00', 'temperature')] == (2, 18.5, 17, 20)
+    assert hours[('2026-10-18 10:00:00', 'humidity')] == (2, 52, 50, 54)
+    assert hours[('2026-10-18 11:00:00', 'temperature')] == (1, 26, 26, 26)
+    assert ('2026-10-18 11:00:00', 'humidity') not in hours
+    assert hours[('2026-10-17 23:00:00', 'signal')] == (1, 3, 3, 3)
+
+    days = stats(rollups, 'day')
+    assert days[('2026-10-18 00:00:00', 'temperature')] == (3, 21, 17, 26)
+    assert days[('2026-10-18 00:00:00', 'signal')] == (3, 12, 10, 14)
+    assert days[('2026-10-17 00:00:00', 'humidity')] == (1, 90, 90, 90)
+    assert [bucket for bucket, *_ in rollups.rows('day', '2026-10-18 00:00:00')] == \
+        ['2026-10-18 00:00:00'] * 3
+
+
+def test_rebuild_from_csv_matches_incremental(tmp_path):
+    csv_path = tmp_path / 'signals.csv'
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=['date', 'humidity', 'temperature', 'signal'])
+        writer.writeheader()
+        writer.writerows(ROWS)
+
+    incremental = TelemetryRollups(str(tmp_path / 'incremental.db'))
+    for row in ROWS:
+        incremental.add(row)
+
+    rebuilt = TelemetryRollups(str(tmp_path / 'rebuilt.db'))
+    rebuilt.add({'date': '01.01.2020 00:00:00', 'temperature': '-40'})  # устаревшие агрегаты
+    subprocess.run(
+        [sys.executable, '-m', 'common.rollups', str(csv_path), str(rebuilt.db_path)],
+        check=True, cwd=str(tmp_path), env={**os.environ, 'PYTHONPATH': str(APP_DIR)},
+        stdout=subprocess.DEVNULL
+    )
+
+    assert rebuilt.readings() == incremental.readings()
+    assert rebuilt.last_date() == incremental.last_date()
+    for resolution in ('hour', 'day'):
+        assert stats(rebuilt, resolution) == pytest.approx(stats(incremental, resolution))
+
+
+def test_long_timeframes_read_rollups_only(web, tmp_path, monkeypatch):
+    rollups = TelemetryRollups(str(tmp_path / 'rollups.db'))
+    monkeypatch.setattr(web.main, 'telemetry_rollups', DevicePartitions(lambda device: rollups))
+
+    def load_sensors_frame(*args, **kwargs):
+        raise AssertionError('raw telemetry read for a rollup timeframe')
+
+    monkeypatch.setattr(web.main, 'load_sensors_frame', load_sensors_frame)
+
+    now = datetime.now().replace(microsecond=0)
+    rollups.add({'date': now.strftime('%d.%m.%Y %H:%M:%S'), 'temperature': '20', 'humidity': '40'})
+    for timeframe in ('last_month', 'last_year', 'all'):
+        chart = web.main.PlotGenerator.chart_data(timeframe)
+        assert chart.last_date == now
+        assert chart.frame['temperature'].tolist() == [20]
+
+
+def test_rollup_chart_rendered(web, tmp_path, monkeypatch):
+    rollups = TelemetryRollups(str(tmp_path / 'rollups.db'))
+    monkeypatch.setattr(web.main, 'telemetry_rollups', DevicePartitions(lambda device: rollups))
+    for hour in range(5):
+        rollups.add({'date': f'18.10.2026 0{hour}:10:00', 'temperature': str(hour), 'humidity': '40'})
+
+    chart = web.main.PlotGenerator.chart_data('all')
+    image = web.main.PlotGenerator.generate_plot(chart, 'all', 'temp_hue')
+    assert image and 'error' not in image
@@ -0,0 +1,106 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from common.security_patterns import (
+    corpus_mismatches, security_matcher, web_security_matcher
+)
+from conftest import jpeg_bytes
+from security import blocklist
+
+CORPUS_DIR = Path(__file__).resolve().parent.parent / 'common'
+NGINX = {'base_url': 'https://localhost', 'environ_base': {'REMOTE_ADDR': '172.21.0.2'}}
+
+
+@pytest.mark.parametrize('matcher, corpus', [
+    (security_matcher, 'security_corpus.txt'),
+    (web_security_matcher, 'security_corpus_web.txt'),
+])
+def test_corpus(matcher, corpus):
+    assert corpus_mismatches(matcher, CORPUS_DIR / corpus) == []
+
+
+def test_web_rules_scoped_to_url_fields():
+    assert web_security_matcher.check('/static/debug.jpg', 'device=backup') is None
+    assert web_security_matcher.check('/backup', '')[0] == 'blocked_path'
+    assert web_security_matcher.check('/', 'x=debug')[0] == 'blocked_keyword'
+    # sim800-api проверяет строку 'путь?запрос' целиком
+    assert security_matcher.check('/static/debug.jpg', '')[0] == 'blocked_keyword'
+
+
+def web_get(web, url, ip):
+    return web.main.app.test_client().get(url, headers={'X-Forwarded-For': ip}, **NGINX)
+
+
+def test_web_ui_urls_not_blocked(web):
+    ip = '203.0.113.10'
+    for url in ('/login?next=%2F%3Fdevice%3Dbackup-cam', '/static/devices/debug-cam/images/a.jpg'):
+        assert web_get(web, url, ip).status_code != 403
+    assert not web.main.blocklist.is_blocked(ip)
+
+
+def test_web_scanner_blocked(web):
+    ip = '203.0.113.11'
+    assert web_get(web, '/.env', ip).status_code == 403
+    assert web.main.blocklist.is_blocked(ip)
+    assert web_get(web, '/login', ip).status_code == 403
+
+
+def blocklist_line(web, ip):
+    lines = Path(web.config.ConfigMain.BLOCKED_IPS_FILE_PATH).read_text().splitlines()
+    return [line for line in lines if line.split()[0] == ip]
+
+
+def test_web_blocks_forwarded_client_with_expiry(web):
+    ip = '203.0.113.12'
+    started = time.time()
+    assert web_get(web, '/wp-login.php', ip).status_code == 403
+
+    # Блокируется клиент из X-Forwarded-For, а не адрес nginx
+    assert not web.main.blocklist.is_blocked(NGINX['environ_base']['REMOTE_ADDR'])
+    [line] = blocklist_line(web, ip)
+    expires = float(line.split()[1])
+    ttl = web.config.ConfigMain.BLOCKED_IP_TTL
+    assert ttl > 0
+    assert started + ttl - 1 <= expires <= time.time() + ttl + 1  # срок пишется в секундах
+
+
+def sim800_get(client, url, ip):
+    return client.get(url, headers={'X-Real-IP': ip})
+
+
+def test_sim800_blocked_ip_denied(sim800_client):
+    ip = '203.0.113.20'
+    blocklist.block(ip, 'test')
+    for _ in range(2):
+        response = sim800_get(sim800_client, '/settings-flat', ip)
+        assert response.status_code == 403
+        assert response.json() == {'error': 'Доступ запрещен'}
+    assert sim800_get(sim800_client, '/settings-flat', '203.0.113.21').status_code == 200
+
+
+def test_sim800_threat_blocks_client(sim800_client):
+    ip = '203.0.113.22'
+    response = sim800_get(sim800_client, '/.git/config', ip)
+    assert response.status_code == 403
+    assert response.json() == {'error': 'Обнаружена угроза безопасности'}
+    assert blocklist.is_blocked(ip)
+    assert sim800_get(sim800_client, '/settings-flat', ip).json() == {'error': 'Доступ запрещен'}
+
+
+def test_sim800_streamed_upload_passes_middleware(sim800_client):
+    body = jpeg_bytes((70, 80, 90), size=(320, 240))
+
+    def chunks():
+        for start in range(0, len(body), 1000):
+            yield body[start:start + 1000]
+
+    response = sim800_client.post(
+        '/upload-raw',
+        params={'filename': 'USER_ID_volt_4100_sig_20_up_0_t_21.5_h_40_akb_3.9.jpg'},
+        content=chunks(),
+        headers={'Content-Type': 'application/octet-stream', 'X-Real-IP': '203.0.113.23'},
+    )
+    assert response.status_code == 200
+    assert [p for p in Path('static/images').glob('*.jpg') if p.read_bytes() == body]
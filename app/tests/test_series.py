@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from test_web_charts import write_rows
+
+
+def make_frame(n):
+    t = np.arange(n)
+    return pd.DataFrame({
+        'date': pd.date_range('2026-01-01', periods=n, freq='min'),
+        'temperature': np.sin(t / 7.0) * 10 + (t % 13),
+        'humidity': np.cos(t / 11.0) * 20 + 50,
+        'voltage_akb': 4.2 - t / n,
+        'signal': (t * 7919) % 31,
+    })
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+@pytest.mark.parametrize('n, points', [(5000, 500), (1001, 10), (37, 11)])
+def test_downsample_bounds_points_and_keeps_ends(web, method, n, points):
+    df = make_frame(n)
+    series = web.series.downsample(df, points, method)
+
+    first = np.datetime_as_string(df['date'].to_numpy(dtype='datetime64[s]')[[0, -1]], unit='s')
+    for column in web.series.SERIES_COLUMNS:
+        t, y = series[column]['t'], series[column]['y']
+        assert len(t) == len(y) <= points
+        assert t == sorted(t)
+        assert [t[0], t[-1]] == first.tolist()
+        assert [y[0], y[-1]] == np.round(df[column].to_numpy()[[0, -1]], 3).tolist()
+
+
+@pytest.mark.parametrize('method', ['lttb', 'minmax'])
+def test_downsample_short_series_kept_whole(web, method):
+    df = make_frame(8)
+    series = web.series.downsample(df, 10, method)
+    assert series['signal']['y'] == df['signal'].tolist()
+
+
+def test_minmax_keeps_extremes(web):
+    y = np.zeros(1000)
+    y[123], y[777] = 50.0, -50.0
+    idx = web.series.minmax_indices(y, 20)
+    assert {0, 123, 777, 999} <= set(idx.tolist())
+    assert len(idx) <= 20
+
+
+def test_series_empty_range_not_found(web, tmp_path, monkeypatch):
+    csv_path = tmp_path / 'signals.csv'
+    monkeypatch.setattr(web.config.ConfigMain, 'CSV_FILE_PATH', str(csv_path))
+    write_rows(csv_path, [datetime.now() - timedelta(days=3)])
+    client = web.main.app.test_client()
+
+    response = client.get('/api/series/last_day', base_url='https://localhost')
+    assert response.status_code == 404
+    assert response.get_json() == {'error': 'No data available'}
+
+    response = client.get('/api/series/last_week', base_url='https://localhost')
+    assert response.status_code == 200
+    assert response.get_json()['total'] == 1
@@ -0,0 +1,39 @@
+import json
+
+from endpoints.settings import load_settings, save_settings
+
+
+def test_flat_settings_not_modified_by_etag(sim800_client):
+    response = sim800_client.get('/settings-flat')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert response.json()['settings_version'] == response.headers['X-Settings-Version']
+
+    repeated = sim800_client.get('/settings-flat', headers={'If-None-Match': etag})
+    assert repeated.status_code == 304
+    assert repeated.content == b''
+    assert repeated.headers['ETag'] == etag
+
+
+def test_flat_settings_empty_for_current_version(sim800_client):
+    version = sim800_client.get('/settings-flat').headers['X-Settings-Version']
+
+    response = sim800_client.get('/settings-flat', params={'v': version})
+    assert response.status_code == 200
+    assert response.json() == {}
+
+    stale = sim800_client.get('/settings-flat', params={'v': 'outdated'})
+    assert stale.json()['settings_version'] == version
+
+
+def test_flat_settings_invalidated_after_save(sim800_client):
+    before = sim800_client.get('/settings-flat')
+    settings = load_settings()
+    general = settings['Device']['General']
+    general['timeToSleepMinutes']['current'] = before.json()['Device_General_timeToSleepMinutes'] + 1
+    save_settings(settings)
+
+    after = sim800_client.get('/settings-flat', headers={'If-None-Match': before.headers['ETag']})
+    assert after.status_code == 200
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert after.json()['Device_General_timeToSleepMinutes'] == general['timeToSleepMinutes']['current']
@@ -0,0 +1,63 @@
+from sms_store import SmsStore
+
+
+def make_store(tmp_path):
+    store = SmsStore(str(tmp_path / 'sms.db'))
+    store.add_many([
+        ('2026-10-18T11:00:00+0300', '+7900', 'first'),
+        ('2026-10-18T12:00:00+0300', '+7900', 'second'),
+    ])
+    return store
+
+
+def test_poll_returns_late_and_unparsed_sms(tmp_path):
+    store = make_store(tmp_path)
+    rows, newest_id = store.page(5)
+    assert [row['message'] for row in rows] == ['first', 'second']
+    assert newest_id == 2
+
+    # Пришли после опроса, но с более ранней / нераспознанной меткой
+    store.add_many([
+        ('2026-10-18T10:30:00+0300', '+7900', 'late'),
+        ('garbage', '+7900', 'unparsed'),
+    ])
+    rows, _ = store.page(5, after=newest_id)
+    assert [row['message'] for row in rows] == ['late', 'unparsed']
+    assert store.page(5, after=rows[-1]['id'])[0] == []
+
+
+def test_poll_survives_deleted_cursor(tmp_path):
+    store = make_store(tmp_path)
+    conn = store._connection()
+    with conn:
+        conn.execute('DELETE FROM sms WHERE id = 2')
+    store.add_many([('2026-10-18T13:00:00+0300', '+7900', 'third')])
+
+    rows, _ = store.page(5, after=2)
+    assert [row['message'] for row in rows] == ['third']
+
+
+def test_history_pages_follow_sms_time(tmp_path):
+    store = make_store(tmp_path)
+    store.add_many([('2026-10-18T10:30:00+0300', '+7900', 'late')])
+
+    rows, newest_id = store.page(2)
+    assert [row['message'] for row in rows] == ['first', 'second']
+    assert newest_id == 3
+    older, _ = store.page(2, before=rows[0]['id'])
+    assert [row['message'] for row in older] == ['late']
+
+
+def test_sms_last_clamps_limit(sim800_client):
+    sms = [
+        {'phone': '+7901', 'message': f'clamp {n}', 'timestamp': f'2026-10-18T13:0{n}:00+0300'}
+        for n in range(3)
+    ]
+    assert sim800_client.post('/sms-receive', json=sms).status_code == 200
+
+    response = sim800_client.get('/sms-last', params={'limit': 1000})
+    assert response.status_code == 200
+    assert [item['message'] for item in response.json()['sms']][-3:] == ['clamp 0', 'clamp 1', 'clamp 2']
+
+    response = sim800_client.get('/sms-last', params={'limit': 0})
+    assert [item['message'] for item in response.json()['sms']] == ['clamp 2']
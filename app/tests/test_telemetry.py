@@ -0,0 +1,90 @@
+import csv
+import threading
+
+from common.rollups import TelemetryRollups
+from telemetry import FIELDS, TelemetryStore
+
+
+class CountingRollups(TelemetryRollups):
+    def __init__(self, db_path):
+        super().__init__(db_path)
+        self.rebuilds = 0
+
+    def rebuild(self, rows):
+        self.rebuilds += 1
+        super().rebuild(rows)
+
+
+def reading(minute, temperature=21.5):
+    return {'date': f'18.10.2026 12:{minute:02d}:00', 'humidity': 40.0, 'temperature': temperature,
+            'signal': 20, 'voltage_sim': 4000, 'voltage_akb': 3.9}
+
+
+def make_store(tmp_path, **kwargs):
+    kwargs.setdefault('compact_delay', 3600)
+    return TelemetryStore(str(tmp_path / 'signals.csv'), fsync=False, **kwargs)
+
+
+def read_rows(tmp_path):
+    with open(tmp_path / 'signals.csv', newline='', encoding='utf-8') as f:
+        return list(csv.reader(f))
+
+
+def test_concurrent_appends_are_all_written(tmp_path):
+    store = make_store(tmp_path)
+    threads = [threading.Thread(target=store.append, args=(reading(i),)) for i in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rows = read_rows(tmp_path)
+    assert rows[0] == FIELDS
+    assert sorted(row[0] for row in rows[1:]) == [reading(i)['date'] for i in range(20)]
+
+
+def test_workers_see_each_others_rows(tmp_path):
+    # Два хранилища на одном файле - как два воркера uvicorn
+    first, second = make_store(tmp_path), make_store(tmp_path)
+    first.append(reading(0))
+    second.append(reading(1))
+    first.append(reading(1, temperature=30.0))  # повтор даты, записанной другим воркером
+
+    assert len(read_rows(tmp_path)) == 4
+    assert first._duplicates == 1
+    first._compact_timer.cancel()
+
+
+def test_compaction_keeps_last_row_and_rebuilds_sinks(tmp_path):
+    rollups = CountingRollups(str(tmp_path / 'rollups.db'))
+    store = make_store(tmp_path, sinks=[rollups])
+    store.append(reading(0))
+    store.append(reading(1))
+    store.append(reading(1, temperature=30.0))
+    store._compact_timer.cancel()
+
+    store.compact()
+    rows = read_rows(tmp_path)
+    assert [row[0] for row in rows[1:]] == [reading(0)['date'], reading(1)['date']]
+    assert rows[2][FIELDS.index('temperature')] == '30.0'
+    assert rollups.readings() == 2
+    (_, _, count, mean, low, high), = [r for r in rollups.rows('hour') if r[1] == 'temperature']
+    assert (count, low, high) == (2, 21.5, 30.0)
+
+
+def test_unparsed_dates_do_not_force_sink_rebuild(tmp_path):
+    (tmp_path / 'signals.csv').write_text(
+        ','.join(FIELDS) + '\n'
+        '18.10.2026 12:00:00,40.0,21.5,20,4000,3.9\n'
+        'N/A,N/A,N/A,20,4000,3.9\n',
+        encoding='utf-8'
+    )
+    rollups = CountingRollups(str(tmp_path / 'rollups.db'))
+    make_store(tmp_path, sinks=[rollups]).append(reading(5))
+    assert rollups.rebuilds == 1  # первый запуск: агрегатов еще нет
+
+    # Перезапуск: агрегаты совпадают с файлом без учета строки 'N/A'
+    restarted = CountingRollups(str(tmp_path / 'rollups.db'))
+    make_store(tmp_path, sinks=[restarted]).append(reading(6))
+    assert restarted.rebuilds == 0
+    assert restarted.readings() == 3
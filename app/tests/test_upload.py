@@ -0,0 +1,94 @@
+from pathlib import Path
+
+import pytest
+
+import endpoints.upload
+import utilits
+from conftest import jpeg_bytes
+
+FRAME = 'USER_ID_volt_4100_sig_20_up_0_t_21.5_h_40_akb_3.9.jpg'
+
+
+def raw_upload(client, body, ip, filename=FRAME, **headers):
+    return client.post(
+        '/upload-raw',
+        params={'filename': filename} if filename else None,
+        content=body,
+        headers={'Content-Type': 'application/octet-stream', 'X-Real-IP': ip, **headers},
+    )
+
+
+def stored_frames(body):
+    return [path for path in Path('static/images').glob('*.jpg') if path.read_bytes() == body]
+
+
+@pytest.fixture
+def small_limit(monkeypatch):
+    monkeypatch.setattr(endpoints.upload.config, 'max_upload_size', 1000)
+
+
+def test_raw_upload_saved(sim800_client):
+    body = jpeg_bytes((10, 20, 30))
+    assert raw_upload(sim800_client, body, '198.51.100.1').status_code == 200
+    [path] = stored_frames(body)
+    assert path.name.endswith('_' + FRAME)
+
+
+def test_raw_upload_filename_from_header(sim800_client):
+    body = jpeg_bytes((10, 20, 31))
+    response = raw_upload(sim800_client, body, '198.51.100.1', filename=None, **{'X-Filename': FRAME})
+    assert response.status_code == 200
+    assert len(stored_frames(body)) == 1
+
+
+@pytest.mark.parametrize('filename', [None, 'frame.png', 'frame', '../frame.jpg'])
+def test_raw_upload_rejects_filename(sim800_client, filename):
+    headers = {'X-Filename': filename} if filename else {}
+    response = raw_upload(sim800_client, jpeg_bytes((10, 20, 32)), '198.51.100.2', filename=None, **headers)
+    assert response.status_code == 400
+    assert stored_frames(jpeg_bytes((10, 20, 32))) == []
+
+
+def test_raw_upload_rejects_content_type(sim800_client):
+    response = raw_upload(sim800_client, jpeg_bytes(), '198.51.100.2', **{'Content-Type': 'image/jpeg'})
+    assert response.status_code == 415
+
+
+def test_raw_upload_too_large_by_content_length(sim800_client, small_limit):
+    response = raw_upload(sim800_client, b'\xff' * 1001, '198.51.100.3')
+    assert response.status_code == 413
+
+
+def test_raw_upload_too_large_while_streaming(sim800_client, small_limit):
+    def body():
+        for _ in range(4):
+            yield b'\xfe' * 400
+
+    # Без Content-Length (chunked): лимит проверяется по мере приема
+    response = raw_upload(sim800_client, body(), '198.51.100.3')
+    assert response.status_code == 413
+    assert list(Path('static/images').glob('.*.part')) == []
+    assert stored_frames(b'\xfe' * 1600) == []
+
+
+def test_retried_upload_acknowledged_without_write(sim800_client):
+    body = jpeg_bytes((40, 50, 60))
+    assert raw_upload(sim800_client, body, '198.51.100.4').status_code == 200
+    image_dir = Path('static/images')
+    before = image_dir.stat().st_mtime_ns
+
+    # Повтор после таймаута модема: то же содержимое, новое имя на сервере
+    assert raw_upload(sim800_client, body, '198.51.100.4').status_code == 200
+    assert image_dir.stat().st_mtime_ns == before  # в каталоге ничего не создавалось
+    assert len(stored_frames(body)) == 1
+
+
+def test_same_frame_from_other_device_saved(sim800_client, monkeypatch):
+    monkeypatch.setattr(utilits, 'devices', frozenset({'B7'}))
+    body = jpeg_bytes((40, 50, 61))
+    assert raw_upload(sim800_client, body, '198.51.100.4').status_code == 200
+    assert raw_upload(sim800_client, body, '198.51.100.4', filename='B7' + FRAME[7:]).status_code == 200
+
+    assert len(stored_frames(body)) == 1
+    [path] = [p for p in Path('static/devices/B7/images').glob('*.jpg') if p.read_bytes() == body]
+    assert path.name.endswith('_B7_volt_4100_sig_20_up_0_t_21.5_h_40_akb_3.9.jpg')
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from telemetry import FIELDS
+
+
+def write_rows(path, dates):
+    new = not path.exists()
+    with open(path, 'a', encoding='utf-8') as f:
+        if new:
+            f.write(','.join(FIELDS) + '\n')
+        for date in dates:
+            f.write(f"{date.strftime('%d.%m.%Y %H:%M:%S')},55,21.5,17,4.1,3.9\n")
+
+
+@pytest.fixture
+def charts(web, tmp_path, monkeypatch):
+    """Кэш графиков над отдельным signals.csv, вместо отрисовки - счетчик"""
+    csv_path = tmp_path / 'signals.csv'
+    monkeypatch.setattr(web.config.ConfigMain, 'CSV_FILE_PATH', str(csv_path))
+
+    clock = {'now': datetime(2026, 10, 18, 12, 0, 0)}
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return clock['now']
+
+    monkeypatch.setattr(web.main, 'datetime', FrozenDatetime)
+
+    renders = []
+
+    def generate_plot(chart, timeframe, chart_type, theme='dark'):
+        renders.append((timeframe, len(chart.frame)))
+        return f'chart-{len(renders)}'
+
+    monkeypatch.setattr(web.main.PlotGenerator, 'generate_plot', staticmethod(generate_plot))
+    cache = web.main.ChartCache(max_entries=8, alarm_refresh_seconds=300)
+    return cache, csv_path, clock, renders
+
+
+def test_chart_rerendered_only_on_new_revision(charts):
+    cache, csv_path, clock, renders = charts
+    assert cache.get('last_week', 'temp_hue') == cache.NO_DATA
+
+    write_rows(csv_path, [clock['now'] - timedelta(minutes=5)])
+    assert cache.get('last_week', 'temp_hue') == 'chart-1'
+    assert cache.get('last_week', 'temp_hue') == 'chart-1'
+    assert cache.get('last_week', 'volt_sig') == 'chart-2'
+
+    write_rows(csv_path, [clock['now']])
+    assert cache.get('last_week', 'temp_hue') == 'chart-3'
+    assert renders[-1] == ('last_week', 2)
+
+
+def test_chart_expires_when_alarm_state_changes(web, charts):
+    cache, csv_path, clock, renders = charts
+    last_date = clock['now']
+    write_rows(csv_path, [last_date])
+    alarm_at = last_date + timedelta(minutes=web.config.ConfigMain.CAMERA_UPDATE_MINUTES)
+
+    assert cache.get('last_day', 'temp_hue') == 'chart-1'
+    clock['now'] = alarm_at - timedelta(seconds=1)
+    assert cache.get('last_day', 'temp_hue') == 'chart-1'
+
+    # Камера просрочила выход на связь: линия тревоги появляется на графике
+    clock['now'] = alarm_at
+    assert cache.get('last_day', 'temp_hue') == 'chart-2'
+
+    # Пока камера молчит, график обновляется с периодом alarm_refresh
+    clock['now'] = alarm_at + timedelta(seconds=299)
+    assert cache.get('last_day', 'temp_hue') == 'chart-2'
+    clock['now'] = alarm_at + timedelta(seconds=300)
+    assert cache.get('last_day', 'temp_hue') == 'chart-3'
+
+
+def test_raw_chart_rendered(web, tmp_path, monkeypatch):
+    csv_path = tmp_path / 'signals.csv'
+    monkeypatch.setattr(web.config.ConfigMain, 'CSV_FILE_PATH', str(csv_path))
+    now = datetime.now().replace(microsecond=0)
+    write_rows(csv_path, [now - timedelta(hours=hours) for hours in (3, 2, 1)])
+
+    chart = web.main.PlotGenerator.chart_data('last_day')
+    assert chart.last_date == now - timedelta(hours=1)
+    image = web.main.PlotGenerator.generate_plot(chart, 'last_day', 'volt_sig')
+    assert image and 'error' not in image
@@ -0,0 +1,125 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from test_security import NGINX
+
+
+@pytest.fixture
+def db(web):
+    """Модуль database с пустым пулом соединений"""
+    database = web.database
+    while not database._pool.empty():
+        database._pool.get_nowait().close()
+    database.user_cache.invalidate()
+    return database
+
+
+def test_connection_reused(db):
+    with db.db_connection() as first:
+        pass
+    with db.db_connection() as second:
+        assert second is first
+
+
+def test_pool_keeps_pool_size_connections(db):
+    opened = []
+    def nest(depth):
+        with db.db_connection() as conn:
+            opened.append(conn)
+            if depth:
+                nest(depth - 1)
+    nest(db.POOL_SIZE)
+
+    assert len(set(map(id, opened))) == db.POOL_SIZE + 1
+    assert db._pool.qsize() == db.POOL_SIZE
+    # Соединение сверх POOL_SIZE закрывается
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].execute('SELECT 1')
+
+
+def test_open_transaction_rolled_back(db):
+    with db.db_connection() as conn:
+        conn.execute("INSERT INTO settings (key, value) VALUES ('pool_test', '1')")
+    with db.db_connection() as conn:
+        assert not conn.in_transaction
+        assert conn.execute("SELECT 1 FROM settings WHERE key = 'pool_test'").fetchone() is None
+
+
+def test_user_cache_lru_and_ttl(db, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(db.time, 'monotonic', lambda: now[0])
+    cache = db.UserCache(max_entries=2, ttl=10)
+    cache.put(1, 'a')
+    cache.put(2, 'b')
+    assert cache.get('1') == 'a'  # 2 становится самой старой записью
+    cache.put(3, 'c')
+    assert (cache.get(1), cache.get(2), cache.get(3)) == ('a', None, 'c')
+
+    now[0] += 10
+    assert cache.get(1) is None
+
+    cache.put(3, 'c')
+    cache.invalidate(3)
+    assert cache.get(3) is None
+
+
+def test_get_user_by_id_cached_until_invalidated(db):
+    assert db.add_user('cache-user', 'secret')
+    user_id = db.get_user_by_username('cache-user')['id']
+    assert db.get_user_by_id(user_id)['username'] == 'cache-user'
+
+    with db.db_connection() as conn:
+        conn.execute("UPDATE users SET username = 'renamed' WHERE id = ?", (user_id,))
+        conn.commit()
+    assert db.get_user_by_id(user_id)['username'] == 'cache-user'
+
+    db.user_cache.invalidate(user_id)
+    assert db.get_user_by_id(user_id)['username'] == 'renamed'
+
+
+def add_user_with_cost(db, monkeypatch, username, cost):
+    with monkeypatch.context() as m:
+        m.setattr(db, '_hash_cost', cost)
+        assert db.add_user(username, 'secret')
+    return db.get_user_by_username(username)
+
+
+def test_password_check_busy(web, db, monkeypatch):
+    add_user_with_cost(db, monkeypatch, 'busy-user', 4)
+    slots = threading.BoundedSemaphore(1)
+    slots.acquire()
+    monkeypatch.setattr(db, '_hash_slots', slots)
+
+    with pytest.raises(db.PasswordCheckBusy):
+        db.verify_user('busy-user', 'secret')
+    response = web.main.app.test_client().post(
+        '/login', data={'username': 'busy-user', 'password': 'secret'},
+        headers={'X-Forwarded-For': '203.0.113.90'}, **NGINX)
+    assert response.status_code == 503
+
+
+def test_weaker_hash_rehashed(db, monkeypatch):
+    old_hash = add_user_with_cost(db, monkeypatch, 'weak-user', db._hash_cost - 1)['password_hash']
+    assert db.verify_user('weak-user', 'secret')
+
+    deadline = time.monotonic() + 10
+    while db.get_user_by_username('weak-user')['password_hash'] == old_hash:
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+    new_hash = db.get_user_by_username('weak-user')['password_hash']
+    assert db.hash_cost(new_hash) == db._hash_cost
+    assert db.verify_user('weak-user', 'secret')
+    assert not db.verify_user('weak-user', 'wrong')
+
+
+def test_stronger_hash_kept(db, monkeypatch):
+    add_user_with_cost(db, monkeypatch, 'strong-user', db._hash_cost + 1)
+    rehashed = []
+    monkeypatch.setattr(db, '_rehash', lambda *args: rehashed.append(args))
+
+    assert db.verify_user('strong-user', 'secret')
+    assert not db.verify_user('strong-user', 'wrong')
+    assert rehashed == []